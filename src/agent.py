@@ -0,0 +1,164 @@
+"""
+Remote agent that streams metrics over a long-lived SSH channel
+Author: Wolf Paulus <wolf@paulus.com>
+"""
+import shlex
+from threading import Thread, Lock
+from time import monotonic
+from paramiko import SSHClient
+from log import logger
+
+# Runs on the monitored host. Reads kernel counters directly (no forks per sample)
+# and writes one line per interval: cpu=2.8 mem=45.9 temp=53.7 disk=24.0 tasks=123
+AGENT_SCRIPT = """\
+import os, sys, time
+interval, thermal, disk = float(sys.argv[1]), sys.argv[2], sys.argv[3]
+def cpu_times():
+    with open("/proc/stat") as f:
+        fields = [int(x) for x in f.readline().split()[1:9]]
+    return fields[3], sum(fields)
+prev = cpu_times()
+while True:
+    time.sleep(interval)
+    idle, total = cpu_times()
+    cpu = 100.0 * (1 - (idle - prev[0]) / max(1, total - prev[1]))
+    prev = idle, total
+    mem = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            mem[key] = int(value.split()[0])
+    used = 100.0 * (mem["MemTotal"] - mem.get("MemAvailable", mem["MemFree"])) / mem["MemTotal"]
+    try:
+        with open(thermal) as f:
+            temp = int(f.read()) / 1000
+    except (OSError, ValueError):
+        temp = -1
+    st = os.statvfs(disk)
+    full = 100.0 * (st.f_blocks - st.f_bfree) / max(1, st.f_blocks - st.f_bfree + st.f_bavail)
+    tasks = sum(1 for d in os.listdir("/proc") if d.isdigit())
+    try:
+        sys.stdout.write(f"cpu={cpu:.1f} mem={used:.1f} temp={temp:.1f} disk={full:.1f} tasks={tasks}\\n")
+        sys.stdout.flush()
+    except BrokenPipeError:
+        break
+"""
+
+THERMAL = "/sys/class/thermal/thermal_zone0/temp"
+DISK = "/"
+
+
+class AgentStream:
+    """A remote agent process and the reader thread consuming its records"""
+
+    def __init__(self, client: SSHClient, interval: float, thermal: str = THERMAL, disk: str = DISK) -> None:
+        """Start the agent on the remote host
+        client, connected ssh client object
+        interval, seconds between records
+        thermal, path of the thermal sensor file to read
+        disk, mount point whose usage is reported
+        """
+        self.client = client
+        self.interval = interval
+        self._record: dict[str, str] = {}
+        self._updated = 0.0
+        cmd = " ".join(["python3", "-u", "-c", shlex.quote(AGENT_SCRIPT),
+                        str(interval), shlex.quote(thermal), shlex.quote(disk)])
+        self._channel = client.get_transport().open_session()
+        self._channel.exec_command(cmd)
+        self._thread = Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    @property
+    def alive(self) -> bool:
+        """True while the agent is running and its channel is open"""
+        return self._thread.is_alive() and not self._channel.closed
+
+    def latest(self) -> dict[str, str] | None:
+        """Return the most recent record, or None if there is no record younger than two intervals"""
+        if monotonic() - self._updated > 2 * self.interval:
+            return None
+        return self._record
+
+    def close(self) -> None:
+        """Stop the agent by closing its channel"""
+        self._channel.close()
+
+    def _read(self) -> None:
+        for line in self._channel.makefile("r"):
+            try:
+                self._record = dict(field.split("=", 1) for field in line.split())
+                self._updated = monotonic()
+            except ValueError:
+                logger.warning("Malformed agent record: %s", line.strip())
+        logger.info("Agent stream ended with exit status %d", self._channel.recv_exit_status())
+
+
+class Agents:
+    """Keeps one agent stream per host, restarting it when the connection changes or the agent dies.
+    Hosts that cannot run the agent (e.g. no python3) are left alone for retry seconds.
+    """
+
+    def __init__(self, interval: float = 2.0, retry: float = 300.0) -> None:
+        self.interval = interval
+        self.retry = retry
+        self._streams: dict[str, AgentStream] = {}
+        self._failed: dict[str, float] = {}
+        self._lock = Lock()
+
+    def record(self, hostname: str, client: SSHClient, monitors: list) -> dict[str, str]:
+        """Return the latest record streamed by the host's agent, starting the agent if needed.
+        The thermal file and disk mount point are taken from the host's sensor commands.
+        Returns an empty dict while no fresh record is available.
+        """
+        with self._lock:
+            stream = self._streams.get(hostname)
+            if stream is not None and (stream.client is not client or not stream.alive):
+                stream.close()
+                del self._streams[hostname]
+                if stream.client is client:  # same connection, the agent itself gave up
+                    self._failed[hostname] = monotonic() + self.retry
+                    logger.warning("Agent on %s stopped, falling back to commands.", hostname)
+                stream = None
+            if stream is None:
+                if monotonic() < self._failed.get(hostname, 0):
+                    return {}
+                try:
+                    stream = AgentStream(client, self.interval, *Agents._paths(monitors))
+                except Exception as err:
+                    logger.error("Error starting agent on %s: %s", hostname, err)
+                    self._failed[hostname] = monotonic() + self.retry
+                    return {}
+                self._streams[hostname] = stream
+                logger.info("Agent started on %s", hostname)
+        return stream.latest() or {}
+
+    @staticmethod
+    def _paths(monitors: list) -> tuple[str, str]:
+        """Pick the thermal file (cat <file>) and the mount point (df <path>) out of the sensor commands"""
+        thermal, disk = THERMAL, DISK
+        for monitor in monitors:
+            if monitor.field not in ("temp", "disk"):
+                continue
+            args = shlex.split(monitor.cmd or "", comments=True)
+            if len(args) == 2 and args[0] == ("cat" if monitor.field == "temp" else "df"):
+                if monitor.field == "temp":
+                    thermal = args[1]
+                else:
+                    disk = args[1]
+        return thermal, disk
+
+    def stop(self, hostname: str) -> None:
+        """Stop the host's agent, e.g. after its sensors changed; it is restarted on the next record()"""
+        with self._lock:
+            stream = self._streams.pop(hostname, None)
+            self._failed.pop(hostname, None)
+        if stream is not None:
+            stream.close()
+
+    def close(self) -> None:
+        """Stop all agents"""
+        with self._lock:
+            for stream in self._streams.values():
+                stream.close()
+            self._streams.clear()
@@ -0,0 +1,205 @@
+"""
+Alerting: rules on the stream of readings, delivered to sinks in the background
+Author: Wolf Paulus <wolf@paulus.com>
+"""
+import json
+import logging
+import os
+import subprocess
+from abc import ABC, abstractmethod
+from logging.handlers import SysLogHandler
+from queue import Queue, Full
+from threading import Thread
+from time import sleep, time
+from urllib.request import Request, urlopen
+from log import logger
+from stats import stats
+
+
+class Rule:
+    """Fires when a condition holds long enough, resolves when it no longer holds.
+    name, shown in the alert
+    band, the condition is a color band of at least this, e.g. 4 (red)
+    samples, consecutive samples the band condition must hold before the rule fires
+    offline, the condition is the host being offline (all readings -1) for this many seconds
+    hosts, sensors, limit the rule to these host and sensor names; all if not given
+    """
+
+    def __init__(self, name: str, band: int | None = None, samples: int = 1, offline: float | None = None,
+                 hosts: list[str] | None = None, sensors: list[str] | None = None) -> None:
+        self.name = name
+        self.band = band
+        self.samples = max(1, samples)
+        self.offline = offline
+        self.hosts = set(hosts) if hosts else None
+        self.sensors = set(sensors) if sensors else None
+
+    def applies(self, host: str, sensor: str) -> bool:
+        return (self.hosts is None or host in self.hosts) and (self.sensors is None or sensor in self.sensors)
+
+
+class Sink(ABC):
+    """Delivers alerts somewhere; send() raises on failure and is retried"""
+
+    @abstractmethod
+    def send(self, alert: dict) -> None:
+        """Deliver one alert, see Alerts for its fields"""
+
+
+class WebhookSink(Sink):
+    """POSTs every alert as JSON to a URL"""
+
+    def __init__(self, url: str, timeout: float = 5.0) -> None:
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert: dict) -> None:
+        request = Request(self.url, data=json.dumps(alert).encode(), headers={"Content-Type": "application/json"})
+        with urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class CommandSink(Sink):
+    """Runs a local shell command per alert, with the alert in ZM_* environment variables, e.g. ZM_MESSAGE"""
+
+    def __init__(self, cmd: str, timeout: float = 30.0) -> None:
+        self.cmd = cmd
+        self.timeout = timeout
+
+    def send(self, alert: dict) -> None:
+        env = {**os.environ, **{f"ZM_{key.upper()}": str(value) for key, value in alert.items()}}
+        subprocess.run(self.cmd, shell=True, env=env, timeout=self.timeout, check=True, capture_output=True)
+
+
+class SyslogSink(Sink):
+    """Sends every alert to syslog, by default through the local /dev/log socket"""
+
+    def __init__(self, address: str = "/dev/log") -> None:
+        self.address = address
+        self._handler: SysLogHandler | None = None
+
+    def send(self, alert: dict) -> None:
+        if self._handler is None:  # connect on first use, syslog may not be up yet at startup
+            self._handler = _RaisingSysLogHandler(address=self.address)
+        level = logging.WARNING if alert["state"] == "firing" else logging.INFO
+        self._handler.emit(logging.makeLogRecord({"msg": f"zeromonitor: {alert['message']}", "levelno": level,
+                                                  "levelname": logging.getLevelName(level)}))
+
+
+class _RaisingSysLogHandler(SysLogHandler):
+    """Raises delivery errors, instead of printing them, so the alert is retried"""
+
+    def handleError(self, record: logging.LogRecord) -> None:
+        raise  # re-raises the error emit() is handling
+
+
+class FileSink(Sink):
+    """Appends every alert as one line of JSON to a file"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def send(self, alert: dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(alert) + "\n")
+
+
+SINKS: dict[str, type[Sink]] = {"webhook": WebhookSink, "command": CommandSink, "syslog": SyslogSink, "file": FileSink}
+
+
+class Alerts:
+    """Evaluates the rules on every reading and queues the resulting alerts for delivery.
+    Alerts are dicts with rule, host, sensor (empty for offline alerts), value, band,
+    state ("firing" or "resolved"), time and message.
+    Delivery happens on a worker thread; if the queue is full, alerts are dropped, so the
+    polling loop never waits for a sink.
+    """
+
+    def __init__(self, rules: list[Rule], sinks: list[Sink], queue: int = 100, retries: int = 3,
+                 backoff: float = 1.0) -> None:
+        self.rules = rules
+        self.sinks = sinks
+        self.retries = retries
+        self.backoff = backoff
+        self._counts: dict[tuple[str, str, str], int] = {}  # (rule, host, sensor) -> consecutive samples
+        self._offline: dict[str, float] = {}  # host -> time of its first offline reading
+        self._firing: set[tuple[str, str, str]] = set()
+        self._queue: Queue = Queue(maxsize=queue)
+        self._thread = Thread(target=self._deliver, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "Alerts":
+        """Create the rules and sinks of the alerts section, e.g.
+        rules: [{name: critical, band: 5, samples: 3}, {name: offline, offline: 60}]
+        sinks: [{webhook: http://...}, {file: alerts.log}]
+        """
+        rules = [Rule(**rule) for rule in cfg.get("rules", [])]
+        sinks = []
+        for sink in cfg.get("sinks", []):
+            (kind, arg), = sink.items()
+            sinks.append(SINKS[kind]() if arg is True else SINKS[kind](arg))
+        return cls(rules, sinks, cfg.get("queue", 100), cfg.get("retries", 3))
+
+    def observe(self, host: str, sensor: str, values: tuple[int, int], now: float | None = None) -> None:
+        """Evaluate the rules for a reading (value, color band); cheap, never blocks"""
+        now = time() if now is None else now
+        band = values[1]
+        if band < 0:
+            self._offline.setdefault(host, now)
+        else:
+            self._offline.pop(host, None)
+        for rule in self.rules:
+            if not rule.applies(host, sensor):
+                continue
+            if rule.offline is not None:
+                since = self._offline.get(host)
+                self._update((rule.name, host, ""), since is not None and now - since >= rule.offline, values, now)
+            elif rule.band is not None:
+                key = (rule.name, host, sensor)
+                count = self._counts.get(key, 0) + 1 if band >= rule.band else 0
+                self._counts[key] = count
+                self._update(key, count >= rule.samples, values, now)
+
+    def close(self) -> None:
+        """Stop the delivery thread once the queued alerts are delivered, waiting at most 10 s"""
+        try:
+            self._queue.put(None, timeout=10)
+        except Full:
+            return
+        self._thread.join(timeout=10)
+
+    def _update(self, key: tuple[str, str, str], holds: bool, values: tuple[int, int], now: float) -> None:
+        if holds == (key in self._firing):
+            return
+        state = "firing" if holds else "resolved"
+        if holds:
+            self._firing.add(key)
+        else:
+            self._firing.discard(key)
+        rule, host, sensor = key
+        subject = f"{host} {sensor}" if sensor else f"{host} offline"
+        alert = {"rule": rule, "host": host, "sensor": sensor, "value": values[0], "band": values[1],
+                 "state": state, "time": now, "message": f"{subject}: {rule} {state}"}
+        try:
+            self._queue.put_nowait(alert)
+        except Full:
+            logger.error("Alert queue full, dropped: %s", alert["message"])
+            stats.error("alert_dropped", rule)
+
+    def _deliver(self) -> None:
+        while True:
+            alert = self._queue.get()
+            if alert is None:
+                return
+            for sink in self.sinks:
+                for attempt in range(self.retries + 1):
+                    try:
+                        sink.send(alert)
+                        break
+                    except Exception as err:
+                        if attempt == self.retries:
+                            logger.error("%s failed to deliver %s: %s", type(sink).__name__, alert["message"], err)
+                            stats.error("alert_failed", type(sink).__name__)
+                        else:
+                            sleep(self.backoff * 2 ** attempt)
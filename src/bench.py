@@ -0,0 +1,317 @@
+"""
+Benchmark of the polling and display pipeline against simulated hosts
+Author: Wolf Paulus <wolf@paulus.com>
+
+An in-process SSH server stands in for the monitored hosts. Every command runs in a local
+shell in which mpstat, free, df, ps and the thermal files return canned output,
+after an injected network latency. Run from the project root, e.g.:
+    python src/bench.py --hosts 32 --sensors 5 --sweeps 5 --latency 0.05
+"""
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+from select import select
+from argparse import ArgumentParser
+from statistics import median
+from threading import Thread, Lock
+from time import monotonic, sleep, time
+from paramiko import AUTH_SUCCESSFUL, OPEN_SUCCEEDED, RSAKey, ServerInterface, Transport
+from paramiko.ssh_exception import SSHException
+from yaml import safe_dump
+from grid import Grid
+from main import probe_host
+from monitor import ConnectionPool
+from plan import Plan
+from poller import Poller
+from display import Displays
+from log import logger
+
+CANNED = {
+    "ZM_MPSTAT": "Average:     CPU    %usr   %nice    %sys %iowait    %irq   %soft  %steal  %guest  %gnice   %idle\n"
+                 "Average:     all    2.51    0.00    1.26    0.00    0.00    0.00    0.00    0.00    0.00   96.23",
+    "ZM_FREE": "               total        used        free      shared  buff/cache   available\n"
+               "Mem:          416024      160812       49088        4720      206124      255212\n"
+               "Swap:         524284       12032      512252",
+    "ZM_DF": "Filesystem     1K-blocks    Used Available Use% Mounted on\n"
+             "/dev/root       30358348 6345884  22738236  22% /",
+    "ZM_PS": "    PID TTY          TIME CMD\n" + "\n".join(f"{pid:7d} ?        00:00:01 task" for pid in range(1, 142)),
+    "ZM_THERMAL": "48312",
+}
+
+# Shell functions shadowing the sensor commands; /proc is read from the local machine
+PRELUDE = """\
+_zm_lag() { sleep "$ZM_COMMAND_TIME"; }
+mpstat() { _zm_lag; printf '%s\\n' "$ZM_MPSTAT"; }
+free() { _zm_lag; printf '%s\\n' "$ZM_FREE"; }
+df() { _zm_lag; printf '%s\\n' "$ZM_DF"; }
+ps() { _zm_lag; printf '%s\\n' "$ZM_PS"; }
+cat() {
+  case "$1" in
+    /sys/class/*) _zm_lag; printf '%s\\n' "$ZM_THERMAL" ;;
+    *) command cat "$@" ;;
+  esac
+}
+"""
+
+SENSORS = [
+    {"name": "CpuUsage", "values": [3, 15, 30],
+     "cmd": "mpstat -P ALL 1 1 | awk '$1 == \"Average:\" && $2 == \"all\" { print 100 - $NF }'"},
+    {"name": "CpuTemperature", "values": [50, 62, 75], "cmd": "cat /sys/class/thermal/thermal_zone0/temp"},
+    {"name": "MemoryUsage", "values": [25, 50, 75], "cmd": "free"},
+    {"name": "DiskUsage", "values": [30, 55, 80], "cmd": "df /"},
+    {"name": "TaskCount", "values": [150, 175, 200], "cmd": "ps -e | wc -l"},
+    {"name": "ProcCpuUsage", "values": [3, 15, 30], "cmd": "cat /proc/stat /proc/meminfo /proc/loadavg"},
+    {"name": "ProcMemoryUsage", "values": [25, 50, 75], "cmd": "cat /proc/stat /proc/meminfo /proc/loadavg"},
+    {"name": "LoadAverage", "values": [25, 50, 100], "cmd": "cat /proc/stat /proc/meminfo /proc/loadavg"},
+]
+
+
+# Startup of the service in a fresh interpreter, printing a timestamp at each milestone
+COLD_START = """\
+import json, sys, time
+print("interpreter", time.time(), flush=True)
+src, data, kwargs = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+sys.path.insert(0, src)
+from main import show_snapshot
+from config import read, validate
+from display import Displays
+from grid import Grid
+from store import read_snapshot
+config = read(data + "/monitor.yaml")
+grid = Grid.from_config(config)
+show_snapshot([Displays.create("terminal", config, grid)], grid, read_snapshot(data))
+print("first_frame", time.time(), flush=True)
+validate(config)
+from main import probe_host
+from monitor import ConnectionPool
+from plan import Plan
+from poller import Poller
+plan = Plan(config, grid)
+pool = ConnectionPool(resolver=lambda host: dict(kwargs, username=host))
+pool.connect_all([host.hostname for host in plan.hosts])
+print("ready", time.time(), flush=True)
+poller = Poller(lambda host: probe_host(pool, host), workers=8, deadline=30, name=lambda host: host.hostname)
+for _ in poller.sweep(plan.hosts):
+    pass
+print("first_sweep", time.time(), flush=True)
+poller.shutdown()
+pool.close()
+"""
+
+
+class _Handler(ServerInterface):
+    """Accepts any password and runs exec requests with canned sensor output"""
+
+    def __init__(self, server: "FakeSSHServer") -> None:
+        self.server = server
+
+    def get_allowed_auths(self, username: str) -> str:
+        return "password"
+
+    def check_auth_password(self, username: str, password: str) -> int:
+        return AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind: str, chanid: int) -> int:
+        return OPEN_SUCCEEDED
+
+    def check_channel_exec_request(self, channel, command: bytes) -> bool:
+        Thread(target=self.server.execute, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+
+class FakeSSHServer:
+    """SSH server on localhost standing in for any number of hosts.
+    Every host alias resolves to this server, each one gets its own connection.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, command_time: float = 0.0) -> None:
+        """Start the server
+        latency, seconds added to every remote exec, e.g. the network round trip
+        jitter, up to this many seconds are randomly added to the latency
+        command_time, seconds each canned command takes, e.g. 1 for a real mpstat -P ALL 1 1
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.env = {**os.environ, **CANNED, "ZM_COMMAND_TIME": str(command_time)}
+        self.execs = 0
+        self._key = RSAKey.generate(2048)
+        self._transports: list[Transport] = []
+        self._lock = Lock()
+        self._socket = socket.create_server(("127.0.0.1", 0))
+        self.port = self._socket.getsockname()[1]
+        Thread(target=self._accept, daemon=True).start()
+
+    def connect_kwargs(self, hostname: str) -> dict:
+        """Resolver for the ConnectionPool, every host alias connects to this server"""
+        return {"hostname": "127.0.0.1", "port": self.port, "username": hostname, "password": "bench",
+                "look_for_keys": False, "allow_agent": False, "timeout": 10}
+
+    def execute(self, channel, command: str) -> None:
+        """Run a command in a local shell with the sensor commands replaced by canned output.
+        Output is sent as it is written; the command is killed when the client closes the channel.
+        """
+        sleep(self.latency + random.uniform(0, self.jitter))
+        with self._lock:
+            self.execs += 1
+        proc = subprocess.Popen(["sh", "-c", PRELUDE + command], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                env=self.env)
+        try:
+            while not channel.closed:
+                if select([proc.stdout], [], [], 0.05)[0]:
+                    chunk = os.read(proc.stdout.fileno(), 65536)
+                    if not chunk:
+                        channel.send_exit_status(proc.wait())
+                        break
+                    channel.sendall(chunk)
+        except (OSError, SSHException) as err:
+            logger.debug("Fake host exec failed: %s", err)
+        finally:
+            proc.kill()
+            proc.wait()
+            proc.stdout.close()
+            channel.close()
+
+    def close(self) -> None:
+        """Stop accepting connections and close all open ones"""
+        self._socket.close()
+        with self._lock:
+            for transport in self._transports:
+                transport.close()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                sock, _ = self._socket.accept()
+            except OSError:  # closed
+                return
+            transport = Transport(sock)
+            transport.add_server_key(self._key)
+            with self._lock:
+                self._transports.append(transport)
+            try:
+                transport.start_server(server=_Handler(self))
+            except SSHException as err:
+                logger.debug("Fake host handshake failed: %s", err)
+
+
+def run(hosts: int = 8, sensors: int = 5, sweeps: int = 3, latency: float = 0.0, jitter: float = 0.0,
+        command_time: float = 0.0, workers: int = 8, batch: bool = True, displays: list[str] | None = None) -> dict:
+    """Poll the simulated hosts like main.py does, updating the displays, by default a web display, and measure it.
+    Returns: dict with sweep times (s), probes/sec, CPU seconds and max. RSS (MB) of this process,
+    and the time-to-first-pixel (s), i.e. from startup to the first valid reading on the display.
+    Note that the CPU time includes the in-process SSH server.
+    """
+    server = FakeSSHServer(latency, jitter, command_time)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    start = monotonic()
+    config = {
+        "hosts": [{"hostname": f"host{hi:03d}"} for hi in range(hosts)],
+        "sensors": {f"{s['name']}{si}": s for si, s in enumerate(SENSORS[i % len(SENSORS)] for i in range(sensors))},
+        "displays": {"neopixel": {"mode": 3}, "web": {"port": 0}},
+    }
+    plan = Plan(config)
+    display = Displays.from_config(config, plan.grid, displays or ["web"])
+    pool = ConnectionPool(resolver=server.connect_kwargs)
+    poller = Poller(lambda host: probe_host(pool, host, batch), workers=workers, deadline=30,
+                    name=lambda host: host.hostname)
+    first_pixel, probes, errors, times = None, 0, 0, []
+    try:
+        for _ in range(sweeps):
+            for hi, results in poller.sweep(plan.hosts):
+                for entry, result in zip(plan.hosts[hi].sensors, results or [(-1, -1)] * sensors):
+                    if result[1] < 0:
+                        errors += 1
+                        continue
+                    probes += 1
+                    display.update(*entry.cell, result)
+                    if first_pixel is None:
+                        first_pixel = monotonic() - start
+                display.flush()
+            times.append(poller.last_sweep)
+    finally:
+        poller.shutdown()
+        pool.close()
+        display.close()
+        server.close()
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "hosts": hosts,
+        "sensors": sensors,
+        "sweeps": times,
+        "probes": probes,
+        "errors": errors,
+        "execs": server.execs,
+        "probes_per_sec": probes / sum(times) if sum(times) else 0.0,
+        "cpu": after.ru_utime + after.ru_stime - usage.ru_utime - usage.ru_stime,
+        "max_rss": after.ru_maxrss / 1024,
+        "first_pixel": first_pixel,
+    }
+
+
+def cold_start(hosts: int = 8, sensors: int = 5, latency: float = 0.0) -> dict:
+    """Start the service's startup path in a fresh interpreter, against simulated hosts, and time it.
+    Returns: dict with the seconds from process start until the interpreter runs, the last known grid is
+    drawn from the snapshot (first_frame), the SSH stack is loaded and connecting (ready), and the
+    first sweep is done (first_sweep).
+    """
+    server = FakeSSHServer(latency)
+    config = {
+        "hosts": [{"hostname": f"host{hi:03d}"} for hi in range(hosts)],
+        "sensors": {f"{s['name']}{si}": s for si, s in enumerate(SENSORS[i % len(SENSORS)] for i in range(sensors))},
+        "displays": {"neopixel": {"mode": 3}},
+    }
+    grid = Grid.from_config(config)
+    cells = [{"host": host, "sensor": sensor, "value": 1, "color": 0} for host in grid.hosts for sensor in grid.sensors]
+    try:
+        with tempfile.TemporaryDirectory() as data:
+            with open(os.path.join(data, "monitor.yaml"), "w", encoding="utf-8") as file:
+                safe_dump(config, file, sort_keys=False)
+            with open(os.path.join(data, "grid.json"), "w", encoding="utf-8") as file:
+                json.dump({"cells": cells}, file)
+            start = time()
+            out = subprocess.run([sys.executable, "-c", COLD_START, os.path.dirname(os.path.abspath(__file__)), data,
+                                  json.dumps(server.connect_kwargs(""))], capture_output=True, text=True, check=True)
+    finally:
+        server.close()
+    return {milestone: float(ts) - start for milestone, ts in (line.split() for line in out.stdout.splitlines())}
+
+
+def report(result: dict) -> str:
+    """Format a benchmark result as text"""
+    times = result["sweeps"]
+    first_pixel = result["first_pixel"]
+    return "\n".join([
+        f"hosts x sensors      {result['hosts']} x {result['sensors']}",
+        f"sweeps               {len(times)}",
+        f"sweep time (s)       first {times[0]:.3f}  median {median(times):.3f}  max {max(times):.3f}",
+        f"probes/sec           {result['probes_per_sec']:.1f}  ({result['probes']} ok, {result['errors']} failed, "
+        f"{result['execs']} remote execs)",
+        f"cpu time (s)         {result['cpu']:.2f}",
+        f"max rss (MB)         {result['max_rss']:.1f}",
+        "time-to-first-pixel  " + (f"{first_pixel:.3f} s" if first_pixel is not None else "never"),
+    ])
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark ZeroMonitor against simulated hosts")
+    parser.add_argument("--hosts", type=int, default=8, help="number of simulated hosts")
+    parser.add_argument("--sensors", type=int, default=5, help="sensors per host")
+    parser.add_argument("--sweeps", type=int, default=3, help="number of sweeps to measure")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every remote exec")
+    parser.add_argument("--jitter", type=float, default=0.0, help="max. random seconds added to the latency")
+    parser.add_argument("--command-time", type=float, default=0.0, help="seconds each sensor command takes")
+    parser.add_argument("--workers", type=int, default=8, help="hosts probed in parallel")
+    parser.add_argument("--no-batch", dest="batch", action="store_false", help="one remote exec per sensor")
+    parser.add_argument("--displays", nargs="+", default=["web"], help="display backends to update, e.g. web png")
+    parser.add_argument("--cold-start", action="store_true", help="also time the startup in a fresh interpreter")
+    args = parser.parse_args()
+    print(report(run(args.hosts, args.sensors, args.sweeps, args.latency, args.jitter, args.command_time,
+                     args.workers, args.batch, args.displays)))
+    if args.cold_start:
+        times = cold_start(args.hosts, args.sensors, args.latency)
+        print("\n".join(f"cold start, {milestone:<12}{seconds:.3f} s" for milestone, seconds in times.items()))
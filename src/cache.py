@@ -0,0 +1,100 @@
+"""
+Probe result cache with TTL, LRU eviction and request coalescing
+Author: Wolf Paulus <wolf@paulus.com>
+"""
+from collections import OrderedDict
+from threading import Event, Lock
+from time import monotonic
+from typing import Any, Callable, Hashable, Iterable
+
+
+class _Flight:
+    """A fetch in progress, other callers asking for the same key wait for it"""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = Event()
+        self.value: Any = None
+        self.error: Exception | None = None
+
+
+class ProbeCache:
+    """Caches results, e.g. command output keyed by (resolved host, command), for ttl seconds.
+    At most size results are kept, the least recently used are evicted first.
+    Concurrent requests for a key that is not cached are coalesced into a single fetch (single-flight).
+    """
+
+    def __init__(self, ttl: float = 1.0, size: int = 256) -> None:
+        self.ttl = ttl
+        self.size = size
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()  # key -> (expires, value)
+        self._flights: dict[Hashable, _Flight] = {}
+        self._lock = Lock()
+
+    def get(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """Return the cached value for key, calling fetch() if there is none"""
+        return self.get_many([key], lambda keys: {key: fetch()})[key]
+
+    def get_many(self, keys: Iterable[Hashable], fetch: Callable[[list], dict]) -> dict:
+        """Return the values for all keys.
+        Keys that are neither cached nor being fetched by another caller are fetched together
+        with one call to fetch(missing_keys), which returns a dict of key -> value.
+        fetch may return an exception as the value of a key, e.g. a timeout: it is handed to the
+        callers waiting for the key, but not cached.
+        Raises: whatever fetch raised, also in callers waiting for that fetch.
+        """
+        results, leading, waiting = {}, [], {}
+        now = monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    results[key] = entry[1]
+                elif key in self._flights:
+                    waiting[key] = self._flights[key]
+                else:
+                    self._flights[key] = _Flight()
+                    leading.append(key)
+        if leading:
+            values = self._lead(leading, fetch)
+            results.update((key, values.get(key)) for key in leading)
+        for key, flight in waiting.items():
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            results[key] = flight.value
+        return results
+
+    def clear(self) -> None:
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+
+    def _lead(self, keys: list, fetch: Callable[[list], dict]) -> dict:
+        """Fetch the keys this caller is responsible for and release everyone waiting on them"""
+        with self._lock:
+            flights = {key: self._flights[key] for key in keys}
+        try:
+            values = fetch(keys)
+        except Exception as err:
+            for flight in flights.values():
+                flight.error = err
+            raise
+        else:
+            expires = monotonic() + self.ttl
+            with self._lock:
+                for key, flight in flights.items():
+                    flight.value = values.get(key)
+                    if flight.value is not None and not isinstance(flight.value, Exception):
+                        self._entries[key] = expires, flight.value
+                        self._entries.move_to_end(key)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+            return values
+        finally:
+            with self._lock:
+                for key, flight in flights.items():
+                    self._flights.pop(key, None)
+                    flight.done.set()
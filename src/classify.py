@@ -0,0 +1,120 @@
+"""
+Classification of sensor values into color bands, with smoothing and hysteresis
+Author: Wolf Paulus <wolf@paulus.com>
+
+Three thresholds t0 < t1 < t2 give five band boundaries [t0, (t0+t1)/2, t1, (t1+t2)/2, t2];
+a value's band is the number of boundaries below it: 0 (blue, at or below t0) to 5 (pink, above t2).
+"""
+from bisect import bisect_left
+from collections import deque
+from statistics import median
+from typing import TYPE_CHECKING, Sequence
+
+if TYPE_CHECKING:
+    from plan import HostPlan, Plan
+
+OFFLINE, TIMEOUT = -1, -2  # error states, reported as (state, state) instead of (value, band)
+NO_BOUNDS = (float("inf"),) * 5  # a sensor without thresholds is always in band 0
+
+
+def boundaries(values: Sequence[float] | None) -> tuple[float, ...]:
+    """Return the five band boundaries of three thresholds"""
+    if not values:
+        return NO_BOUNDS
+    t0, t1, t2 = values
+    return t0, t1 - (t1 - t0) / 2, t1, t2 - (t2 - t1) / 2, t2
+
+
+def band(value: float, bounds: Sequence[float]) -> int:
+    """Return the color band (0..5) of a value, the error state itself for a negative value"""
+    return bisect_left(bounds, value) if value >= 0 else int(value)
+
+
+class Classifier:
+    """Classifies the readings of a plan's sensors, keeping per-sensor state between sweeps.
+    Sensor settings:
+        smoothing: ewma or median, the raw value is used if not set
+        alpha: weight of the newest value for ewma, 0.3 by default
+        window: number of values the median is taken of, 5 by default
+        hysteresis: a band is entered only once the value is this far past its boundary, and left
+            only once the value is this far back on the other side; 0 by default
+    """
+
+    def __init__(self, plan: "Plan", previous: "Classifier | None" = None) -> None:
+        """Initialize the per-sensor state of the plan's sensors.
+        previous, the classifier of the plan before a reload: the smoothing and hysteresis state
+        of the sensors whose host, name and settings are unchanged is carried over from it
+        """
+        entries, self._offsets = [], {}  # host index -> index of the host's first sensor in entries
+        self._keys: list[tuple[str, str]] = []  # (hostname, sensor name) per entry
+        for host in plan.hosts:
+            self._offsets[host.hi] = len(entries)
+            entries.extend(host.sensors)
+            self._keys.extend((host.hostname, entry.name) for entry in host.sensors)
+        self._settings = [entry.settings for entry in entries]
+        self._bounds = [boundaries(entry.settings.get("values")) for entry in entries]
+        self._hysteresis = [float(entry.settings.get("hysteresis", 0)) for entry in entries]
+        self._alpha = [float(entry.settings.get("alpha", 0.3)) if entry.settings.get("smoothing") == "ewma" else 1.0
+                       for entry in entries]
+        self._recent = {i: deque(maxlen=int(entry.settings.get("window", 5)))
+                        for i, entry in enumerate(entries) if entry.settings.get("smoothing") == "median"}
+        self._smoothed = [-1.0] * len(entries)  # -1: no previous value
+        self._band = [-1] * len(entries)
+        if previous is not None:
+            self._carry_over(previous)
+
+    def host(self, host: "HostPlan", results: Sequence[tuple[int, int] | None]) -> list[tuple[int, int] | None]:
+        """Classify a host's probe results, None (not sampled) stays None.
+        Returns: one (smoothed value, color band) per sensor
+        """
+        offset = self._offsets[host.hi]
+        sampled = [si for si, result in enumerate(results) if result is not None]
+        classified = self.classify([offset + si for si in sampled], [results[si][0] for si in sampled])
+        shown: list[tuple[int, int] | None] = [None] * len(results)
+        for si, result in zip(sampled, classified):
+            shown[si] = result
+        return shown
+
+    def classify(self, indices: Sequence[int], values: Sequence[float]) -> list[tuple[int, int]]:
+        """Classify a batch of readings, given by sensor index into the plan and raw value.
+        Returns: (smoothed value, color band) per reading, (state, state) for error states, e.g. (-1, -1)
+        """
+        smoothed = [self._smooth(i, value) for i, value in zip(indices, values)]
+        bands = [self._band_of(i, value) for i, value in zip(indices, smoothed)]
+        for i, b in zip(indices, bands):
+            self._band[i] = b
+        return [(round(value), b) if b >= 0 else (b, b) for value, b in zip(smoothed, bands)]
+
+    def _carry_over(self, previous: "Classifier") -> None:
+        index = {key: i for i, key in enumerate(previous._keys)}
+        for i, key in enumerate(self._keys):
+            j = index.get(key)
+            if j is None or previous._settings[j] != self._settings[i]:
+                continue
+            self._smoothed[i], self._band[i] = previous._smoothed[j], previous._band[j]
+            if i in self._recent:
+                self._recent[i].extend(previous._recent[j])
+
+    def _smooth(self, i: int, value: float) -> float:
+        if value < 0:  # error: forget the past, the next valid value starts over
+            self._smoothed[i] = -1.0
+            if i in self._recent:
+                self._recent[i].clear()
+            return value
+        if i in self._recent:
+            self._recent[i].append(value)
+            value = median(self._recent[i])
+        elif self._smoothed[i] >= 0:
+            value = self._alpha[i] * value + (1 - self._alpha[i]) * self._smoothed[i]
+        self._smoothed[i] = value
+        return value
+
+    def _band_of(self, i: int, value: float) -> int:
+        bounds, previous = self._bounds[i], self._band[i]
+        if value < 0:
+            return int(value)
+        if previous < 0 or not self._hysteresis[i]:
+            return bisect_left(bounds, value)
+        h = self._hysteresis[i]
+        # stay in the previous band unless the value is more than h past one of its boundaries
+        return min(max(previous, bisect_left(bounds, value - h)), bisect_left(bounds, value + h))
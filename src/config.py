@@ -0,0 +1,214 @@
+"""
+Loading, validating and watching the monitoring configuration (monitor.yaml)
+Author: Wolf Paulus <wolf@paulus.com>
+"""
+import os
+from typing import NamedTuple
+from yaml import load as yaml_load, YAMLError
+from log import logger
+
+try:
+    from yaml import CSafeLoader as SafeLoader  # libyaml, several times faster
+except ImportError:
+    from yaml import SafeLoader
+
+CONFIG = "monitor.yaml"
+# optional sections, mappings of settings if present
+SECTIONS = ("displays", "displays.neopixel", "displays.grid", "displays.web", "displays.terminal", "displays.png",
+            "polling", "history", "debug", "alerts", "ingest", "federation")
+
+
+class Changes(NamedTuple):
+    """Difference between two configurations"""
+    hosts: set[str]  # hostnames added, removed or with changed settings
+    sensors: set[str]  # sensor keys added, removed, moved or with changed settings
+    settings: set[str]  # other changed settings, e.g. "polling.workers" or "displays.neopixel.mode"
+
+
+def load(path: str = CONFIG) -> dict:
+    """Read and validate the configuration file.
+    Raises: OSError if the file cannot be read, ValueError if it is not a valid configuration.
+    """
+    cfg = read(path)
+    validate(cfg)
+    return cfg
+
+
+def read(path: str = CONFIG):
+    """Parse the configuration file without validating it, e.g. to light the LEDs before the
+    sensor classes (and with them the SSH stack) are imported.
+    Raises: OSError if the file cannot be read, ValueError if it is not valid YAML.
+    """
+    with open(path, encoding='utf-8') as file:
+        try:
+            return yaml_load(file, Loader=SafeLoader)
+        except YAMLError as err:
+            raise ValueError(f"{path} is not valid YAML: {err}") from err
+
+
+def validate(cfg) -> None:
+    """Check the parts of the configuration the monitoring loop relies on.
+    Raises: ValueError describing the first problem found.
+    """
+    from alerts import SINKS  # imported here, with the sensor classes, to keep read() light
+    from display import Display
+    from monitor import Monitor
+    if not isinstance(cfg, dict):
+        raise ValueError("The configuration must be a mapping.")
+    sensors = cfg.get("sensors")
+    if not isinstance(sensors, dict) or not sensors:
+        raise ValueError("'sensors' must map sensor keys to sensor settings.")
+    for key, sensor in sensors.items():
+        if not isinstance(sensor, dict):
+            raise ValueError(f"Sensor {key} must be a mapping.")
+        name = sensor.get("name")
+        if Monitor.sensor_class(str(name)) is None:
+            raise ValueError(f"Sensor {key}: unknown sensor class {name}.")
+        _validate_sensor(key, sensor)
+    for path in SECTIONS:
+        _section(cfg, path)
+    peers = _section(cfg, "federation").get("peers", [])
+    if not isinstance(peers, list) or not all(isinstance(p, str) and p.startswith(("http://", "https://"))
+                                              for p in peers):
+        raise ValueError("federation.peers must be a list of http(s) URLs.")
+    hosts = cfg.get("hosts")
+    if not isinstance(hosts, list) or not (hosts or peers):  # an aggregating instance may poll no hosts itself
+        raise ValueError("'hosts' must be a list of hosts.")
+    names = set()
+    for host in hosts:
+        hostname = host.get("hostname") if isinstance(host, dict) else None
+        if not isinstance(hostname, str) or not hostname:
+            raise ValueError(f"Host {host} has no hostname.")
+        if hostname in names:
+            raise ValueError(f"Host {hostname} is listed twice.")
+        names.add(hostname)
+        if host.get("push") and not isinstance(cfg.get("ingest"), dict):
+            raise ValueError(f"Host {hostname} pushes its values, but there is no 'ingest' section.")
+        for sensor in sensors.values():
+            override = host.get(sensor["name"])
+            if override is not None:
+                if not isinstance(override, dict):
+                    raise ValueError(f"Host {hostname}: {sensor['name']} must be a mapping.")
+                _validate_sensor(f"{sensor['name']} of {hostname}", override)
+    mode = _section(cfg, "displays.neopixel").get("mode", 1)
+    if mode not in (1, 2, 3, 4):
+        raise ValueError(f"Display mode must be 1, 2, 3 or 4, not {mode}.")
+    cols = _section(cfg, "displays.grid").get("cols", 1)
+    if not (_count(cols) and cols > 0):
+        raise ValueError(f"displays.grid.cols must be a positive number of cells, not {cols}.")
+    backends = _section(cfg, "displays").get("backends", [])
+    if not isinstance(backends, list):
+        raise ValueError("displays.backends must be a list of display names.")
+    for name in backends:
+        if Display.backend_class(str(name)) is None:
+            raise ValueError(f"Unknown display {name}.")
+    polling = _section(cfg, "polling")
+    for key in ("workers", "deadline", "interval", "timeout"):
+        if key in polling and not (isinstance(polling[key], (int, float)) and polling[key] >= 0):
+            raise ValueError(f"polling.{key} must be a non-negative number.")
+    tiers = _section(cfg, "history").get("tiers", [[0, 1]])
+    if not isinstance(tiers, list) or not tiers:
+        raise ValueError("history.tiers must list [bucket seconds, buckets kept] pairs.")
+    for tier in tiers:
+        if not (isinstance(tier, (list, tuple)) and len(tier) == 2 and all(_count(v) for v in tier)
+                and tier[1] > 0):
+            raise ValueError(f"history.tiers: {tier} must be [bucket seconds, buckets kept], "
+                             "bucket seconds not negative (0 keeps raw samples), buckets kept positive.")
+    alerts = _section(cfg, "alerts")
+    if not all(isinstance(alerts.get(key, []), list) for key in ("rules", "sinks")):
+        raise ValueError("alerts.rules and alerts.sinks must be lists.")
+    for rule in alerts.get("rules", []):
+        if (not isinstance(rule, dict) or "name" not in rule or ("band" in rule) == ("offline" in rule)
+                or set(rule) - {"name", "band", "samples", "offline", "hosts", "sensors"}):
+            raise ValueError(f"Alert rule {rule} needs a name and either band or offline.")
+    for sink in alerts.get("sinks", []):
+        if not (isinstance(sink, dict) and len(sink) == 1 and next(iter(sink)) in SINKS):
+            raise ValueError(f"Alert sink {sink} must be one of {', '.join(SINKS)}.")
+
+
+def _section(cfg: dict, path: str) -> dict:
+    """Return the section at the dotted path, empty if it is not there.
+    Raises: ValueError if it is not a mapping, e.g. when all of its settings are commented out.
+    """
+    section = cfg
+    for key in path.split("."):
+        section = section.get(key, {})
+        if not isinstance(section, dict):
+            raise ValueError(f"'{path}' must be a mapping of settings.")
+    return section
+
+
+def _count(value) -> bool:
+    """True for a non-negative int, YAML booleans excluded"""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def _validate_sensor(key: str, sensor: dict) -> None:
+    if "cmd" in sensor and not isinstance(sensor["cmd"], str):
+        raise ValueError(f"Sensor {key}: cmd must be a string.")
+    values = sensor.get("values")
+    if values is not None:
+        if (not isinstance(values, list) or len(values) != 3
+                or not all(isinstance(v, (int, float)) for v in values) or values != sorted(values)):
+            raise ValueError(f"Sensor {key}: values must be three ascending thresholds.")
+    if sensor.get("smoothing") not in (None, "ewma", "median"):
+        raise ValueError(f"Sensor {key}: smoothing must be ewma or median.")
+    if "timeout" in sensor and not (isinstance(sensor["timeout"], (int, float)) and sensor["timeout"] > 0):
+        raise ValueError(f"Sensor {key}: timeout must be a positive number of seconds.")
+    alpha, window, hysteresis = sensor.get("alpha", 0.3), sensor.get("window", 5), sensor.get("hysteresis", 0)
+    if not all(isinstance(v, (int, float)) for v in (alpha, window, hysteresis)) \
+            or not 0 < alpha <= 1 or window < 1 or hysteresis < 0:
+        raise ValueError(f"Sensor {key}: alpha must be in (0, 1], window at least 1, hysteresis not negative.")
+
+
+def diff(old: dict, new: dict) -> Changes:
+    """Compare two configurations, see Changes"""
+    old_hosts = {h["hostname"]: h for h in old.get("hosts", [])}
+    new_hosts = {h["hostname"]: h for h in new.get("hosts", [])}
+    hosts = {name for name in old_hosts.keys() | new_hosts.keys() if old_hosts.get(name) != new_hosts.get(name)}
+    old_sensors, new_sensors = old.get("sensors", {}), new.get("sensors", {})
+    old_index, new_index = {k: i for i, k in enumerate(old_sensors)}, {k: i for i, k in enumerate(new_sensors)}
+    sensors = {key for key in old_index.keys() | new_index.keys()
+               if old_sensors.get(key) != new_sensors.get(key) or old_index.get(key) != new_index.get(key)}
+    rest = ({k: v for k, v in cfg.items() if k not in ("hosts", "sensors")} for cfg in (old, new))
+    return Changes(hosts, sensors, _changed("", *rest))
+
+
+def _changed(prefix: str, before, after) -> set[str]:
+    """Dotted paths of the settings that differ, e.g. {"polling.workers"}"""
+    if not (isinstance(before, dict) and isinstance(after, dict)):
+        return {prefix} if before != after else set()
+    paths = set()
+    for key in before.keys() | after.keys():
+        paths |= _changed(f"{prefix}.{key}" if prefix else str(key), before.get(key), after.get(key))
+    return paths
+
+
+class ConfigWatcher:
+    """Watches the configuration file for changes by its modification time"""
+
+    def __init__(self, path: str = CONFIG) -> None:
+        self.path = path
+        self._mtime = self._stat()
+
+    def poll(self) -> dict | None:
+        """Return the new configuration if the file changed and is valid, None otherwise.
+        An invalid change is logged and ignored, the running configuration stays in effect.
+        """
+        mtime = self._stat()
+        if mtime is None or mtime == self._mtime:
+            return None
+        self._mtime = mtime
+        try:
+            cfg = load(self.path)
+        except (OSError, ValueError) as err:
+            logger.error("Rejected the change to %s, keeping the running configuration. %s", self.path, err)
+            return None
+        logger.info("Configuration %s changed, reloading.", self.path)
+        return cfg
+
+    def _stat(self) -> float | None:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
@@ -1,17 +1,88 @@
-"""Display management module for LED strip control.
+"""Display management module for LED strip control, and the other display backends.
 Author: Wolf Paulus <wolf@paulus.com>
 Version: 1.0
 """
+import os
+import struct
 import sys
+import zlib
 from abc import ABC, abstractmethod
-from time import sleep
+from importlib import import_module
+from importlib.metadata import entry_points
+from math import ceil
+from threading import Thread, Lock, Event
+from time import sleep, monotonic, perf_counter
 from datetime import datetime
-from rpi_ws281x import PixelStrip, Color  # type: ignore
+from classify import TIMEOUT
+from grid import Grid
 from log import logger
+from stats import stats
+
+ENTRY_POINTS = "zeromonitor.displays"  # entry point group of third-party display backends
+DISPLAYS: dict[str, type["Display"]] = {}  # backend name -> class, see Display.__init_subclass__
+MODULES = {"web": "websvr"}  # built-in backends defined in other modules, imported when first needed
+BACKENDS = ["neopixel", "web"]  # used if displays.backends is not configured
+_plugins_loaded = False
+
+# RGB colors of the color codes 0–5, plus off (-1) and timed out (-2), matching websvr.CSS_COLORS
+RGB = [(0, 0, 255), (0, 200, 200), (0, 255, 0), (200, 200, 0), (255, 0, 0), (255, 0, 255)]
+RGB_OFF, RGB_TIMEOUT = (30, 30, 30), (90, 90, 90)
+
+
+def Color(red: int, green: int, blue: int, white: int = 0) -> int:
+    """Color of a pixel on the LED strip, encoded like rpi_ws281x.Color, which is imported with the strip only"""
+    return (white << 24) | (red << 16) | (green << 8) | blue
+
+
+def rgb(color_idx: int) -> tuple[int, int, int]:
+    """Return the RGB color of a color code"""
+    if 0 <= color_idx < len(RGB):
+        return RGB[color_idx]
+    return RGB_TIMEOUT if color_idx == TIMEOUT else RGB_OFF
+
+
+class DisplayError(Exception):
+    """A display backend cannot be started, e.g. there is no LED hardware"""
 
 
 class Display(ABC):
-    """Abstract base class for display management."""
+    """Abstract base class for display management.
+    Every subclass with a name is registered as a display backend under that name, which is what
+    displays.backends in monitor.yaml lists. Backends shipped in other packages are found through
+    the "zeromonitor.displays" entry point group.
+    """
+
+    name: str | None = None  # backend name in monitor.yaml
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if cls.__dict__.get("name"):  # not a subclass of a backend that keeps its name
+            DISPLAYS[cls.name] = cls
+
+    @staticmethod
+    def backend_class(name: str) -> type["Display"] | None:
+        """Return the display backend with the given name, importing its module or the entry points on first use"""
+        global _plugins_loaded
+        if name not in DISPLAYS and name in MODULES:
+            import_module(MODULES[name])
+        if name not in DISPLAYS and not _plugins_loaded:
+            _plugins_loaded = True
+            for entry_point in entry_points(group=ENTRY_POINTS):
+                try:
+                    class_ = entry_point.load()
+                    if isinstance(class_, type) and issubclass(class_, Display):
+                        DISPLAYS.setdefault(entry_point.name, class_)
+                except Exception as err:
+                    logger.error("Error loading display plugin %s: %s", entry_point.name, err)
+        return DISPLAYS.get(name)
+
+    @classmethod
+    def from_config(cls, cfg: dict, grid: Grid, **context) -> "Display":
+        """Create the backend for the configuration and grid.
+        context, services some backends use, e.g. history and ingest for the web display
+        Raises: DisplayError if the backend cannot be started.
+        """
+        return cls(cfg, grid)
 
     @abstractmethod
     def update(self, hi: int, si: int, values: tuple[int, int]) -> None:
@@ -22,6 +93,15 @@ class Display(ABC):
             values (tuple[int,int]): Values to display, e.g., (value, color_code).
         """
 
+    def flush(self) -> None:
+        """Publish the updates made since the last flush, e.g. after all sensors of a host were probed."""
+
+    def relayout(self, grid: Grid, moves: dict[tuple[int, int], tuple[int, int]]) -> None:
+        """Switch to a new grid layout; moves maps old (col, row) cells to the new cells showing the same sensor."""
+
+    def close(self) -> None:
+        """Release the backend's resources, e.g. write a last frame"""
+
 
 class NeoDisplay(Display):
     """Display class to manage the LED strip and its configuration.
@@ -33,10 +113,16 @@ class NeoDisplay(Display):
     23 22 21 20 19 18 17 16   == (ROWS - i) * COLS - h - 1
     15 14 13 12 11 10 09 08.  E.g. h = 2, i = 3 : (4 - 3)*8 - 2 - 1 = 4
     07 06 05 04 03 02 01 00
+
+    Several HATs can be chained side by side (panels), the strip continues with
+    index 32 on the second panel. A virtual grid larger than the LEDs is split into
+    pages of panel size, which are shown in turn for page seconds each.
     """
 
+    name = "neopixel"
     ROWS, COLS = 4, 8
     COLOR_OFF = Color(0, 0, 0)
+    COLOR_TIMEOUT = Color(6, 6, 6)  # dim white: the sensor's command timed out
     COLORS = [
         Color(0, 0, 31),    # 0: blue    — low/idle
         Color(0, 15, 15),   # 1: cyan    — below normal
@@ -46,8 +132,12 @@ class NeoDisplay(Display):
         Color(31, 0, 31),   # 5: pink    — critical
     ]
 
-    def __init__(self, cfg: dict):
+    def __init__(self, cfg: dict, grid: Grid | None = None):
+        """Initialize the LED strip
+        Raises: DisplayError if the strip cannot be started, e.g. rpi_ws281x is missing or there is no hardware.
+        """
         try:
+            from rpi_ws281x import PixelStrip  # type: ignore  # imported here, only the LEDs need it
             neo_cfg = cfg.get("displays", {}).get("neopixel", {})
             self.on = datetime.strptime(
                 neo_cfg.get("on_"), "%H:%M"
@@ -55,10 +145,13 @@ class NeoDisplay(Display):
             self.off = datetime.strptime(
                 neo_cfg.get("off_"), "%H:%M"
             ).time()
-            self.timeout = neo_cfg.get("sensor_timeout", 0.5)
+            self.blink = neo_cfg.get("blink", 0.25)
+            self.fps = neo_cfg.get("fps", 20)
+            self.page = neo_cfg.get("page", 10)
+            self.panels = neo_cfg.get("panels", 1)
             self.brightness = neo_cfg.get("brightness", 63)
             self.strip = PixelStrip(
-                num=32,
+                num=NeoDisplay.ROWS * NeoDisplay.COLS * self.panels,
                 pin=18,
                 freq_hz=800_000,
                 dma=10,
@@ -68,34 +161,129 @@ class NeoDisplay(Display):
             )
             self.strip.begin()
         except Exception as err:
-            logger.error("Error connecting to neo-pixels: %s", err)
-            sys.exit(1)
+            raise DisplayError(f"Error connecting to neo-pixels: {err}") from err
+        grid = grid if grid is not None else Grid.from_config(cfg)
+        self._cols, self._rows = grid.cols, grid.rows
+        self._pages = self._layout_pages()
+        self._cells = [NeoDisplay.COLOR_OFF] * self._cols * self._rows  # color of every virtual grid cell
+        self._blinking: dict[int, float] = {}  # cell index -> time its blink ends
+        self._pending: dict[int, int] = {}  # cell index -> color, queued by update()
+        self._relayout: tuple | None = None  # (cols, rows, pages, cell index moves), queued by relayout()
+        self._lock = Lock()
+        self._wake = Event()
+        self._thread = Thread(target=self._render, daemon=True)
+        self._thread.start()
 
     def update(self, hi: int, si: int, values: tuple[int, int]) -> None:
         """Update the display for a given host and sensor.
+        Only queues the new color, the render thread shows it with its next frame.
         Args:
             hi (int): Host index.
             si (int): Sensor index.
             values (tuple[int,int]): Values to display, e.g., (value, color_code).
         """
-        sleep(self.timeout)
-        if self._is_active():
-            self.strip.setBrightness(self.brightness)
-            index = (
-                NeoDisplay.COLS * NeoDisplay.ROWS - 1 - hi - si * NeoDisplay.COLS
-            )  # Calculate the index based on host and sensor
-            # hi = 0, si = 3 -> 31 - 0 - 3 * 8 = 7
-            # hi = 3, si = 0 -> 31 - 3 - 0 * 8 = 28
-            # hi = 7, si = 3 -> 31 - 7 - 3 * 8 = 0
-            self.strip.setPixelColor(index, NeoDisplay.COLOR_OFF)
-            self.strip.show()
-            sleep(0.25)
-            color_idx = values[1]
-            color = NeoDisplay.COLORS[color_idx] if 0 <= color_idx < len(NeoDisplay.COLORS) else NeoDisplay.COLOR_OFF
-            self.strip.setPixelColor(index, color)
-        else:
-            self.strip.setBrightness(0)
-        self.strip.show()
+        if not (0 <= hi < self._cols and 0 <= si < self._rows):
+            return
+        start = perf_counter()
+        color_idx = values[1]
+        color = NeoDisplay.COLORS[color_idx] if 0 <= color_idx < len(NeoDisplay.COLORS) else \
+            NeoDisplay.COLOR_TIMEOUT if color_idx == TIMEOUT else NeoDisplay.COLOR_OFF
+        with self._lock:
+            self._pending[si * self._cols + hi] = color
+        self._wake.set()
+        stats.observe("update", "neopixel", perf_counter() - start)
+
+    def relayout(self, grid: Grid, moves: dict[tuple[int, int], tuple[int, int]]) -> None:
+        """Switch to a new grid layout, the render thread picks it up with its next frame.
+        Cells keep their colors where moves maps them to a new cell.
+        """
+        cols, rows = grid.cols, grid.rows
+        pages = self._layout_pages(cols, rows)
+        with self._lock:
+            index = {row * self._cols + col: new_row * cols + new_col
+                     for (col, row), (new_col, new_row) in moves.items()}
+            self._pending = {index[cell]: color for cell, color in self._pending.items() if cell in index}
+            if self._relayout is not None:  # not picked up yet, chain the moves
+                index = {cell: index[moved] for cell, moved in self._relayout[3].items() if moved in index}
+            self._relayout = cols, rows, pages, index
+            self._cols, self._rows = cols, rows
+        self._wake.set()
+
+    def _layout_pages(self, grid_cols: int | None = None, grid_rows: int | None = None) -> list[list[int]]:
+        """Precompute, for every page, the virtual cell index shown by each pixel (-1 for none)."""
+        grid_cols = self._cols if grid_cols is None else grid_cols
+        grid_rows = self._rows if grid_rows is None else grid_rows
+        cols, rows = NeoDisplay.COLS * self.panels, NeoDisplay.ROWS
+        pages = []
+        for page_row in range(ceil(grid_rows / rows)):
+            for page_col in range(ceil(grid_cols / cols)):
+                pixels = [-1] * cols * rows
+                for row in range(rows):
+                    for col in range(cols):
+                        vcol, vrow = page_col * cols + col, page_row * rows + row
+                        if vcol < grid_cols and vrow < grid_rows:
+                            panel, hi = divmod(col, NeoDisplay.COLS)
+                            # hi = 0, si = 3 -> 31 - 0 - 3 * 8 = 7
+                            # hi = 3, si = 0 -> 31 - 3 - 0 * 8 = 28
+                            # hi = 7, si = 3 -> 31 - 7 - 3 * 8 = 0
+                            index = NeoDisplay.COLS * NeoDisplay.ROWS * (panel + 1) - 1 - hi - row * NeoDisplay.COLS
+                            pixels[index] = vrow * grid_cols + vcol
+                pages.append(pixels)
+        return pages
+
+    def _render(self) -> None:
+        """Render loop: applies queued updates, blink animations and page rotation,
+        with at most one strip.show() per frame.
+        An updated cell blinks, i.e. it is turned off for the blink duration before showing its new color.
+        """
+        shown: tuple | None = None
+        while True:
+            now = monotonic()
+            wakeup = min(self._blinking.values(), default=now + 1)  # at least once a second to follow the schedule
+            if len(self._pages) > 1:
+                wakeup = min(wakeup, (now // self.page + 1) * self.page)
+            self._wake.wait(max(0.0, wakeup - now))
+            self._wake.clear()
+            start = monotonic()
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                relayout, self._relayout = self._relayout, None
+            if relayout is not None:
+                cols, rows, self._pages, index = relayout
+                cells = [NeoDisplay.COLOR_OFF] * cols * rows
+                for cell, moved in index.items():
+                    cells[moved] = self._cells[cell]
+                self._cells = cells
+                self._blinking = {index[cell]: until for cell, until in self._blinking.items() if cell in index}
+            for cell, color in pending.items():
+                self._cells[cell] = color
+                self._blinking[cell] = start + self.blink
+            for cell in [c for c, until in self._blinking.items() if until <= start]:
+                del self._blinking[cell]
+            active = self._is_active()
+            frame = None
+            if active:
+                pixels = self._pages[int(start // self.page) % len(self._pages)]
+                frame = tuple(
+                    NeoDisplay.COLOR_OFF if cell < 0 or cell in self._blinking else self._cells[cell]
+                    for cell in pixels
+                )
+            if frame != shown:  # coalesce: only push to the strip when something visible changed
+                show = perf_counter()
+                try:
+                    if active:
+                        self.strip.setBrightness(self.brightness)
+                        for index, color in enumerate(frame):
+                            self.strip.setPixelColor(index, color)
+                    else:
+                        self.strip.setBrightness(0)
+                    self.strip.show()
+                    shown = frame
+                    stats.observe("show", "neopixel", perf_counter() - show)
+                except Exception as err:
+                    logger.error("Error updating neo-pixels: %s", err)
+                    stats.error(type(err).__name__, "neopixel")
+            sleep(max(0.0, 1 / self.fps - (monotonic() - start)))  # cap the frame rate
 
     def _is_active(self) -> bool:
         """Check if LEDs should be on based on the configured schedule.
@@ -106,3 +294,245 @@ class NeoDisplay(Display):
             return self.on <= now < self.off
         # Overnight schedule (e.g., on=22:00, off=6:30)
         return now >= self.on or now < self.off
+
+
+class TerminalDisplay(Display):
+    """Headless display: keeps the grid in memory and, every interval seconds, prints it to the
+    terminal as colored blocks, e.g. to watch the monitor over SSH or to test without LEDs.
+    displays.terminal.interval, seconds between prints, 0 (the default) to never print
+    """
+
+    name = "terminal"
+
+    def __init__(self, cfg: dict, grid: Grid | None = None, stream=None):
+        self.grid = grid if grid is not None else Grid.from_config(cfg)
+        self.interval = cfg.get("displays", {}).get("terminal", {}).get("interval", 0)
+        self.stream = stream if stream is not None else sys.stdout
+        self.cells: dict[tuple[int, int], tuple[int, int]] = {}  # (col, row) -> (value, color code)
+        self.flushes = 0  # number of flushes, i.e. frames published
+        self._printed = 0.0
+
+    def update(self, hi: int, si: int, values: tuple[int, int]) -> None:
+        if 0 <= hi < self.grid.cols and 0 <= si < self.grid.rows:
+            self.cells[(hi, si)] = values
+
+    def flush(self) -> None:
+        self.flushes += 1
+        if self.interval and monotonic() - self._printed >= self.interval:
+            self._printed = monotonic()
+            self.stream.write(self.text())
+            self.stream.flush()
+
+    def relayout(self, grid: Grid, moves: dict[tuple[int, int], tuple[int, int]]) -> None:
+        self.cells = {moves[cell]: values for cell, values in self.cells.items() if cell in moves}
+        self.grid = grid
+
+    def text(self) -> str:
+        """Return the grid as lines of ANSI 24-bit colored blocks, one line per row,
+        labelled with the row's host or sensor in the modes that have one per row
+        """
+        lines, row_headers = [], self.grid.headers()[1]
+        for row in range(self.grid.rows):
+            blocks = "".join("\033[38;2;%d;%d;%dm██" % rgb(self.cells.get((col, row), (-1, -1))[1])
+                             for col in range(self.grid.cols))
+            label = row_headers[row] if row < len(row_headers) else ""
+            lines.append(f"{blocks}\033[0m {label}".rstrip())
+        return "\n".join(lines) + "\n\n"
+
+
+class PngDisplay(Display):
+    """Writes the grid as a PNG image, e.g. for a status page or a chat bot to pick up.
+    displays.png.path, the image file, grid.png by default
+    displays.png.interval, at most one write every interval seconds, 10 by default; the last frame is written on close
+    displays.png.cell, size of a cell in pixels, 16 by default
+    """
+
+    name = "png"
+
+    def __init__(self, cfg: dict, grid: Grid | None = None):
+        png_cfg = cfg.get("displays", {}).get("png", {})
+        self.path = png_cfg.get("path", "grid.png")
+        self.interval = png_cfg.get("interval", 10)
+        self.cell = png_cfg.get("cell", 16)
+        self.grid = grid if grid is not None else Grid.from_config(cfg)
+        self._cells: dict[tuple[int, int], int] = {}  # (col, row) -> color code
+        self._written = -float("inf")
+        self._dirty = False
+
+    def update(self, hi: int, si: int, values: tuple[int, int]) -> None:
+        if 0 <= hi < self.grid.cols and 0 <= si < self.grid.rows:
+            self._cells[(hi, si)] = values[1]
+            self._dirty = True
+
+    def flush(self) -> None:
+        if self._dirty and monotonic() - self._written >= self.interval:
+            self.write()
+
+    def relayout(self, grid: Grid, moves: dict[tuple[int, int], tuple[int, int]]) -> None:
+        self._cells = {moves[cell]: color for cell, color in self._cells.items() if cell in moves}
+        self.grid, self._dirty = grid, True
+
+    def close(self) -> None:
+        if self._dirty:
+            self.write()
+
+    def write(self) -> None:
+        """Write the image, replacing the previous one atomically"""
+        start = perf_counter()
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as file:
+            file.write(self.png())
+        os.replace(tmp, self.path)
+        self._written, self._dirty = monotonic(), False
+        stats.observe("write", "png", perf_counter() - start)
+
+    def png(self) -> bytes:
+        """Encode the grid as an 8-bit RGB PNG; cells are separated by a 1 pixel gap"""
+        size = self.cell
+        lines = []
+        for row in range(self.grid.rows):
+            line = bytearray()
+            for col in range(self.grid.cols):
+                line += bytes(rgb(self._cells.get((col, row), -1))) * (size - 1) + bytes(3)
+            lines += [b"\0" + line] * (size - 1) + [b"\0" + bytes(len(line))]  # filter type 0 per scanline
+
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        header = struct.pack(">IIBBBBB", self.grid.cols * size, self.grid.rows * size, 8, 2, 0, 0, 0)
+        return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(b"".join(lines)))
+                + chunk(b"IEND", b""))
+
+
+class _Mailbox:
+    """A backend of Displays, with the one frame waiting for it and the thread delivering it"""
+
+    def __init__(self, backend: Display) -> None:
+        self.backend = backend
+        self.name = backend.name or type(backend).__name__
+        self.cells: dict[tuple[int, int], tuple[int, int]] = {}  # (col, row) -> values, updated since the last frame
+        self.relayout: tuple[Grid, dict] | None = None  # (grid, moves), switched to before the frame
+        self.ready = False  # a frame was flushed, but not yet delivered
+        self.lock = Lock()
+        self.wake = Event()
+        self.stop = False
+        self.thread = Thread(target=self.deliver, daemon=True, name=f"display-{self.name}")
+        self.thread.start()
+
+    def deliver(self) -> None:
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            with self.lock:
+                cells, self.cells = self.cells, {}
+                relayout, self.relayout = self.relayout, None
+                ready, self.ready, stop = self.ready, False, self.stop
+            start = perf_counter()
+            try:
+                if relayout is not None:
+                    self.backend.relayout(*relayout)
+                for (col, row), values in cells.items():
+                    self.backend.update(col, row, values)
+                if ready or relayout is not None:
+                    self.backend.flush()
+                    stats.observe("frame", self.name, perf_counter() - start)
+            except Exception as err:
+                logger.error("Error updating display %s: %s", self.name, err)
+                stats.error(type(err).__name__, self.name)
+            if stop:
+                return
+
+
+class Displays(Display):
+    """Fans the updates out to several display backends, each fed by its own thread, so a slow backend,
+    e.g. one writing images, never holds up the polling loop or the other backends.
+    Every backend has a mailbox of one frame: the cells updated since its last frame. If a backend is still
+    busy when the next frame is flushed, the frames are merged and it skips to the latest values.
+    """
+
+    def __init__(self, backends: list[Display] | None = None) -> None:
+        self._mailboxes: list[_Mailbox] = []
+        for backend in backends or []:
+            self.add(backend)
+
+    @staticmethod
+    def create(name: str, cfg: dict, grid: Grid, **context) -> Display | None:
+        """Create the named backend, None if it is unknown or cannot be started, e.g. there are no LEDs"""
+        class_ = Display.backend_class(name)
+        if class_ is None:
+            logger.error("Unknown display %s", name)
+            return None
+        try:
+            return class_.from_config(cfg, grid, **context)
+        except DisplayError as err:
+            logger.error("Display %s is not available: %s", name, err)
+            stats.error("unavailable", name)
+            return None
+
+    @classmethod
+    def from_config(cls, cfg: dict, grid: Grid, names: list[str] | None = None, **context) -> "Displays":
+        """Create the backends listed in displays.backends, or the given ones; see create"""
+        names = names if names is not None else cfg.get("displays", {}).get("backends", BACKENDS)
+        return cls([backend for name in names if (backend := cls.create(name, cfg, grid, **context)) is not None])
+
+    def add(self, backend: Display) -> None:
+        """Feed another backend, e.g. one that needs services created after the first frame was shown"""
+        self._mailboxes.append(_Mailbox(backend))
+
+    def backend(self, name: str) -> Display | None:
+        """Return the backend with the given name, None if it is not shown"""
+        return next((mailbox.backend for mailbox in self._mailboxes if mailbox.name == name), None)
+
+    def subset(self, names: tuple[str, ...]) -> "Displays":
+        """Return a view of the named backends that feeds them through the same mailboxes, e.g. to update
+        and relayout one backend from another thread while the frames of all of them stay in order
+        """
+        subset = Displays()
+        subset._mailboxes = [mailbox for mailbox in self._mailboxes if mailbox.name in names]
+        return subset
+
+    @property
+    def backends(self) -> list[Display]:
+        return [mailbox.backend for mailbox in self._mailboxes]
+
+    def update(self, hi: int, si: int, values: tuple[int, int]) -> None:
+        for mailbox in self._mailboxes:
+            with mailbox.lock:
+                mailbox.cells[(hi, si)] = values
+
+    def flush(self) -> None:
+        for mailbox in self._mailboxes:
+            with mailbox.lock:
+                if mailbox.ready:  # the previous frame was not delivered yet, this one replaces it
+                    stats.error("frame_dropped", mailbox.name)
+                mailbox.ready = True
+            mailbox.wake.set()
+
+    def relayout(self, grid: Grid, moves: dict[tuple[int, int], tuple[int, int]],
+                 exclude: tuple[str, ...] = ()) -> None:
+        """Switch all backends but the excluded ones to a new grid layout, see Display.relayout.
+        Updates not yet delivered move along with their cells.
+        """
+        for mailbox in self._mailboxes:
+            if mailbox.name in exclude:
+                continue
+            with mailbox.lock:
+                mailbox.cells = {moves[cell]: values for cell, values in mailbox.cells.items() if cell in moves}
+                chained = moves
+                if mailbox.relayout is not None:  # not delivered yet, chain the moves
+                    chained = {cell: moves[moved] for cell, moved in mailbox.relayout[1].items() if moved in moves}
+                mailbox.relayout = grid, chained
+            mailbox.wake.set()
+
+    def close(self) -> None:
+        """Deliver the pending frames and close the backends"""
+        for mailbox in self._mailboxes:
+            with mailbox.lock:
+                mailbox.stop = True
+            mailbox.wake.set()
+        for mailbox in self._mailboxes:
+            mailbox.thread.join(timeout=10)
+            try:
+                mailbox.backend.close()
+            except Exception as err:
+                logger.error("Error closing display %s: %s", mailbox.name, err)
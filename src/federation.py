@@ -0,0 +1,161 @@
+"""
+Federation: one aggregate view of several ZeroMonitor instances
+Author: Wolf Paulus <wolf@paulus.com>
+
+Every instance polls only its own hosts. An aggregating instance pulls each peer's grid snapshot
+from /api/grid, follows the peer's cell deltas on /events, and merges the peer's hosts into its own
+web display and history. Peer hosts are added after the local ones, so local cells keep their positions.
+"""
+import gzip
+import json
+from threading import Event, Lock, Thread
+from urllib.request import Request, urlopen
+from display import Display
+from grid import COLS, Grid
+from history import History
+from stats import stats
+from log import logger
+
+
+class Peer:
+    """A peer instance and the layout of its grid, as of its last snapshot
+    url, base URL of the peer's web display, e.g. http://rack2.local
+    hosts, sensors, the peer's hosts and sensors in grid order
+    cells, the peer's (col, row) cells mapped to the (host, sensor) they show
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+        self.hosts: list[str] = []
+        self.sensors: list[str] = []
+        self.cells: dict[tuple[int, int], tuple[str, str]] = {}
+        self.stream = None  # the open event stream, closed to stop following the peer
+
+
+class Federation:
+    """Merges the grids of peer instances into the local web display and history.
+    Each peer is followed on its own thread: a full snapshot first, then its deltas as they are
+    published. When the peer's stream ends, e.g. after the peer's layout changed, or the peer cannot
+    be reached, the snapshot is pulled again after interval seconds; meanwhile its cells show offline.
+    Hostnames must be unique across instances; a host that is already shown is not added again.
+    """
+
+    def __init__(self, display: Display, history: History, grid: Grid, peers: list[str], cols: int = COLS,
+                 interval: float = 5.0, timeout: float = 30.0) -> None:
+        """Start following the peers
+        display, history, the local web display and history the peers are merged into; the web display is
+            best fed through its mailbox, see Displays.subset, so local updates not yet delivered move along
+            with their cells when the aggregate grid changes
+        grid, the local grid
+        peers, base URLs of the peer instances
+        cols, cells per row in display modes 1 and 4
+        interval, seconds between attempts to reach a peer
+        timeout, seconds a peer may be silent before it is considered gone; peers ping every 15 s
+        """
+        self.display = display
+        self.history = history
+        self.interval = interval
+        self.timeout = timeout
+        self.peers = [Peer(url) for url in peers]
+        self._local, self._cols = grid, cols
+        self.grid = grid  # the aggregate grid
+        self._cells: dict[tuple[str, str], tuple[int, int]] = self._index(grid)  # (host, sensor) -> cell
+        self._owner: dict[str, Peer] = {}  # peer host -> the peer reporting it
+        self._lock = Lock()
+        self._stop = Event()
+        self._threads = [Thread(target=self._follow, args=(peer,), daemon=True) for peer in self.peers]
+        for thread in self._threads:
+            thread.start()
+
+    def relayout(self, grid: Grid, cols: int = COLS) -> None:
+        """Switch to a new local grid, e.g. after the configuration changed; moves the web display and
+        history cells of local and peer hosts alike.
+        """
+        with self._lock:
+            self._local, self._cols = grid, cols
+            self._relayout()
+
+    def close(self) -> None:
+        """Stop following the peers"""
+        self._stop.set()
+        for peer in self.peers:
+            if peer.stream is not None:
+                peer.stream.close()
+        for thread in self._threads:
+            thread.join(timeout=self.timeout)
+
+    def _follow(self, peer: Peer) -> None:
+        while not self._stop.is_set():
+            try:
+                self._pull(peer)
+                self._stream(peer)
+            except (OSError, ValueError, KeyError) as err:  # unreachable, or not a ZeroMonitor
+                if not self._stop.is_set():
+                    logger.error("Peer %s: %s", peer.url, err)
+                    stats.error(type(err).__name__, peer.url)
+                    self._apply(peer, [(labels, (-1, -1)) for labels in peer.cells.values()])
+            self._stop.wait(self.interval)
+
+    def _pull(self, peer: Peer) -> None:
+        """Merge the peer's full grid snapshot"""
+        request = Request(f"{peer.url}/api/grid", headers={"Accept-Encoding": "gzip"})
+        with urlopen(request, timeout=self.timeout) as response:
+            body = response.read()
+            if response.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+        cells = [cell for cell in json.loads(body)["cells"] if cell["host"]]
+        with self._lock:
+            peer.cells = {(cell["col"], cell["row"]): (cell["host"], cell["sensor"]) for cell in cells}
+            peer.hosts = list(dict.fromkeys(cell["host"] for cell in cells))
+            peer.sensors = list(dict.fromkeys(cell["sensor"] for cell in cells))
+            self._relayout()
+        self._apply(peer, [((cell["host"], cell["sensor"]), (cell["value"], cell["color"])) for cell in cells])
+
+    def _stream(self, peer: Peer) -> None:
+        """Merge the peer's cell deltas until its event stream ends"""
+        with urlopen(f"{peer.url}/events", timeout=self.timeout) as response:
+            peer.stream = response
+            try:
+                for line in response:
+                    if self._stop.is_set():
+                        return
+                    if line.startswith(b"data: "):
+                        delta = json.loads(line[6:])
+                        labels = peer.cells.get((delta["col"], delta["row"]))
+                        if labels is not None:
+                            self._apply(peer, [(labels, (delta["value"], delta["color"]))])
+            finally:
+                peer.stream = None
+
+    def _apply(self, peer: Peer, updates: list[tuple[tuple[str, str], tuple[int, int]]]) -> None:
+        """Show a peer's readings, given as ((host, sensor), (value, color code))"""
+        with self._lock:
+            for (host, sensor), values in updates:
+                cell = self._cells.get((host, sensor))
+                if cell is not None and self._owner.get(host) is peer:
+                    self.display.update(*cell, values)
+                    self.history.record(*cell, values[0])
+            self.display.flush()
+
+    def _relayout(self) -> None:
+        """Rebuild the aggregate grid from the local grid and the peers' layouts; the caller holds the lock"""
+        hosts, sensors, owner = list(self._local.hosts), list(self._local.sensors), {}
+        for peer in self.peers:
+            for host in peer.hosts:
+                if host not in hosts:
+                    hosts.append(host)
+                    owner[host] = peer
+            sensors.extend(sensor for sensor in peer.sensors if sensor not in sensors)
+        self._owner = owner
+        grid = Grid(self._local.mode, hosts, sensors, self._cols)
+        if grid != self.grid:
+            moves = self.grid.moves(grid)
+            self.history.move(moves)
+            self.display.relayout(grid, moves)
+            self.grid, self._cells = grid, self._index(grid)
+            logger.info("Aggregate grid of %d x %d cells for %d hosts", grid.cols, grid.rows, len(grid.hosts))
+
+    @staticmethod
+    def _index(grid: Grid) -> dict[tuple[str, str], tuple[int, int]]:
+        return {grid.labels(col, row): (col, row) for row in range(grid.rows) for col in range(grid.cols)
+                if grid.labels(col, row)[0]}
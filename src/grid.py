@@ -0,0 +1,89 @@
+"""
+Virtual grid of any size, mapping hosts and sensors to cells
+Author: Wolf Paulus <wolf@paulus.com>
+"""
+from math import ceil
+
+COLS = 8  # default cells per row in modes 1 and 4, the width of one LED HAT
+
+
+def calculate_position(mode: int, hi: int, si: int, cols: int = COLS) -> tuple[int, int]:
+    """Calculate the col, row position of the LED based on the mode, host index, and sensor index."""
+    if mode == 1:  # one host with all sensors, filled row-wise
+        return si % cols, si // cols
+    elif mode == 2:  # one row per host, one column per sensor
+        return si, hi
+    elif mode == 3:  # one column per host, one row per sensor
+        return hi, si
+    else:  # one sensor for all hosts, filled row-wise
+        return hi % cols, hi // cols
+
+
+class Grid:
+    """Virtual grid holding every configured host and sensor, sized by the display mode.
+    Cell positions and labels are computed once, when the grid is created.
+    Mode 1: first host only, its sensors filled row-wise, cols cells per row
+    Mode 2: one row per host, one column per sensor
+    Mode 3: one column per host, one row per sensor
+    Mode 4: first sensor only, hosts filled row-wise, cols cells per row
+    """
+
+    __slots__ = ("mode", "hosts", "sensors", "cols", "rows", "_positions", "_labels")
+
+    def __init__(self, mode: int, hosts: list[str], sensors: list[str], cols: int = COLS) -> None:
+        self.mode = mode
+        self.hosts = hosts[:1] if mode == 1 else hosts
+        self.sensors = sensors[:1] if mode not in (1, 2, 3) else sensors
+        nh, ns = max(1, len(self.hosts)), max(1, len(self.sensors))
+        if mode == 1:
+            self.cols, self.rows = min(cols, ns), ceil(ns / cols)
+        elif mode == 2:
+            self.cols, self.rows = ns, nh
+        elif mode == 3:
+            self.cols, self.rows = nh, ns
+        else:
+            self.cols, self.rows = min(cols, nh), ceil(nh / cols)
+        self._positions = [[calculate_position(mode, hi, si, cols) for si in range(len(self.sensors))]
+                           for hi in range(len(self.hosts))]
+        self._labels: dict[tuple[int, int], tuple[str, str]] = {}
+        for hi, host in enumerate(self.hosts):
+            for si, sensor in enumerate(self.sensors):
+                self._labels[self._positions[hi][si]] = (host, sensor)
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "Grid":
+        """Create the grid for the hosts, sensors and display mode in the configuration"""
+        displays = cfg.get("displays", {})
+        return cls(
+            displays.get("neopixel", {}).get("mode", 1),
+            [h.get("hostname", "") for h in cfg.get("hosts", [])],
+            [s.get("name", "") for s in cfg.get("sensors", {}).values()],
+            displays.get("grid", {}).get("cols", COLS),
+        )
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Grid) and (self.mode, self.hosts, self.sensors, self._positions) == (
+            other.mode, other.hosts, other.sensors, other._positions)
+
+    def moves(self, other: "Grid") -> dict[tuple[int, int], tuple[int, int]]:
+        """Map each cell of this grid to the cell showing the same host and sensor in the other grid.
+        Cells whose host or sensor is not part of the other grid are left out.
+        """
+        cells = {labels: cell for cell, labels in other._labels.items()}
+        return {cell: cells[labels] for cell, labels in self._labels.items() if labels in cells}
+
+    def position(self, hi: int, si: int) -> tuple[int, int]:
+        """Return the (col, row) cell of a host's sensor"""
+        return self._positions[hi][si]
+
+    def labels(self, col: int, row: int) -> tuple[str, str]:
+        """Return the (host, sensor) shown in a cell; empty strings if the cell is unused"""
+        return self._labels.get((col, row), ("", ""))
+
+    def headers(self) -> tuple[list[str], list[str]]:
+        """Return (column_headers, row_headers); only modes 2 and 3 have one host per row or column"""
+        if self.mode == 2:
+            return list(self.sensors), list(self.hosts)
+        if self.mode == 3:
+            return list(self.hosts), list(self.sensors)
+        return [], []
@@ -0,0 +1,223 @@
+"""
+Fixed-memory time-series history per grid cell
+Author: Wolf Paulus <wolf@paulus.com>
+"""
+from array import array
+from threading import Lock
+from time import time
+from typing import Callable
+
+# (bucket seconds, capacity) per tier, finest first: 5-second min/avg/max for 1 h, 1-minute min/avg/max
+# for 24 h, 10-minute min/avg/max for 30 days, each span fixed whatever the sweeps' pace.
+# A tier configured with bucket 0 keeps raw samples instead, one per sweep.
+TIERS = ((5, 720), (60, 1440), (600, 4320))
+
+
+class RingBuffer:
+    """Preallocated, array-backed ring buffer of timestamped samples with a fixed number of values each"""
+
+    __slots__ = ("capacity", "width", "head", "size", "_ts", "_values")
+
+    def __init__(self, capacity: int, width: int = 1) -> None:
+        """capacity, number of samples kept; width, number of values per sample"""
+        self.capacity = capacity
+        self.width = width
+        self.head = 0  # index of the next write
+        self.size = 0
+        self._ts = array("I", bytes(4 * capacity))
+        self._values = array("f", bytes(4 * capacity * width))
+
+    def append(self, ts: int, *values: float) -> None:
+        """Add a sample, overwriting the oldest one when full"""
+        self._ts[self.head] = ts
+        offset = self.head * self.width
+        self._values[offset:offset + self.width] = array("f", values)
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def items(self, since: int = 0) -> list[tuple]:
+        """Return the samples as (timestamp, value, ...) tuples, oldest first"""
+        start = (self.head - self.size) % self.capacity
+        result = []
+        for i in range(self.size):
+            index = (start + i) % self.capacity
+            if self._ts[index] >= since:
+                offset = index * self.width
+                result.append((self._ts[index], *self._values[offset:offset + self.width]))
+        return result
+
+    def last(self, n: int) -> list[tuple]:
+        """Return the n most recent samples as (timestamp, value, ...) tuples, oldest first"""
+        n = min(n, self.size)
+        result = []
+        for i in range(self.head - n, self.head):
+            index = i % self.capacity
+            offset = index * self.width
+            result.append((self._ts[index], *self._values[offset:offset + self.width]))
+        return result
+
+    def first(self, since: int = 0) -> tuple | None:
+        """Return the oldest sample at or after since, found by bisection, None if there is none"""
+        start = (self.head - self.size) % self.capacity
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._ts[(start + mid) % self.capacity] < since:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.size:
+            return None
+        index = (start + lo) % self.capacity
+        return (self._ts[index], *self._values[index * self.width:(index + 1) * self.width])
+
+
+class _Tier:
+    """One resolution of a cell's history, aggregating samples into fixed buckets"""
+
+    __slots__ = ("bucket", "ring", "start", "count", "total", "lo", "hi")
+
+    def __init__(self, bucket: int, capacity: int) -> None:
+        self.bucket = bucket
+        self.ring = RingBuffer(capacity, 1 if bucket == 0 else 3)
+        self.start = -1  # start of the bucket being aggregated
+        self.count, self.total, self.lo, self.hi = 0, 0.0, 0.0, 0.0
+
+    def add(self, ts: int, value: float) -> tuple | None:
+        """Add a sample, returning the bucket it completed as (start, min, avg, max), if any"""
+        if self.bucket == 0:
+            self.ring.append(ts, value)
+            return None
+        start = ts - ts % self.bucket
+        completed = None
+        if start != self.start:
+            completed = self.flush()
+            self.start, self.count, self.total, self.lo, self.hi = start, 0, 0.0, value, value
+        self.count += 1
+        self.total += value
+        self.lo = min(self.lo, value)
+        self.hi = max(self.hi, value)
+        return completed
+
+    def current(self) -> tuple | None:
+        """Return the bucket being aggregated as (start, min, avg, max), None if it is empty"""
+        return (self.start, self.lo, self.total / self.count, self.hi) if self.count else None
+
+    def flush(self) -> tuple | None:
+        """Write the bucket being aggregated into the ring buffer and return it, None if it is empty"""
+        if not self.count:
+            return None
+        sample = (self.start, self.lo, self.total / self.count, self.hi)
+        self.ring.append(*sample)
+        self.count = 0
+        return sample
+
+
+class History:
+    """History store with one set of tiered ring buffers per grid cell.
+    Memory per cell is allocated once, on the cell's first sample, and stays constant after that.
+    """
+
+    def __init__(self, tiers: tuple[tuple[int, int], ...] = TIERS,
+                 on_bucket: Callable[[int, int, int, tuple], None] | None = None) -> None:
+        """tiers, (bucket seconds, capacity) per tier, bucket 0 for raw samples
+        on_bucket, called with (col, row, bucket seconds, (start, min, avg, max)) when a cell completes
+        a bucket of an aggregated tier, e.g. to persist it
+        """
+        self.tiers = tuple(tuple(tier) for tier in tiers)
+        self.on_bucket = on_bucket
+        self._cells: dict[tuple[int, int], list[_Tier]] = {}
+        self._lock = Lock()
+
+    def record(self, hi: int, si: int, value: float, ts: float | None = None) -> None:
+        """Add a sample for a cell; negative (offline/error) values are not recorded.
+        Args:
+            hi (int): column, matching the display convention
+            si (int): row
+            value (float): the measured value
+            ts (float): unix timestamp of the sample, now if not given
+        """
+        if value < 0:
+            return
+        ts = int(time() if ts is None else ts)
+        with self._lock:
+            completed = [(tier.bucket, sample) for tier in self._tiers(hi, si)
+                         if (sample := tier.add(ts, value)) is not None]
+        if self.on_bucket is not None:
+            for bucket, sample in completed:
+                self.on_bucket(hi, si, bucket, sample)
+
+    def replay(self, hi: int, si: int, value: float, ts: float, tiers: tuple[int, ...]) -> None:
+        """Add a stored sample to the given tiers of a cell only, e.g. when restoring the history on startup.
+        Completed buckets are not reported to on_bucket, they have been stored already.
+        """
+        if value < 0:
+            return
+        with self._lock:
+            cell = self._tiers(hi, si)
+            for tier in tiers:
+                cell[tier].add(int(ts), value)
+
+    def restore(self, hi: int, si: int, tier: int, sample: tuple) -> None:
+        """Add a stored (start, min, avg, max) bucket to an aggregated tier of a cell, oldest first"""
+        with self._lock:
+            self._tiers(hi, si)[tier].ring.append(int(sample[0]), *sample[1:])
+
+    def _tiers(self, hi: int, si: int) -> list[_Tier]:
+        """Return a cell's tiers, allocated on first use; the caller holds the lock"""
+        tiers = self._cells.get((hi, si))
+        if tiers is None:
+            tiers = self._cells[(hi, si)] = [_Tier(bucket, capacity) for bucket, capacity in self.tiers]
+        return tiers
+
+    def series(self, hi: int, si: int, tier: int = 0, since: int = 0) -> list[tuple]:
+        """Return a cell's samples at the given resolution, oldest first.
+        Aggregated tiers yield (start, min, avg, max), including the bucket that is still being aggregated;
+        with the default TIERS that is every tier, the 5-second tier 0 included. Only a tier configured
+        with bucket 0 yields raw (timestamp, value) samples.
+        """
+        with self._lock:
+            tiers = self._cells.get((hi, si))
+            if tiers is None or not 0 <= tier < len(tiers):
+                return []
+            result, current = tiers[tier].ring.items(since), tiers[tier].current()
+            if current and current[0] >= since:
+                result.append(current)
+            return result
+
+    def move(self, moves: dict[tuple[int, int], tuple[int, int]]) -> None:
+        """Move the history of cells to new cells, e.g. after the grid layout changed.
+        Cells without a new position are dropped.
+        """
+        with self._lock:
+            self._cells = {moves[cell]: tiers for cell, tiers in self._cells.items() if cell in moves}
+
+    def sparkline(self, hi: int, si: int, points: int = 30) -> list[float]:
+        """Return the cell's most recent values in the finest tier, at most points of them.
+        Reads only those samples, not the whole ring buffer.
+        """
+        with self._lock:
+            tiers = self._cells.get((hi, si))
+            if not tiers:
+                return []
+            finest = tiers[0]
+            current = finest.current()
+            samples = finest.ring.last(points - 1 if current else points) + ([current] if current else [])
+        return [_value(sample) for sample in samples]
+
+    def trend(self, hi: int, si: int, window: int = 600) -> float:
+        """Return the change of the cell's value over the last window seconds in the finest tier (0 if unknown)"""
+        with self._lock:
+            tiers = self._cells.get((hi, si))
+            if not tiers:
+                return 0.0
+            finest = tiers[0]
+            first, current = finest.ring.first(int(time()) - window), finest.current()
+            last = current or next(iter(finest.ring.last(1)), None)
+            first = first or current
+        return _value(last) - _value(first) if first is not None and first[0] != last[0] else 0.0
+
+
+def _value(sample: tuple) -> float:
+    """The value of a raw (timestamp, value) sample, the average of an aggregated (timestamp, min, avg, max) one"""
+    return sample[1] if len(sample) == 2 else sample[2]
@@ -0,0 +1,118 @@
+"""
+Push ingestion: hosts report their own sensor values, instead of being probed over SSH
+Author: Wolf Paulus <wolf@paulus.com>
+
+Line protocol, one host per line, any number of lines per HTTP POST or UDP datagram:
+    <hostname> <sensor>=<value> [<sensor>=<value> ...]
+e.g. "omega CpuUsage=12.5 CpuTemperature=48"
+"""
+import math
+import socket
+from threading import Lock, Thread
+from time import monotonic
+from typing import TYPE_CHECKING
+from classify import band, boundaries
+from stats import stats
+from log import logger
+
+if TYPE_CHECKING:
+    from plan import HostPlan, Plan
+
+MAX_DATAGRAM = 65507  # largest UDP payload
+
+
+class Ingest:
+    """Keeps the latest pushed value of every sensor of the plan's push hosts.
+    The poller reads them like probe results, so pushed values go through the same
+    classification, displays, history and alerts as polled ones.
+    """
+
+    def __init__(self, stale: float = 30.0, token: str | None = None) -> None:
+        """Initialize the Ingest
+        stale, seconds without a push after which a sensor is shown as offline
+        token, if set, HTTP pushes must carry it as "Authorization: Bearer <token>"
+        """
+        self.stale = stale
+        self.token = token
+        self._expected: set[tuple[str, str]] = set()  # (hostname, sensor) of the plan's push hosts
+        self._latest: dict[tuple[str, str], tuple[float, float]] = {}  # (hostname, sensor) -> (value, monotonic)
+        self._read: dict[tuple[str, str], float] = {}  # (hostname, sensor) -> time of the value last read
+        self._lock = Lock()
+        self._socket: socket.socket | None = None
+
+    def expect(self, plan: "Plan") -> None:
+        """Accept pushes for the sensors of the plan's push hosts only, e.g. after a reload"""
+        expected = {(host.hostname, entry.name) for host in plan.hosts if host.push for entry in host.sensors}
+        with self._lock:
+            self._expected = expected
+            self._latest = {key: value for key, value in self._latest.items() if key in expected}
+            self._read = {key: value for key, value in self._read.items() if key in expected}
+
+    def push(self, data: bytes) -> tuple[int, int]:
+        """Parse a batch of lines and store their values, taking the lock once per batch.
+        Returns: (accepted, rejected) values; values of unknown hosts or sensors, malformed, negative
+        and non-finite ones are rejected
+        """
+        now, values, rejected = monotonic(), [], 0
+        for line in data.decode("utf-8", "replace").splitlines():
+            hostname, *fields = line.split() or [""]
+            for field in fields:
+                sensor, _, value = field.partition("=")
+                try:
+                    number = float(value)
+                except ValueError:
+                    number = -1.0
+                if math.isfinite(number) and number >= 0:  # negative values are the offline and timeout states
+                    values.append(((hostname, sensor), number))
+                else:
+                    rejected += 1
+        with self._lock:
+            accepted = [(key, value) for key, value in values if key in self._expected]
+            for key, value in accepted:
+                self._latest[key] = (value, now)
+        rejected += len(values) - len(accepted)
+        if rejected:
+            stats.error("push_rejected", "ingest")
+        return len(accepted), rejected
+
+    def results(self, host: "HostPlan") -> list[tuple[int, int] | None]:
+        """Return the host's pushed values as probe results, (value, color_code) per sensor.
+        A sensor without a push since the last call reports None, i.e. not sampled,
+        one without a push for stale seconds (-1, -1).
+        """
+        now, results = monotonic(), []
+        with self._lock:
+            for entry in host.sensors:
+                key = (host.hostname, entry.name)
+                value, received = self._latest.get(key, (-1.0, -self.stale))
+                if now - received >= self.stale:
+                    results.append((-1, -1))
+                elif self._read.get(key) == received:
+                    results.append(None)
+                else:
+                    self._read[key] = received
+                    results.append((round(value), band(value, boundaries(entry.settings.get("values")))))
+        return results
+
+    def listen(self, port: int) -> int:
+        """Receive pushes as UDP datagrams on a background thread.
+        Returns: the port, useful if port 0 picked a free one
+        """
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(("", port))
+        Thread(target=self._receive, daemon=True).start()
+        port = self._socket.getsockname()[1]
+        logger.info("Ingest listening on UDP port %d", port)
+        return port
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                data, _ = self._socket.recvfrom(MAX_DATAGRAM)
+            except OSError:  # closed
+                return
+            self.push(data)
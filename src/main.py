@@ -3,91 +3,315 @@ Zero-Monitor Main Module
 Author: Wolf Paulus wolf@paulus.com
 Version 1.0.0
 """
+import signal
 import sys
-from time import sleep
-from collections import ChainMap
-from yaml import safe_load
-from monitor import Connection, Monitor
-from websvr import WebDisplay
+from time import sleep, time
+from typing import TYPE_CHECKING
+from config import CONFIG, ConfigWatcher, diff, read, validate
+from display import BACKENDS, Displays  # the LED backend imports rpi_ws281x only when it is created
+from grid import COLS, Grid, calculate_position  # noqa: F401 — calculate_position is part of this module's interface
+from store import Store, read_snapshot, write_snapshot
+from stats import stats
 from log import logger
 
-ROWS, COLS = 4, 8
+# Everything else, above all the SSH stack (paramiko, cryptography), is imported once the LEDs show
+# the last known grid, see below.
+if TYPE_CHECKING:
+    from agent import Agents
+    from cache import ProbeCache
+    from history import History
+    from monitor import ConnectionPool
+    from plan import HostPlan
+    from poller import Schedule
 
 
-def calculate_position(mode: int, hi: int, si: int) -> tuple[int, int]:
-    """Calculate the col, row position of the LED based on the mode, host index, and sensor index."""
-    if mode == 1:  # one host with 32 sensors, filled row-wise
-        return si % COLS, si // COLS
-    elif mode == 2:  # four hosts with eight sensors each : one row per host
-        return si % COLS, hi
-    elif mode == 3:  # eight hosts with four sensors each : one column per host
-        return hi, si
-    else:  # thirty-two hosts with one sensor each, filled row-wise
-        return hi % COLS, hi // COLS
+def show_snapshot(displays: list, grid: Grid, cells: dict[tuple[str, str], tuple[int, int]]) -> None:
+    """Show the last known value of every cell of the grid, see store.read_snapshot"""
+    for row in range(grid.rows):
+        for col in range(grid.cols):
+            values = cells.get(grid.labels(col, row))
+            if values is not None:
+                for display in displays:
+                    display.update(col, row, values)
+    for display in displays:
+        display.flush()
+
+
+def load_history(history: "History", store: Store, grid: Grid, now: float | None = None) -> int:
+    """Restore the history of the grid's cells from the store, returning the number of records read.
+    Aggregated tiers get their stored buckets, the raw readings are read only for the span the raw tiers
+    hold and for the buckets that were still open, so startup time does not grow with the retention period.
+    """
+    now = time() if now is None else now
+    cells = {grid.labels(col, row): (col, row) for row in range(grid.rows) for col in range(grid.cols)
+             if grid.labels(col, row)[0]}
+    resume: dict[tuple[tuple[int, int], int], int] = {}  # (cell, tier) -> start of the first bucket not stored
+    span, count = 0, 0  # seconds of raw readings needed, a raw tier holding at most one sample per second
+    for tier, (bucket, capacity) in enumerate(history.tiers):
+        span = max(span, bucket or capacity)
+        if bucket == 0:
+            continue
+        buckets = sorted(sample for sample in store.replay(now - bucket * capacity, bucket)
+                         if (sample[1], sample[2]) in cells)  # completed buckets are written in any order
+        count += len(buckets)
+        for start, host, sensor, *values in buckets:
+            cell = cells[(host, sensor)]
+            history.restore(*cell, tier, (start, *values))
+            resume[(cell, tier)] = start + bucket
+    cutoffs = [now - now % bucket if bucket else now - capacity for bucket, capacity in history.tiers]
+    for ts, host, sensor, value, _ in store.replay(now - span):
+        cell = cells.get((host, sensor))
+        if cell is not None:
+            count += 1
+            history.replay(*cell, value, ts, tuple(tier for tier, cutoff in enumerate(cutoffs)
+                                                   if ts >= resume.get((cell, tier), cutoff)))
+    return count
+
+
+def probe_host(pool: "ConnectionPool", host: "HostPlan", batch: bool = True, agents: "Agents | None" = None,
+               schedule: "Schedule | None" = None, cache: "ProbeCache | None" = None) -> list[tuple[int, int] | None]:
+    """Probe all sensors on a single host, one (value, color_code) per sensor.
+    Sensors that cannot be probed (unknown class, failed connection) report (-1, -1).
+    With a schedule, sensors that are not due report None and are not probed.
+    With agents, sensors covered by the host's streaming agent are read from its latest record.
+    In batch mode all remaining sensor commands run in a single remote exec, sharing output
+    through the cache with other aliases of the same host.
+    """
+    from paramiko import SSHException  # already imported by the pool, only bound here
+    from monitor import Monitor, resolve
+    hostname = host.hostname
+    due = [schedule is None or schedule.due(hostname, entry.si) for entry in host.sensors]
+    results: list[tuple[int, int] | None] = [(-1, -1) if d else None for d in due]
+    if not any(due):
+        return results
+    try:
+        conn = pool.get(hostname)
+        if conn is None:
+            logger.error("Connection to %s failed. Skipping sensor probe(s) for this host.", hostname)
+            return results
+        monitors = {}
+        for entry in host.sensors:
+            if due[entry.si] and entry.monitor is not None:
+                entry.monitor.client = conn  # the pool may have reconnected since the last sweep
+                monitors[entry.si] = entry.monitor
+        if agents is not None and host.agent:
+            record = agents.record(hostname, conn, list(monitors.values()))
+            for si, monitor in list(monitors.items()):
+                if monitor.field in record:
+                    results[si] = monitor.consume(record)
+                    del monitors[si]
+        if batch:
+            key = resolve(hostname) if cache is not None else hostname
+            for si, result in zip(monitors, Monitor.probe_batch(conn, list(monitors.values()), cache, key)):
+                results[si] = result
+        else:
+            for si, monitor in monitors.items():
+                results[si] = monitor.probe()
+    except (OSError, ConnectionError, SSHException) as err:
+        logger.error("%s : %s", hostname, err)
+        stats.error(type(err).__name__, hostname)
+        pool.discard(hostname)  # reconnect on the next sweep
+    finally:
+        if schedule is not None:
+            for entry, result in zip(host.sensors, results):
+                if result is not None:
+                    schedule.observe(hostname, entry.si, entry.settings, result)
+    return results
 
 
 if __name__ == "__main__":
+    watcher = ConfigWatcher(CONFIG)
     try:
-        with open("monitor.yaml", encoding='utf-8') as file:
-            config = safe_load(file)
-            logger.info("Configuration loaded successfully.")
-    except OSError as err:
+        config = read(CONFIG)
+        grid = Grid.from_config(config)  # all hosts and sensors the display mode can show
+    except (OSError, ValueError, AttributeError, TypeError) as err:
         logger.error("Error loading configuration file. %s", err)
         sys.exit(1)
+    logger.info("Grid of %d x %d cells for %d hosts", grid.cols, grid.rows, len(grid.hosts))
+
+    backends = config.get("displays", {}).get("backends", BACKENDS)
+    displays = Displays.from_config(config, grid, [name for name in backends if name != "web"])  # web: see below
+    history_cfg = config.get("history", {})
+    snapshot = read_snapshot(history_cfg.get("path", "data"))
+    show_snapshot([displays], grid, snapshot)  # the last known grid, until the first sweep is in
+
+    try:
+        validate(config)  # imports the sensor classes, and with them paramiko
+        logger.info("Configuration loaded successfully.")
+    except ValueError as err:
+        logger.error("Error loading configuration file. %s", err)
+        sys.exit(1)
+    from agent import Agents  # noqa: E402 — the rest of the service, the LEDs already show the last known grid
+    from alerts import Alerts  # noqa: E402
+    from cache import ProbeCache  # noqa: E402
+    from classify import Classifier  # noqa: E402
+    from federation import Federation  # noqa: E402
+    from history import History, TIERS  # noqa: E402
+    from ingest import Ingest  # noqa: E402
+    from monitor import ConnectionPool  # noqa: E402
+    from plan import Plan  # noqa: E402
+    from poller import Poller, Schedule  # noqa: E402
+
+    plan = Plan(config, grid)
+    polling = config.get("polling", {})
+    pool = ConnectionPool(keepalive=polling.get("keepalive", 30))
+    pool.connect_all([host.hostname for host in plan.hosts if not host.push], polling.get("workers", 8))
+
+    store = Store(history_cfg.get("path", "data"), history_cfg.get("flush", 60), history_cfg.get("retention", 30))
+
+    def store_bucket(col: int, row: int, bucket: int, sample: tuple) -> None:
+        """Persist a completed history bucket of a local host, peer hosts are kept by their own instance"""
+        host, sensor = grid.labels(col, row)
+        if host:
+            store.aggregate(host, sensor, bucket, sample)
+
+    history = History(history_cfg.get("tiers", TIERS), on_bucket=store_bucket)
+    logger.info("Restored the history from %d stored records", load_history(history, store, grid))
+
+    def start_ingest(cfg: dict) -> "Ingest | None":
+        """Start receiving the values pushed by hosts that are not probed over SSH, if configured"""
+        if not isinstance(cfg.get("ingest"), dict):
+            return None
+        receiver = Ingest(cfg["ingest"].get("stale", 30), cfg["ingest"].get("token"))
+        if cfg["ingest"].get("udp"):
+            receiver.listen(cfg["ingest"]["udp"])
+        return receiver
+
+    ingest = start_ingest(config)
+    web_display = Displays.create("web", config, grid, history=history, ingest=ingest) if "web" in backends else None
+    if web_display is None and config.get("federation", {}).get("peers"):
+        logger.warning("Federation needs the web display, its peers are not shown.")
+    if web_display is None and ingest is not None:
+        logger.warning("POST /api/push needs the web display, hosts can push their values %s.",
+                       "over UDP only" if config["ingest"].get("udp") else "nowhere: ingest.udp is not set")
+    if web_display is not None:
+        show_snapshot([web_display], grid, snapshot)
+        displays.add(web_display)
+    federation = None  # merges the grids of peer instances into the web display
+    if web_display is not None and config.get("federation", {}).get("peers"):
+        federation = Federation(displays.subset(("web",)), history, grid, config["federation"]["peers"],
+                                config.get("displays", {}).get("grid", {}).get("cols", COLS),
+                                config["federation"].get("interval", 5))
+
+    classifier = Classifier(plan)
+    if ingest is not None:
+        ingest.expect(plan)
+    agents = Agents(polling.get("agent_interval", 2)) if polling.get("agent", False) else None
+    schedule = Schedule()
+    cache = ProbeCache(polling.get("cache_ttl", 1), polling.get("cache_size", 256))
+    poller = Poller(
+        lambda host: ingest.results(host) if host.push else probe_host(
+            pool, host, polling.get("batch", True), agents, schedule, cache),
+        workers=polling.get("workers", 8),
+        deadline=polling.get("deadline", 15),
+        name=lambda host: host.hostname,
+    )
+    alerts = Alerts.from_config(config["alerts"]) if config.get("alerts") else None
+    # settings applied on reload, others need a restart
+    RELOADABLE = ("polling", "debug", "alerts", "ingest", "displays.grid", "displays.neopixel.mode")
+
+    latest = dict(snapshot)  # (host, sensor) -> the (value, color code) shown, saved as the snapshot
+    stats_interval = config.get("debug", {}).get("stats_interval", 0)  # seconds, 0 for never
+    stats_due = time() + stats_interval
+    snapshot_due = time() + store.flush_interval
+
+    def terminate(signum, frame):  # systemd stops the service with SIGTERM
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        while True:
+            for hi, results in poller.sweep(plan.hosts):  # hosts are reported as soon as they are done
+                host = plan.hosts[hi]
+                if results is None:  # deadline missed or probe failed, update all sensors to error state
+                    results = [(-1, -1)] * len(host.sensors)
+                for entry, result, shown in zip(host.sensors, results, classifier.host(host, results)):
+                    if result is None:  # sensor was not due
+                        continue
+                    col, row = entry.cell
+                    history.record(col, row, result[0])  # raw values, the displays show smoothed ones
+                    store.append(host.hostname, entry.name, (result[0], shown[1]))
+                    displays.update(col, row, shown)
+                    latest[(host.hostname, entry.name)] = shown
+                    if alerts is not None:
+                        alerts.observe(host.hostname, entry.name, shown)
+                displays.flush()
+            if time() >= snapshot_due:  # the grid to show right away on the next start
+                write_snapshot(store.path, latest)
+                snapshot_due = time() + store.flush_interval
+            if stats_interval and time() >= stats_due:
+                logger.info("Internal stats:\n%s", stats.text())
+                stats_due = time() + stats_interval
 
-    from display import NeoDisplay  # noqa: E402 — imported here to avoid rpi_ws281x dependency at module level
-    display = NeoDisplay(config)
-    web_display = WebDisplay(config)
-
-    mode = config.get("displays", {}).get("neopixel", {}).get("mode", 1)
-    if mode == 1:
-        max_hosts = 1
-        max_sensors = 32
-    elif mode == 2:
-        max_hosts = 4
-        max_sensors = 8
-    elif mode == 3:
-        max_hosts = 8
-        max_sensors = 4
-    else:
-        max_hosts = 32
-        max_sensors = 1
-
-    while True:
-        for hi, host in enumerate(config.get("hosts")):  # iterate over hosts, currently 7 configured
-            if hi >= max_hosts:
-                break
-            hostname = host.get("hostname")
-            try:
-                with Connection(hostname) as conn:
-                    if conn is not None:
-                        for si, sensor in enumerate(config.get("sensors").values()):  # iterate over sensors
-                            if si >= max_sensors:
-                                break
-                            col, row = calculate_position(mode, hi, si)
-                            class_ = sensor.get("name")
-                            sensor = ChainMap(host.get(class_, {}), sensor)
-                            instance = Monitor.create_instance(class_, conn, sensor.get("cmd"), sensor.get("values"))
-                            if instance is not None:
-                                result = instance.probe()
-                                display.update(col, row, result)
-                                web_display.update(col, row, result)
-                            else:
-                                logger.error("Sensor %s not found. Skipping sensor probe for this host.", class_)
-                                display.update(col, row, (-1, -1))
-                                web_display.update(col, row, (-1, -1))
+            new_config = watcher.poll()  # apply a changed monitor.yaml, keeping connections and history
+            if new_config is not None:
+                changes = diff(config, new_config)
+                restart = sorted(path for path in changes.settings if not path.startswith(RELOADABLE))
+                if restart:
+                    logger.warning("Changes to %s take effect after a restart.", ", ".join(restart))
+                config = new_config
+                new_grid = Grid.from_config(config)
+                if new_grid != grid:
+                    moves = grid.moves(new_grid)
+                    if federation is not None:  # moves the web display and history of local and peer hosts
+                        displays.relayout(new_grid, moves, exclude=("web",))
+                        federation.relayout(new_grid, config.get("displays", {}).get("grid", {}).get("cols", COLS))
                     else:
-                        logger.error("Connection to %s failed. Skipping sensor probe(s) for this host.", hostname)
-                        for si, sensor in enumerate(config.get("sensors").values()):
-                            col, row = calculate_position(mode, hi, si)
-                            display.update(col, row, (-1, -1))
-                            web_display.update(col, row, (-1, -1))
-
-            except (OSError, ConnectionError) as err:
-                logger.error("%s : %s", host.get("hostname"), err)
-                # connection failed, update all sensors for this host to error state
-                for si, sensor in enumerate(config.get("sensors").values()):
-                    col, row = calculate_position(mode, hi, si)
-                    display.update(col, row, (-1, -1))
-                    web_display.update(col, row, (-1, -1))
-            sleep(config.get("host_timeout", 0.5))
+                        history.move(moves)
+                        displays.relayout(new_grid, moves)
+                    grid = new_grid
+                    latest = {labels: values for labels, values in latest.items() if labels[0] in grid.hosts}
+                    logger.info("Grid of %d x %d cells for %d hosts", grid.cols, grid.rows, len(grid.hosts))
+                plan = Plan(config, grid)
+                classifier = Classifier(plan, classifier)  # keeps the state of unchanged sensors
+                if any(path.startswith("ingest") for path in changes.settings):
+                    if ingest is not None:
+                        ingest.close()
+                    ingest = start_ingest(config)
+                    if web_display is not None:  # receives POST /api/push
+                        web_display.ingest = ingest
+                if ingest is not None:
+                    ingest.expect(plan)
+                for hostname in changes.hosts:
+                    schedule.forget(hostname)
+                    if agents is not None:
+                        agents.stop(hostname)
+                    if hostname not in grid.hosts:
+                        pool.discard(hostname)
+                if changes.sensors:  # sensor indices and commands may have changed on every host
+                    schedule.forget()
+                    if agents is not None:
+                        agents.close()
+                polling = config.get("polling", {})
+                pool.keepalive = polling.get("keepalive", 30)
+                cache.ttl = polling.get("cache_ttl", 1)
+                if polling.get("agent", False) != (agents is not None):
+                    if agents is not None:
+                        agents.close()
+                    agents = Agents(polling.get("agent_interval", 2)) if polling.get("agent", False) else None
+                elif agents is not None:
+                    agents.interval = polling.get("agent_interval", 2)
+                if (poller.workers, poller.deadline) != (polling.get("workers", 8), polling.get("deadline", 15)):
+                    poller.shutdown()
+                    poller = Poller(poller.probe, polling.get("workers", 8), polling.get("deadline", 15), poller.name)
+                stats_interval = config.get("debug", {}).get("stats_interval", 0)
+                if any(path.startswith("alerts") for path in changes.settings):
+                    if alerts is not None:
+                        alerts.close()
+                    alerts = Alerts.from_config(config["alerts"]) if config.get("alerts") else None
+            sleep(polling.get("interval", 1))
+    finally:  # keep what is buffered, the next start picks up from here
+        logger.info("Shutting down.")
+        if federation is not None:
+            federation.close()
+        poller.shutdown()
+        write_snapshot(store.path, latest)
+        store.close()
+        displays.close()  # the web display, and the last frame of the PNG display
+        if ingest is not None:
+            ingest.close()
+        if alerts is not None:
+            alerts.close()
+        if agents is not None:
+            agents.close()
+        pool.close()
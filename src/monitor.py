@@ -4,9 +4,74 @@ Author: Wolf Paulus <wolf@paulus.com>
 """
 
 import os
+import socket
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import entry_points
+from threading import Lock
+from time import monotonic, perf_counter
+from typing import Callable, Iterator
+from uuid import uuid4
 from paramiko import SSHClient, AutoAddPolicy, SSHConfig
+from cache import ProbeCache
+from classify import TIMEOUT, band, boundaries
 from log import logger
+from stats import stats
+
+SSH_CONFIG = "~/.ssh/config"
+ENTRY_POINTS = "zeromonitor.sensors"  # entry point group of third-party sensor classes
+SENSORS: dict[str, type["Monitor"]] = {}  # sensor class name -> class, see Monitor.__init_subclass__
+EXEC_TIMEOUT = 10.0  # default seconds a sensor command may run before it is cancelled
+MAX_OUTPUT = 64 * 1024  # bytes of output kept per command, the rest is discarded
+CHUNK = 4096  # bytes read from the channel at a time
+_plugins_loaded = False
+_ssh_config: tuple[float, SSHConfig] | None = None  # (mtime, parsed config)
+_ssh_config_lock = Lock()
+
+
+def ssh_config(path: str = SSH_CONFIG) -> SSHConfig:
+    """Return the parsed ssh config, parsing the file again only when its mtime has changed.
+    Raises: FileNotFoundError if the config file does not exist.
+    """
+    global _ssh_config
+    path = os.path.expanduser(path)
+    mtime = os.stat(path).st_mtime
+    with _ssh_config_lock:
+        if _ssh_config is None or _ssh_config[0] != mtime:
+            config = SSHConfig()
+            with open(path, encoding='utf-8') as f:
+                config.parse(f)
+            _ssh_config = mtime, config
+        return _ssh_config[1]
+
+
+def connect_kwargs(hostname: str) -> dict:
+    """Resolve a host alias through the ssh config into SSHClient.connect() arguments"""
+    user_config = ssh_config().lookup(hostname)
+    key_filename = os.path.expanduser(user_config["identityfile"][0]).strip(
+        '"') if "identityfile" in user_config else None
+    return {
+        "hostname": user_config["hostname"],
+        "username": user_config["user"],
+        "port": int(user_config["port"]),
+        "key_filename": key_filename,
+        "timeout": 10,
+    }
+
+
+def resolve(hostname: str) -> str:
+    """Return user@address:port the host alias resolves to, so aliases of the same host share a key.
+    Falls back to the alias itself if it cannot be resolved.
+    """
+    try:
+        kwargs = connect_kwargs(hostname)
+        return f"{kwargs['username']}@{kwargs['hostname']}:{kwargs['port']}"
+    except (OSError, KeyError, ValueError):
+        return hostname
+
+
+class ProbeTimeout(Exception):
+    """A remote command ran longer than its timeout and was cancelled"""
 
 
 class Connection:
@@ -20,27 +85,19 @@ class Connection:
         self.client = SSHClient()
         self.client.load_system_host_keys()
         self.client.set_missing_host_key_policy(AutoAddPolicy())
-        self.config = SSHConfig()
-        with open(os.path.expanduser("~/.ssh/config"), encoding='utf-8') as f:
-            self.config.parse(f)
+        self.config = ssh_config()
 
     def connect(self) -> None:
         """Establish the SSH connection"""
-        user_config = self.config.lookup(self.hostname)
-        key_filename = os.path.expanduser(user_config["identityfile"][0]).strip(
-            '"') if "identityfile" in user_config else None
         if self.client is not None:
+            start = perf_counter()
             try:
-                self.client.connect(
-                    hostname=user_config["hostname"],
-                    username=user_config["user"],
-                    port=int(user_config["port"]),
-                    key_filename=key_filename,
-                    timeout=10,
-                )
+                self.client.connect(**connect_kwargs(self.hostname))
             except Exception as err:
                 logger.error("Error connecting to %s: %s", self.hostname, err)
+                stats.error(type(err).__name__, self.hostname)
                 self.client = None
+            stats.observe("connect", self.hostname, perf_counter() - start)
 
     def close(self) -> None:
         """Close the SSH connection"""
@@ -56,8 +113,144 @@ class Connection:
         self.close()
 
 
+class ConnectionPool:
+    """Keeps one authenticated SSH transport per host alive across sweeps.
+    Idle transports are kept open with keepalive packets and checked before every use.
+    A host that cannot be reached is retried with exponential backoff.
+    """
+
+    def __init__(self, keepalive: int = 30, backoff: float = 2.0, max_backoff: float = 300.0,
+                 resolver: Callable[[str], dict] = connect_kwargs) -> None:
+        """Initialize the pool
+        keepalive, seconds between transport keepalive packets
+        backoff, seconds to wait after the first failed connection attempt, doubled on each further failure
+        max_backoff, upper limit for the wait between connection attempts
+        resolver, turns a host alias into SSHClient.connect() arguments, the ssh config by default
+        """
+        self.keepalive = keepalive
+        self.resolver = resolver
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._clients: dict[str, SSHClient] = {}
+        self._failures: dict[str, int] = {}
+        self._retry_at: dict[str, float] = {}
+        self._locks: dict[str, Lock] = {}
+        self._lock = Lock()
+
+    def get(self, hostname: str) -> SSHClient | None:
+        """Return a healthy, connected client for the host, reconnecting if needed.
+        Returns None if the host cannot be reached or is still backing off.
+        """
+        with self._host_lock(hostname):
+            client = self._clients.get(hostname)
+            if client is not None:
+                if ConnectionPool._healthy(client):
+                    return client
+                logger.info("Connection to %s went stale, reconnecting.", hostname)
+                self._drop(hostname)
+            if monotonic() < self._retry_at.get(hostname, 0):
+                return None
+            client = self._open(hostname)
+            if client is None:
+                failures = self._failures.get(hostname, 0) + 1
+                self._failures[hostname] = failures
+                delay = min(self.max_backoff, self.backoff * 2 ** (failures - 1))
+                self._retry_at[hostname] = monotonic() + delay
+                logger.warning("Retrying %s in %.0f s (attempt %d failed).", hostname, delay, failures)
+                return None
+            self._failures.pop(hostname, None)
+            self._retry_at.pop(hostname, None)
+            self._clients[hostname] = client
+            return client
+
+    def connect_all(self, hostnames: list[str], workers: int = 8) -> None:
+        """Connect to the hosts in the background, workers at a time, e.g. while the service starts up.
+        A get() for a host that is still connecting waits for that connection instead of opening another.
+        """
+        executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="connect")
+        for hostname in hostnames:
+            executor.submit(self.get, hostname)
+        executor.shutdown(wait=False)
+
+    def discard(self, hostname: str) -> None:
+        """Close the host's connection, e.g. after a failed command; the next get() reconnects."""
+        with self._host_lock(hostname):
+            self._drop(hostname)
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        for hostname in list(self._clients):
+            self.discard(hostname)
+
+    def _open(self, hostname: str) -> SSHClient | None:
+        client = SSHClient()
+        client.load_system_host_keys()
+        client.set_missing_host_key_policy(AutoAddPolicy())
+        start = perf_counter()
+        try:
+            client.connect(**self.resolver(hostname))
+        except Exception as err:
+            logger.error("Error connecting to %s: %s", hostname, err)
+            stats.error(type(err).__name__, hostname)
+            client.close()
+            return None
+        finally:
+            stats.observe("connect", hostname, perf_counter() - start)
+        transport = client.get_transport()
+        if transport is not None:
+            transport.set_keepalive(self.keepalive)
+        return client
+
+    def _drop(self, hostname: str) -> None:
+        client = self._clients.pop(hostname, None)
+        if client is not None:
+            client.close()
+
+    def _host_lock(self, hostname: str) -> Lock:
+        with self._lock:
+            return self._locks.setdefault(hostname, Lock())
+
+    @staticmethod
+    def _healthy(client: SSHClient) -> bool:
+        """A transport is healthy if it is active, authenticated and still accepts packets"""
+        transport = client.get_transport()
+        if transport is None or not transport.is_active() or not transport.is_authenticated():
+            return False
+        try:
+            transport.send_ignore()
+        except Exception:
+            return False
+        return True
+
+
 class Monitor(ABC):
-    """Base class for SSH connection monitoring"""
+    """Base class for SSH connection monitoring.
+    Every subclass is registered under its class name, wherever it is defined. Sensors shipped
+    in other packages are found through the "zeromonitor.sensors" entry point group, e.g. in pyproject.toml:
+        [project.entry-points."zeromonitor.sensors"]
+        GpuTemperature = "zm_gpu:GpuTemperature"
+    """
+
+    field: str | None = None  # name of the agent record field carrying this sensor's value
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        SENSORS[cls.__name__] = cls
+
+    @staticmethod
+    def sensor_class(name: str) -> type["Monitor"] | None:
+        """Return the registered sensor class with the given name, loading the entry points on first miss"""
+        global _plugins_loaded
+        if name not in SENSORS and not _plugins_loaded:
+            _plugins_loaded = True
+            for entry_point in entry_points(group=ENTRY_POINTS):
+                try:
+                    class_ = entry_point.load()
+                    if isinstance(class_, type) and issubclass(class_, Monitor):
+                        SENSORS.setdefault(entry_point.name, class_)
+                except Exception as err:
+                    logger.error("Error loading sensor plugin %s: %s", entry_point.name, err)
+        return SENSORS.get(name)
 
     @classmethod
     def create_instance(cls, class_name_str: str, *args, **kwargs):
@@ -70,30 +263,187 @@ class Monitor(ABC):
         Returns:
             An instance of the sensor, or None if the class name is not found.
         """
-        try:
-            cls_ = globals()[class_name_str]
-            instance = cls_(*args, **kwargs)
-            return instance
-        except KeyError:
+        cls_ = Monitor.sensor_class(class_name_str)
+        if cls_ is None:
             logger.error("Monitor class '%s' not found.", class_name_str)
             return None
+        return cls_(*args, **kwargs)
 
-    def __init__(self, client: SSHClient, cmd: str, values: list[int]) -> None:
+    def __init__(self, client: SSHClient, cmd: str, values: list[int], host: str = "",
+                 timeout: float = EXEC_TIMEOUT) -> None:
         """Initialize the Monitor class with a hostname
         client, ssh client object
         cmd, command to execute on the remote host
         values, list of three values: eg. low, medium, high
+        host, name of the monitored host, for sensors that keep state between samples
+        timeout, seconds the command may run before it is cancelled and the sensor reports TIMEOUT
         """
         self.client = client
         self.cmd = cmd
         self.values = values
+        self.host = host
+        self.timeout = timeout
 
-    @abstractmethod
     def probe(self) -> tuple[int, int]:
         """Probe the system for information
+        Returns: tuple of (measured value, color_code based on thresholds), (TIMEOUT, TIMEOUT) if the
+        command was cancelled"""
+        if self.client is not None:
+            label = f"{self.host}/{type(self).__name__}"
+            start = perf_counter()
+            try:
+                for _, text in Monitor._stream(self.client, [self.cmd], [self.timeout], label):
+                    return self.timed_parse(text)
+            except ProbeTimeout:
+                return TIMEOUT, TIMEOUT
+            finally:
+                stats.observe("exec", label, perf_counter() - start)
+        return -1, -1
+
+    def timed_parse(self, text: str) -> tuple[int, int]:
+        """Parse the command output, recording the parse time and counting unparsable output"""
+        label = f"{self.host}/{type(self).__name__}"
+        start = perf_counter()
+        result = self.parse(text)
+        stats.observe("parse", label, perf_counter() - start)
+        if result[1] < 0:
+            stats.error("unparsable", label)
+        return result
+
+    @abstractmethod
+    def parse(self, text: str) -> tuple[int, int]:
+        """Parse the output of the sensor's command
         Returns: tuple of (measured value, color_code based on thresholds)"""
         raise NotImplementedError(
-            "Subclasses must implement the probe method.")
+            "Subclasses must implement the parse method.")
+
+    def consume(self, record: dict[str, str]) -> tuple[int, int]:
+        """Evaluate a record streamed by the remote agent, see agent.py
+        Returns: tuple of (measured value, color_code based on thresholds)"""
+        try:
+            value = round(float(record[self.field]))
+            return value, Monitor.color_code(value, self.values)
+        except (KeyError, ValueError) as e:
+            logger.error("Error reading %s from agent record: %s", type(self).__name__, e)
+        return -1, -1
+
+    @staticmethod
+    def probe_batch(client: SSHClient, monitors: list["Monitor"], cache: ProbeCache | None = None,
+                    host: str = "") -> list[tuple[int, int]]:
+        """Probe several sensors of the same host with a single remote command.
+        The sensor commands are joined into one shell script, each command's output is
+        framed by a marker line, and the framed output is handed back to each sensor's parser.
+        With a cache, command output is shared under the (resolved) host key: cached output is
+        reused, and commands already running for another caller are waited for, not run again.
+        Each command's output is parsed as soon as the command is done. If a command runs past its
+        timeout, the batch is cancelled: it and the commands after it report (TIMEOUT, TIMEOUT).
+        Returns: one tuple of (measured value, color_code) per monitor, in the given order
+        """
+        if client is None or not monitors:
+            return [(-1, -1)] * len(monitors)
+        cmds = list(dict.fromkeys(m.cmd for m in monitors))  # sensors sharing a command run it once
+        timeouts = {}
+        for monitor in monitors:
+            timeouts[monitor.cmd] = min(timeouts.get(monitor.cmd, monitor.timeout), monitor.timeout)
+        if cache is None:
+            outputs: dict[str, str | ProbeTimeout] = {}
+            try:
+                for i, text in Monitor._run_batch(client, cmds, [timeouts[cmd] for cmd in cmds], monitors[0].host):
+                    outputs[cmds[i]] = text
+            except ProbeTimeout as err:
+                outputs.update((cmd, err) for cmd in cmds if cmd not in outputs)
+        else:
+            def fetch(keys: list[tuple[str, str]]) -> dict:
+                fetched = {}
+                try:
+                    for i, text in Monitor._run_batch(client, [cmd for _, cmd in keys],
+                                                      [timeouts[cmd] for _, cmd in keys], monitors[0].host):
+                        fetched[keys[i]] = text
+                except ProbeTimeout as err:  # handed to callers waiting for the same commands, not cached
+                    fetched.update((key, err) for key in keys if key not in fetched)
+                return fetched
+
+            cached = cache.get_many([(host, cmd) for cmd in cmds], fetch)
+            outputs = {cmd: text for (_, cmd), text in cached.items() if text is not None}
+        return [monitor.timed_parse(outputs[monitor.cmd]) if isinstance(outputs.get(monitor.cmd), str)
+                else Monitor._missing(monitor, monitor.cmd in outputs) for monitor in monitors]
+
+    @staticmethod
+    def _missing(monitor: "Monitor", timed_out: bool) -> tuple[int, int]:
+        if timed_out:
+            return TIMEOUT, TIMEOUT
+        logger.warning("No output for %s in batch.", type(monitor).__name__)
+        return -1, -1
+
+    @staticmethod
+    def _run_batch(client: SSHClient, cmds: list[str], timeouts: list[float],
+                   label: str = "") -> Iterator[tuple[int, str]]:
+        """Run the commands in one remote shell script, yields (index, output) of each command when it is done"""
+        start = perf_counter()
+        try:
+            yield from Monitor._stream(client, cmds, timeouts, label)
+        finally:
+            stats.observe("exec", label, perf_counter() - start)
+
+    @staticmethod
+    def _stream(client: SSHClient, cmds: list[str], timeouts: list[float],
+                label: str = "") -> Iterator[tuple[int, str]]:
+        """Run the commands in one remote shell script, each command's output framed by a marker line.
+        The output is read as it arrives; each command's output is yielded, as (index, text), as soon as
+        the next command starts. At most MAX_OUTPUT bytes are kept per command.
+        Raises: ProbeTimeout if a command runs longer than its timeout; the channel is closed, which ends
+        the remote script.
+        """
+        marker = f"#ZM-{uuid4().hex}"
+        script = "\n".join(f"printf '\\n{marker} {i}\\n'; {{ {cmd}\n}} 2>/dev/null" for i, cmd in enumerate(cmds))
+        separator = f"\n{marker} ".encode()
+        _, stdout, _ = client.exec_command(script)
+        channel = stdout.channel
+        buffer, kept, size = b"", [], 0  # unframed bytes; output of the current command, and its size
+        current, started = -1, monotonic()  # index of the running command, -1 until the first one starts
+
+        def keep(length: int) -> None:  # move output from the buffer to the current command's output
+            nonlocal buffer, size
+            if current >= 0:  # anything before the first marker is not output
+                kept.append(buffer[:max(0, min(length, MAX_OUTPUT - size))])
+                size += length
+            buffer = buffer[length:]
+
+        def done() -> tuple[int, str]:
+            if size > MAX_OUTPUT:
+                logger.warning("%s: output of %s cut off at %d bytes.", label, cmds[current], MAX_OUTPUT)
+                stats.error("truncated", label)
+            return current, b"".join(kept).decode(errors="replace")
+
+        try:
+            while True:
+                remaining = started + timeouts[max(current, 0)] - monotonic()
+                try:
+                    if remaining <= 0:
+                        raise socket.timeout
+                    channel.settimeout(remaining)
+                    data = channel.recv(CHUNK)
+                except socket.timeout:
+                    logger.error("%s: %s timed out after %.1f s, cancelled.", label, cmds[max(current, 0)],
+                                 timeouts[max(current, 0)])
+                    stats.error("timeout", label)
+                    raise ProbeTimeout(cmds[max(current, 0)]) from None
+                buffer += data
+                while (pos := buffer.find(separator)) >= 0 and (end := buffer.find(b"\n", pos + 1)) >= 0:
+                    keep(pos)
+                    if current >= 0:
+                        yield done()
+                    current, started = int(buffer[len(separator):end - pos]), monotonic()
+                    buffer, kept, size = buffer[end - pos + 1:], [], 0
+                if not data:  # the script is done
+                    keep(len(buffer))
+                    if current >= 0:
+                        yield done()
+                    return
+                pos = buffer.find(separator)  # a marker line that is not complete yet
+                keep(pos if pos >= 0 else max(0, len(buffer) - len(separator)))  # or the start of one
+        finally:
+            channel.close()
 
     @staticmethod
     def color_code(v: float, values: list[int]) -> int:
@@ -104,20 +454,7 @@ class Monitor(ABC):
         0 to 5, where 0 is below or at the first threshold and 5 is above the third threshold.
         -1 is an error case, i.e. the given value was negative.
         """
-        if v < 0:
-            return -1  # Error case, no value available
-        if v <= values[0]:
-            return 0  # Below or at the first threshold
-        if v <= values[1] - (values[1] - values[0]) / 2:
-            return 1  # Above first threshold but way below second threshold
-        if v <= values[1]:
-            return 2  # Below or at the second threshold
-        if v <= values[2] - (values[2] - values[1]) / 2:
-            return 3  # Above second threshold but way below third threshold
-        if v <= values[2]:
-            return 4  # Below or at the third threshold
-        else:
-            return 5  # Above the third threshold.
+        return band(v, boundaries(values))  # see classify.py
 
 
 class CpuTemperature(Monitor):
@@ -126,16 +463,16 @@ class CpuTemperature(Monitor):
     53692
     """
 
-    def probe(self) -> tuple[int, int]:
-        """Probe the CPU temperature in Celsius"""
-        if self.client is not None:
-            try:
-                _, stdout, _ = self.client.exec_command(self.cmd)
-                temperature = round(int(stdout.read().decode()) / 1000)
-                logger.debug("CPU temperature: %d°C", temperature)
-                return temperature, Monitor.color_code(temperature, self.values)
-            except ValueError as e:
-                logger.error("Error reading CPU temperature: %s", e)
+    field = "temp"
+
+    def parse(self, text: str) -> tuple[int, int]:
+        """Parse the CPU temperature in Celsius"""
+        try:
+            temperature = round(int(text) / 1000)
+            logger.debug("CPU temperature: %d°C", temperature)
+            return temperature, Monitor.color_code(temperature, self.values)
+        except ValueError as e:
+            logger.error("Error reading CPU temperature: %s", e)
         return -1, -1
 
 
@@ -145,16 +482,16 @@ class CpuUsage(Monitor):
     2.78
     """
 
-    def probe(self) -> tuple[int, int]:
-        """Probe the CPU Usage in percent"""
-        if self.client is not None:
-            try:
-                _, stdout, _ = self.client.exec_command(self.cmd)
-                usage = round(float(stdout.read().decode()))
-                logger.debug("CPU usage: %d %%", usage)
-                return usage, Monitor.color_code(usage, self.values)
-            except ValueError as e:
-                logger.error("Error reading CPU usage: %s", e)
+    field = "cpu"
+
+    def parse(self, text: str) -> tuple[int, int]:
+        """Parse the CPU Usage in percent"""
+        try:
+            usage = round(float(text))
+            logger.debug("CPU usage: %d %%", usage)
+            return usage, Monitor.color_code(usage, self.values)
+        except ValueError as e:
+            logger.error("Error reading CPU usage: %s", e)
         return -1, -1
 
 
@@ -166,21 +503,21 @@ class MemoryUsage(Monitor):
     Swap:              0           0           0
     """
 
-    def probe(self) -> tuple[int, int]:
-        """Probe the Memory"""
-        if self.client is not None:
-            try:
-                _, stdout, _ = self.client.exec_command(self.cmd)
-                texts = stdout.read().decode().split("\n")
-                if len(texts) < 3:
-                    logger.warning("Memory usage information is not available.\n%s", texts)
-                    return -1, -1
-                total, used = int(texts[1].split()[1]), int(texts[1].split()[2])
-                usage = round(used * 100 / total)  # Round to nearest integer
-                logger.debug("Memory usage: %d %%", usage)
-                return usage, Monitor.color_code(usage, self.values)
-            except ValueError as e:
-                logger.error("Error reading Memory usage: %s", e)
+    field = "mem"
+
+    def parse(self, text: str) -> tuple[int, int]:
+        """Parse the Memory usage in percent"""
+        try:
+            texts = text.split("\n")
+            if len(texts) < 3:
+                logger.warning("Memory usage information is not available.\n%s", texts)
+                return -1, -1
+            total, used = int(texts[1].split()[1]), int(texts[1].split()[2])
+            usage = round(used * 100 / total)  # Round to nearest integer
+            logger.debug("Memory usage: %d %%", usage)
+            return usage, Monitor.color_code(usage, self.values)
+        except ValueError as e:
+            logger.error("Error reading Memory usage: %s", e)
         return -1, -1
 
 
@@ -191,22 +528,22 @@ class DiskUsage(Monitor):
     /dev/mmcblk0p2  14719576 3318572  10753180  24% /
     """
 
-    def probe(self) -> tuple[int, int]:
-        """Probe the Disk usage"""
-        if self.client is not None:
-            try:
-                _, stdout, _ = self.client.exec_command(self.cmd)
-                texts = stdout.read().decode().split("\n")
-                if len(texts) < 2:
-                    logger.warning(
-                        "Disk usage information is not available.\n%s", texts)
-                    return -1, -1
-                # Get the Use% column (second to last field, strip trailing '%')
-                usage = int(texts[1].split()[-2][:-1])
-                logger.debug("Disk usage: %d %%", usage)
-                return usage, Monitor.color_code(usage, self.values)
-            except ValueError as e:
-                logger.error("Error reading Disk usage: %s", e)
+    field = "disk"
+
+    def parse(self, text: str) -> tuple[int, int]:
+        """Parse the Disk usage in percent"""
+        try:
+            texts = text.split("\n")
+            if len(texts) < 2:
+                logger.warning(
+                    "Disk usage information is not available.\n%s", texts)
+                return -1, -1
+            # Get the Use% column (second to last field, strip trailing '%')
+            usage = int(texts[1].split()[-2][:-1])
+            logger.debug("Disk usage: %d %%", usage)
+            return usage, Monitor.color_code(usage, self.values)
+        except ValueError as e:
+            logger.error("Error reading Disk usage: %s", e)
         return -1, -1
 
 
@@ -216,21 +553,21 @@ class TaskCount(Monitor):
     123
     """
 
-    def probe(self) -> tuple[int, int]:
-        """Probe the number of tasks"""
-        if self.client is not None:
-            try:
-                _, stdout, _ = self.client.exec_command(self.cmd)
-                value = stdout.read().decode().strip()
-                if not value.isdigit():
-                    logger.info(
-                        "Task count information is not available or not a number: %s", value)
-                    return -1, -1
-                tasks = int(value)
-                logger.debug("Task count: %d", tasks)
-                return tasks, Monitor.color_code(tasks, self.values)
-            except ValueError as e:
-                logger.error("Error reading task count: %s", e)
+    field = "tasks"
+
+    def parse(self, text: str) -> tuple[int, int]:
+        """Parse the number of tasks"""
+        try:
+            value = text.strip()
+            if not value.isdigit():
+                logger.info(
+                    "Task count information is not available or not a number: %s", value)
+                return -1, -1
+            tasks = int(value)
+            logger.debug("Task count: %d", tasks)
+            return tasks, Monitor.color_code(tasks, self.values)
+        except ValueError as e:
+            logger.error("Error reading task count: %s", e)
         return -1, -1
 
 
@@ -240,19 +577,106 @@ class StreamlitSessions(Monitor):
     3
     """
 
-    def probe(self) -> tuple[int, int]:
-        """Probe the number of Streamlit sessions"""
-        if self.client is not None:
-            try:
-                _, stdout, _ = self.client.exec_command(self.cmd)
-                value = stdout.read().decode().strip()
-                if not value.isdigit():
-                    logger.info(
-                        "Streamlit sessions information is not available or not a number: %s", value)
-                    return -1, -1
-                sessions = int(value)
-                logger.debug("Streamlit sessions: %d", sessions)
-                return sessions, Monitor.color_code(sessions, self.values)
-            except ValueError as e:
-                logger.error("Error reading Streamlit sessions: %s", e)
+    def parse(self, text: str) -> tuple[int, int]:
+        """Parse the number of Streamlit sessions"""
+        try:
+            value = text.strip()
+            if not value.isdigit():
+                logger.info(
+                    "Streamlit sessions information is not available or not a number: %s", value)
+                return -1, -1
+            sessions = int(value)
+            logger.debug("Streamlit sessions: %d", sessions)
+            return sessions, Monitor.color_code(sessions, self.values)
+        except ValueError as e:
+            logger.error("Error reading Streamlit sessions: %s", e)
+        return -1, -1
+
+
+class ProcCpuUsage(Monitor):
+    """Monitor class for CPU usage, computed from the kernel counters in /proc/stat
+    The usage is the share of non-idle time since the previous sample of the same host
+    (since boot for the first sample), so the probe returns immediately and needs no sysstat.
+    expected stdout content: something like:
+    cpu  2255 34 2290 22625563 6290 127 456 0 0 0
+    cpu0 1132 34 1441 11311718 3675 127 438 0 0 0
+    ...
+    """
+
+    _samples: dict[str, tuple[int, int, int]] = {}  # host -> (idle, total, usage) of the previous sample
+
+    def parse(self, text: str) -> tuple[int, int]:
+        """Parse the CPU usage in percent"""
+        try:
+            for line in text.split("\n"):
+                if line.startswith("cpu "):
+                    fields = [int(x) for x in line.split()[1:9]]
+                    break
+            else:
+                logger.warning("CPU counters are not available.\n%s", text)
+                return -1, -1
+            idle, total = fields[3], sum(fields)
+            prev_idle, prev_total, usage = ProcCpuUsage._samples.get(self.host, (0, 0, -1))
+            if total < prev_total:  # counters were reset, e.g. the host rebooted
+                prev_idle, prev_total = 0, 0
+            if total > prev_total or usage < 0:  # the same counters again, e.g. cached output: keep the usage
+                usage = round(100 * (1 - (idle - prev_idle) / (total - prev_total)))
+            ProcCpuUsage._samples[self.host] = idle, total, usage
+            logger.debug("CPU usage: %d %%", usage)
+            return usage, Monitor.color_code(usage, self.values)
+        except (ValueError, ZeroDivisionError) as e:
+            logger.error("Error reading CPU usage: %s", e)
+        return -1, -1
+
+
+class ProcMemoryUsage(Monitor):
+    """Monitor class for Memory usage, read from /proc/meminfo
+    expected stdout content: something like:
+    MemTotal:         419228 kB
+    MemFree:           47784 kB
+    MemAvailable:     226704 kB
+    ...
+    """
+
+    def parse(self, text: str) -> tuple[int, int]:
+        """Parse the Memory usage in percent"""
+        try:
+            mem = {}
+            for line in text.split("\n"):
+                key, sep, value = line.partition(":")
+                if sep and key.startswith("Mem"):
+                    mem[key] = int(value.split()[0])
+            if "MemTotal" not in mem:
+                logger.warning("Memory usage information is not available.\n%s", text)
+                return -1, -1
+            available = mem.get("MemAvailable", mem.get("MemFree", 0))
+            usage = round((mem["MemTotal"] - available) * 100 / mem["MemTotal"])
+            logger.debug("Memory usage: %d %%", usage)
+            return usage, Monitor.color_code(usage, self.values)
+        except (ValueError, IndexError, ZeroDivisionError) as e:
+            logger.error("Error reading Memory usage: %s", e)
+        return -1, -1
+
+
+class LoadAverage(Monitor):
+    """Monitor class for the 1-minute load average, in percent of the available cores
+    The cores are counted from the cpuN lines of /proc/stat when it is part of the output.
+    expected stdout content: something like:
+    0.52 0.58 0.59 1/389 12345
+    """
+
+    def parse(self, text: str) -> tuple[int, int]:
+        """Parse the load average in percent of the available cores"""
+        try:
+            lines = text.split("\n")
+            cores = sum(1 for line in lines if line.startswith("cpu") and line[3:4].isdigit()) or 1
+            for line in lines:
+                fields = line.split()
+                if len(fields) == 5 and "/" in fields[3]:
+                    load = round(float(fields[0]) * 100 / cores)
+                    logger.debug("Load average: %d %%", load)
+                    return load, Monitor.color_code(load, self.values)
+            logger.warning("Load average is not available.\n%s", text)
+        except ValueError as e:
+            logger.error("Error reading load average: %s", e)
         return -1, -1
@@ -0,0 +1,87 @@
+"""
+Sensor plan: the configuration compiled into per-host sensor entries
+Author: Wolf Paulus <wolf@paulus.com>
+"""
+from types import MappingProxyType
+from typing import Mapping
+from grid import Grid
+from monitor import EXEC_TIMEOUT, Monitor
+from log import logger
+
+
+class _Frozen:
+    """Base of the plan's classes: attributes are set once, in __init__"""
+
+    __slots__ = ()
+
+    def __init__(self, **values) -> None:
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+class SensorEntry(_Frozen):
+    """One sensor of one host
+    si, sensor index
+    name, sensor class name, also the sensor's label on the grid
+    settings, the sensor's configuration with the host's overrides applied
+    monitor, the probe object, reused on every sweep; None if the sensor class is unknown
+    cell, the (col, row) grid cell showing the sensor
+    """
+
+    __slots__ = ("si", "name", "settings", "monitor", "cell")
+    si: int
+    name: str
+    settings: Mapping
+    monitor: Monitor | None
+    cell: tuple[int, int]
+
+
+class HostPlan(_Frozen):
+    """All sensors of one host
+    hi, host index
+    hostname, the host's alias in the ssh config
+    agent, whether the host may run the streaming agent
+    push, whether the host pushes its values (see ingest.py) instead of being probed
+    sensors, one entry per sensor, indexed by sensor index
+    """
+
+    __slots__ = ("hi", "hostname", "agent", "push", "sensors")
+    hi: int
+    hostname: str
+    agent: bool
+    push: bool
+    sensors: tuple[SensorEntry, ...]
+
+
+class Plan(_Frozen):
+    """The hosts and sensors to probe, compiled once from the configuration (at startup and on reload),
+    so the polling loop does no config lookups and allocates no probe objects.
+    """
+
+    __slots__ = ("grid", "hosts")
+    grid: Grid
+    hosts: tuple[HostPlan, ...]
+
+    def __init__(self, cfg: dict, grid: Grid | None = None) -> None:
+        grid = grid if grid is not None else Grid.from_config(cfg)
+        sensors = list(cfg.get("sensors", {}).values())[:len(grid.sensors)]
+        timeout = cfg.get("polling", {}).get("timeout", EXEC_TIMEOUT)
+        hosts = []
+        for hi, host in enumerate(cfg.get("hosts", [])[:len(grid.hosts)]):
+            hostname = host.get("hostname")
+            entries = []
+            for si, sensor in enumerate(sensors):
+                name = sensor.get("name")
+                settings = MappingProxyType({**sensor, **host.get(name, {})})
+                monitor = Monitor.create_instance(name, None, settings.get("cmd"), settings.get("values"),
+                                                  host=hostname, timeout=settings.get("timeout", timeout))
+                if monitor is None:
+                    logger.error("Sensor %s not found, %s will show it as offline.", name, hostname)
+                entries.append(SensorEntry(si=si, name=name, settings=settings, monitor=monitor,
+                                           cell=grid.position(hi, si)))
+            hosts.append(HostPlan(hi=hi, hostname=hostname, agent=host.get("agent", True),
+                                  push=host.get("push", False), sensors=tuple(entries)))
+        super().__init__(grid=grid, hosts=tuple(hosts))
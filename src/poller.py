@@ -0,0 +1,160 @@
+"""
+Concurrent host polling
+Author: Wolf Paulus <wolf@paulus.com>
+"""
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from math import ceil
+from time import monotonic
+from typing import Any, Callable, Iterator, Mapping, Optional, Sequence
+from log import logger
+from stats import stats
+
+Results = Optional[list[Optional[tuple[int, int]]]]
+
+
+class Poller:
+    """Probes hosts in parallel on a bounded thread pool.
+    Every host gets its own deadline, measured from the moment a worker picks it up,
+    so one unreachable host never delays the rest of the grid.
+    """
+
+    def __init__(self, probe: Callable[[Any], list[Optional[tuple[int, int]]]], workers: int = 8,
+                 deadline: float = 15.0, name: Callable[[Any], str] = lambda host: host.get("hostname", "")):
+        """Initialize the Poller
+        probe, callable that probes all sensors of one host and returns a list of (value, color_code)
+        workers, max. number of hosts probed at the same time
+        deadline, seconds a host may take before its results are given up on
+        name, returns a host's name, by default the hostname of a host's config
+        """
+        self.probe = probe
+        self.name = name
+        self.workers = max(1, workers)
+        self.deadline = deadline
+        self.last_sweep = 0.0  # duration of the last completed sweep in seconds
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="poller")
+        self._started: dict[Future, list[float]] = {}  # start time, filled in by the worker
+        self._busy: dict[str, Future] = {}  # hosts whose probe outlived its deadline and is still running
+
+    def sweep(self, hosts: Sequence) -> Iterator[tuple[int, Results]]:
+        """Probe all given hosts concurrently.
+        Yields (host index, results) in completion order; results is None if the host
+        missed its deadline, raised an error, or is still stuck in a previous sweep.
+        A single result is None if the sensor was not due for sampling.
+        """
+        start = monotonic()
+        cutoff = start + self.deadline * ceil(max(1, len(hosts)) / self.workers)
+        pending: dict[Future, int] = {}
+        skipped = []
+        for hi, host in enumerate(hosts):
+            hostname = self.name(host)
+            if hostname in self._busy:
+                if not self._busy[hostname].done():
+                    logger.warning("%s is still busy from a previous sweep, skipping.", hostname)
+                    stats.error("busy", hostname)
+                    skipped.append(hi)
+                    continue
+                del self._busy[hostname]
+            started: list[float] = []
+            future = self._executor.submit(self._run, host, started)
+            self._started[future] = started
+            pending[future] = hi
+        for hi in skipped:
+            yield hi, None
+
+        while pending:
+            now = monotonic()
+            expiry = min(self._expiry(f, cutoff) for f in pending)
+            done, _ = wait(pending, timeout=max(0.0, expiry - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                hi = pending.pop(future)
+                self._started.pop(future, None)
+                try:
+                    yield hi, future.result()
+                except Exception as err:  # a failing host must not end the sweep
+                    logger.error("%s : %s", self.name(hosts[hi]), err)
+                    stats.error(type(err).__name__, self.name(hosts[hi]))
+                    yield hi, None
+            now = monotonic()
+            for future, hi in list(pending.items()):
+                if now < self._expiry(future, cutoff):
+                    continue
+                del pending[future]
+                self._started.pop(future, None)
+                hostname = self.name(hosts[hi])
+                if not future.cancel():
+                    self._busy[hostname] = future
+                logger.error("%s missed its %.1f s deadline.", hostname, self.deadline)
+                stats.error("deadline", hostname)
+                yield hi, None
+
+        self.last_sweep = monotonic() - start
+        logger.info("Sweep of %d hosts took %.2f s", len(hosts), self.last_sweep)
+        stats.observe("sweep", "", self.last_sweep)
+
+    def shutdown(self) -> None:
+        """Stop accepting work; running probes are left to finish in the background."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, host: dict, started: list[float]) -> list[Optional[tuple[int, int]]]:
+        started.append(monotonic())
+        return self.probe(host)
+
+    def _expiry(self, future: Future, cutoff: float) -> float:
+        """A running probe expires deadline seconds after it started, a queued one at the sweep cutoff."""
+        started = self._started.get(future)
+        return started[0] + self.deadline if started else cutoff
+
+
+class Schedule:
+    """Adaptive sampling schedule per host and sensor.
+    A sensor configured with an interval is sampled at that interval. The interval shrinks to
+    min_interval while the value is close to one of its thresholds or just changed color band,
+    and doubles, up to max_interval, while the value stays in the uneventful bands 0 to 2.
+    Sensors without an interval are sampled on every sweep.
+    """
+
+    MARGIN = 0.1  # "close to a threshold": within this share of the thresholds' span
+
+    def __init__(self) -> None:
+        self._state: dict[tuple[str, int], tuple[float, float, int]] = {}  # -> (next due, interval, color)
+
+    def due(self, hostname: str, si: int, now: float | None = None) -> bool:
+        """Return True if the host's sensor should be sampled now"""
+        state = self._state.get((hostname, si))
+        return state is None or (monotonic() if now is None else now) >= state[0]
+
+    def observe(self, hostname: str, si: int, sensor: Mapping, result: tuple[int, int],
+                now: float | None = None) -> None:
+        """Record a sample and schedule the sensor's next one.
+        Args:
+            hostname (str): the host the sensor was sampled on
+            si (int): sensor index
+            sensor (Mapping): the sensor's config, with interval, min_interval, max_interval and values
+            result (tuple[int,int]): the sample's (value, color_code)
+            now (float): monotonic time of the sample
+        """
+        interval = sensor.get("interval", 0)
+        if not interval:
+            return
+        now = monotonic() if now is None else now
+        value, color = result
+        state = self._state.get((hostname, si))
+        if state is not None and color != state[2] or Schedule._near_threshold(value, sensor.get("values")):
+            current = sensor.get("min_interval", interval / 4)
+        elif state is not None and 0 <= color <= 2:
+            current = min(max(state[1], interval / 2) * 2, sensor.get("max_interval", interval * 4))
+        else:
+            current = interval
+        self._state[(hostname, si)] = now + current, current, color
+
+    def forget(self, hostname: str | None = None) -> None:
+        """Drop the schedule of a host, or of all hosts; its sensors are due right away"""
+        self._state = {key: state for key, state in list(self._state.items())
+                       if hostname is not None and key[0] != hostname}
+
+    @staticmethod
+    def _near_threshold(value: float, values: list[int] | None) -> bool:
+        if not values or value < 0:
+            return False
+        margin = Schedule.MARGIN * ((values[-1] - values[0]) or 1)
+        return any(abs(value - threshold) <= margin for threshold in values)
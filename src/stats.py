@@ -0,0 +1,102 @@
+"""
+Self-instrumentation: fixed-bucket latency histograms and error counters
+Author: Wolf Paulus <wolf@paulus.com>
+"""
+from bisect import bisect_left
+from collections import Counter
+from threading import Lock
+
+# upper bounds (seconds) of the latency buckets, the last bucket holds everything slower
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, recording a sample costs one bisect and two additions"""
+
+    __slots__ = ("counts", "total", "slowest")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.slowest = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        if seconds > self.slowest:
+            self.slowest = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile, e.g. q=0.95; the slowest sample for the last bucket"""
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else self.slowest
+        return 0.0
+
+
+class Stats:
+    """Latency histograms keyed by (metric, label), e.g. ("exec", "alpha"), and error counters.
+    Metrics used by ZeroMonitor:
+        connect    SSH connection setup, per host
+        exec       remote command execution, per host (batch) or host/sensor
+        parse      parsing a command's output, per host/sensor
+        update     queuing a reading on a display, per display
+        show       pushing a frame to the LED strip
+        sweep      probing all hosts once
+    """
+
+    def __init__(self) -> None:
+        self._histograms: dict[tuple[str, str], Histogram] = {}
+        self._errors: Counter = Counter()  # (kind, label) -> count
+        self._lock = Lock()
+
+    def observe(self, metric: str, label: str, seconds: float) -> None:
+        """Record a latency sample"""
+        key = (metric, label)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def error(self, kind: str, label: str = "") -> None:
+        """Count an error, e.g. error("ConnectionResetError", "alpha")"""
+        with self._lock:
+            self._errors[(kind, label)] += 1
+
+    def errors(self) -> dict[tuple[str, str], int]:
+        with self._lock:
+            return dict(self._errors)
+
+    def histogram(self, metric: str, label: str = "") -> Histogram | None:
+        return self._histograms.get((metric, label))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._errors.clear()
+
+    def text(self) -> str:
+        """Return all histograms and error counters as a plain text table"""
+        with self._lock:
+            rows = [(metric, label, h.count, h.total, h.quantile(0.5), h.quantile(0.95), h.slowest)
+                    for (metric, label), h in sorted(self._histograms.items())]
+            errors = sorted(self._errors.items())
+        lines = [f"{'metric':<8} {'label':<32} {'count':>8} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>9}"]
+        for metric, label, count, total, p50, p95, slowest in rows:
+            lines.append(f"{metric:<8} {label:<32} {count:>8} {total / count * 1000:>9.1f} "
+                         f"{p50 * 1000:>8.1f} {p95 * 1000:>8.1f} {slowest * 1000:>9.1f}")
+        lines.append("")
+        lines.append(f"{'error':<24} {'label':<32} {'count':>8}")
+        for (kind, label), count in errors:
+            lines.append(f"{kind:<24} {label:<32} {count:>8}")
+        return "\n".join(lines) + "\n"
+
+
+stats = Stats()  # process-wide instance, like the logger in log.py
@@ -0,0 +1,217 @@
+"""
+Durable on-disk metrics store
+Author: Wolf Paulus <wolf@paulus.com>
+"""
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timezone
+from threading import Lock
+from time import monotonic, time
+from typing import BinaryIO, Iterator
+from log import logger
+
+# timestamp, key id, color code, value: a raw reading, 12 bytes
+RAW = struct.Struct("<IHbxf")
+# time written, key id, bucket start, min, avg, max: a bucket of an aggregated history tier, 24 bytes;
+# a bucket is complete only once its cell's next reading is in, so buckets are not written in start order
+AGGREGATE = struct.Struct("<IH2xIfff")
+# one set of append-only files per (UTC) day: <day>.bin raw readings, <day>-<bucket seconds>.bin aggregates,
+# and <day>.keys, the "host<TAB>sensor" of every key id used that day, one per line
+SEGMENT = "readings-%Y%m%d"
+SNAPSHOT = "grid.json"  # the latest value of every host's sensors
+
+
+def write_snapshot(path: str, cells: dict[tuple[str, str], tuple[int, int]]) -> None:
+    """Replace the grid snapshot in the store's directory with the latest (host, sensor) -> (value, color code),
+    see read_snapshot
+    """
+    target = os.path.join(path, SNAPSHOT)
+    grid_json = json.dumps({"cells": [{"host": host, "sensor": sensor, "value": value, "color": color}
+                                      for (host, sensor), (value, color) in cells.items()]})
+    try:
+        with open(target + ".tmp", "w", encoding="utf-8") as file:
+            file.write(grid_json)
+        os.replace(target + ".tmp", target)  # a reader never sees a half-written snapshot
+    except OSError as err:
+        logger.error("Error writing the grid snapshot: %s", err)
+
+
+def read_snapshot(path: str) -> dict[tuple[str, str], tuple[int, int]]:
+    """Return the last saved grid, (host, sensor) -> (value, color code), empty if there is none.
+    Cells are found by their labels, so the snapshot still applies after a layout change.
+    """
+    try:
+        with open(os.path.join(path, SNAPSHOT), encoding="utf-8") as file:
+            cells = json.load(file)["cells"]
+        return {(cell["host"], cell["sensor"]): (cell["value"], cell["color"]) for cell in cells if cell["host"]}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+class Store:
+    """Append-only log of fixed-size binary records, one set of segment files per day.
+    Records carry a small key id instead of the host and sensor names; the ids of a day are listed
+    in its .keys file, so the readings stay with their host and sensor when the grid is laid out anew.
+    Besides the raw readings, the store keeps the buckets of the aggregated history tiers, so these
+    can be restored without going through every raw reading of the past, see aggregate().
+    Records are buffered in memory and written with a single write and fsync per file every flush
+    seconds, sparing the SD card; a crash loses at most the records of the last flush interval.
+    A torn record at the end of a segment is cut off when the segment is opened again.
+    """
+
+    def __init__(self, path: str = "data", flush: float = 60.0, retention: int = 30) -> None:
+        """Initialize the store
+        path, directory holding the segment files
+        flush, seconds between writes to disk
+        retention, days of segments kept, older segments are deleted on rotation
+        """
+        self.path = path
+        self.flush_interval = flush
+        self.retention = retention
+        self._buffers: dict[int, list[tuple]] = {}  # bucket seconds (0: raw) -> records as (ts, (host, sensor), ...)
+        self._last_flush = monotonic()
+        self._day = ""
+        self._keys: dict[tuple[str, str], int] = {}  # (host, sensor) -> key id of the current day
+        self._files: dict[int, BinaryIO] = {}  # bucket seconds -> open segment of the current day
+        self._lock = Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def append(self, host: str, sensor: str, values: tuple[int, int], ts: float | None = None) -> None:
+        """Buffer a reading (value, color code), writing the buffers to disk when the flush interval has passed"""
+        ts = time() if ts is None else ts
+        with self._lock:
+            self._buffers.setdefault(0, []).append((int(ts), (host, sensor), values[1], values[0]))
+        if monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def aggregate(self, host: str, sensor: str, bucket: int, sample: tuple[int, float, float, float]) -> None:
+        """Buffer a completed bucket (start, min, avg, max) of a history tier with bucket seconds"""
+        with self._lock:
+            self._buffers.setdefault(bucket, []).append((int(time()), (host, sensor), int(sample[0]), *sample[1:]))
+
+    def flush(self) -> None:
+        """Write all buffered records, one write and one fsync per file; new key ids are written first"""
+        with self._lock:
+            self._last_flush = monotonic()
+            if not any(self._buffers.values()):
+                return
+            try:
+                self._rotate(datetime.now(timezone.utc).strftime(SEGMENT))
+                new = list(dict.fromkeys(key for records in self._buffers.values() for _, key, *_ in records
+                                         if key not in self._keys))
+                if new:
+                    with open(self._name(".keys"), "a", encoding="utf-8") as file:
+                        file.write("".join(f"{host}\t{sensor}\n" for host, sensor in new))
+                        file.flush()
+                        os.fsync(file.fileno())
+                    self._keys.update((key, i) for i, key in enumerate(new, len(self._keys)))
+                for bucket, records in self._buffers.items():
+                    if records:
+                        layout = AGGREGATE if bucket else RAW
+                        file = self._open(bucket, layout)
+                        file.write(b"".join(layout.pack(ts, self._keys[key], *fields) for ts, key, *fields in records))
+                        file.flush()
+                        os.fsync(file.fileno())
+                        records.clear()
+            except OSError as err:
+                logger.error("Error writing metrics store: %s", err)  # keep the buffers, retry on the next flush
+                self._day = ""  # and reopen the segments then, cutting off what was torn
+
+    def replay(self, since: float = 0, bucket: int = 0) -> Iterator[tuple]:
+        """Yield stored records not older than since, in the order they were written:
+        (timestamp, host, sensor, value, color_code) for the raw readings (bucket 0),
+        (start, host, sensor, min, avg, max) for the buckets of the tier with the given bucket seconds.
+        Segments are memory-mapped; older days are skipped, and within a segment the first record
+        is found by bisection. Records still in the buffers are not included.
+        """
+        layout, suffix = (AGGREGATE, f"-{bucket}.bin") if bucket else (RAW, ".bin")
+        first_day = datetime.fromtimestamp(max(0.0, since), timezone.utc).strftime(SEGMENT)
+        for day in self._days():
+            if day < first_day or not os.path.exists(os.path.join(self.path, day + suffix)):
+                continue
+            keys = self._read_keys(day)
+            with open(os.path.join(self.path, day + suffix), "rb") as file:
+                count = os.fstat(file.fileno()).st_size // layout.size
+                if count == 0:
+                    continue
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    lo, hi = 0, count  # records are appended in the order they are written
+                    while lo < hi:
+                        mid = (lo + hi) // 2
+                        if layout.unpack_from(view, mid * layout.size)[0] < since:
+                            lo = mid + 1
+                        else:
+                            hi = mid
+                    records = memoryview(view)[lo * layout.size:count * layout.size]
+                    try:
+                        for ts, key, *fields in layout.iter_unpack(records):
+                            if key >= len(keys):  # its id was lost in a crash
+                                continue
+                            if not bucket and ts >= since:
+                                yield ts, *keys[key], fields[1], fields[0]
+                            elif bucket and fields[0] >= since:  # written no earlier than its start
+                                yield fields[0], *keys[key], *fields[1:]
+                    finally:
+                        records.release()
+
+    def close(self) -> None:
+        """Flush the buffers and close the current segments"""
+        self.flush()
+        with self._lock:
+            for file in self._files.values():
+                file.close()
+            self._files.clear()
+
+    def _name(self, suffix: str) -> str:
+        return os.path.join(self.path, self._day + suffix)
+
+    def _rotate(self, day: str) -> None:
+        """Switch to the segments of the day, cleaning up when the day has changed"""
+        if day == self._day:
+            return
+        for file in self._files.values():
+            file.close()
+        self._files.clear()
+        self._day = day
+        keys = self._read_keys(day, repair=True)
+        self._keys = {key: i for i, key in enumerate(keys)}
+        self._expire()
+
+    def _open(self, bucket: int, layout: struct.Struct) -> BinaryIO:
+        """Return the current day's segment for the bucket"""
+        file = self._files.get(bucket)
+        if file is None:
+            name = f"-{bucket}.bin" if bucket else ".bin"
+            file = self._files[bucket] = open(self._name(name), "ab")
+            torn = file.tell() % layout.size
+            if torn:  # a crash interrupted the last write
+                logger.warning("Cutting off %d bytes of a torn record in %s", torn, self._day + name)
+                file.truncate(file.tell() - torn)
+        return file
+
+    def _read_keys(self, day: str, repair: bool = False) -> list[tuple[str, str]]:
+        """Return the (host, sensor) of the day's key ids; a torn last line is ignored, or cut off to repair it"""
+        path = os.path.join(self.path, day + ".keys")
+        try:
+            with open(path, encoding="utf-8") as file:
+                text = file.read()
+        except OSError:
+            return []
+        complete = text[:text.rfind("\n") + 1]
+        if repair and complete != text:
+            with open(path, "r+", encoding="utf-8") as file:
+                file.truncate(len(complete.encode("utf-8")))
+        return [tuple(line.split("\t", 1)) for line in complete.splitlines()]
+
+    def _expire(self) -> None:
+        """Delete segments older than the retention period"""
+        oldest = datetime.fromtimestamp(time() - self.retention * 86400, timezone.utc).strftime(SEGMENT)
+        for name in os.listdir(self.path):
+            if name.startswith("readings-") and name[:len(oldest)] < oldest:
+                os.remove(os.path.join(self.path, name))
+                logger.info("Removed expired metrics segment %s", name)
+
+    def _days(self) -> list[str]:
+        return sorted(n[:-5] for n in os.listdir(self.path) if n.startswith("readings-") and n.endswith(".keys"))
@@ -1,13 +1,29 @@
-"""Tiny web server that renders the 4×8 NeoPixel grid as HTML.
+"""Tiny web server that renders the (virtual) NeoPixel grid as HTML.
 Author: Wolf Paulus <wolf@paulus.com>
 """
+import gzip
+import json
+import socket
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from http.server import HTTPServer, BaseHTTPRequestHandler
-from threading import Thread
+from queue import Queue, Empty, Full
+from select import select
+from threading import Thread, Lock, BoundedSemaphore
+from time import monotonic, perf_counter
+from typing import TYPE_CHECKING, Callable
+from urllib.parse import urlsplit, parse_qs
+from classify import TIMEOUT
+from display import Display
+from grid import Grid
+from history import History
 from log import logger
+from stats import stats
 
-ROWS, COLS = 4, 8
+if TYPE_CHECKING:
+    from ingest import Ingest
 
-# CSS rgb strings matching NeoDisplay.COLORS indices 0–5, plus off (-1)
+# CSS rgb strings matching NeoDisplay.COLORS indices 0–5, plus off (-1) and timed out (-2)
 CSS_COLORS = [
     "rgb(0, 0, 255)",      # 0: blue    — low/idle
     "rgb(0, 200, 200)",    # 1: cyan    — below normal
@@ -17,36 +33,194 @@ CSS_COLORS = [
     "rgb(255, 0, 255)",    # 5: pink    — critical
 ]
 CSS_OFF = "rgb(30, 30, 30)"
+CSS_TIMEOUT = "rgb(90, 90, 90)"
+GZIP_MIN_SIZE = 512  # smaller payloads are sent uncompressed
+MAX_PUSH = 1 << 20  # largest accepted push body in bytes
+MAX_STREAM_BUFFER = 64 * 1024  # bytes an event stream may fall behind before it is closed
+PING = 15  # seconds between keepalive comments on the event streams
 
 
-class WebDisplay:
+class WebDisplay(Display):
     """Web-based display that mirrors the NeoPixel grid as HTML."""
 
-    def __init__(self, cfg: dict, port: int = 80):
-        self._grid = [[(-1, -1)] * COLS for _ in range(ROWS)]
-        self._mode = cfg.get("displays", {}).get("neopixel", {}).get("mode", 1)
-        self._hosts = [h.get("hostname", "") for h in cfg.get("hosts", [])]
-        self._sensors = [s.get("name", "") for s in cfg.get("sensors", {}).values()]
+    name = "web"
+
+    def __init__(self, cfg: dict, port: int = 80, history: History | None = None, grid: Grid | None = None,
+                 ingest: "Ingest | None" = None):
+        self._history = history
+        self.ingest = ingest  # receives POST /api/push, if set
+        self._layout = grid if grid is not None else Grid.from_config(cfg)
+        self._rows, self._cols = self._layout.rows, self._layout.cols
+        self._grid = [[(-1, -1)] * self._cols for _ in range(self._rows)]  # written by update()
+        self._snapshot = tuple(tuple(row) for row in self._grid)  # published by flush(), read by the server
+        self._dirty: dict[tuple[int, int], tuple[int, int]] = {}  # cells updated since the last flush
+        self._mode = self._layout.mode
+        self._cells = {(col, row): self._layout.labels(col, row)
+                       for row in range(self._rows) for col in range(self._cols)}
+        self._by_labels = {labels: cell for cell, labels in self._cells.items() if labels[0]}
+        self._version = 0  # incremented on every flush, invalidates the cached payloads
+        self._cache: dict[str, tuple[int, bytes, str, bytes | None]] = {}  # request -> (version, body, etag, gzip)
+        self._fragments: dict[tuple[int, int], str] = {}  # (col, row) -> the cell's HTML, until the cell changes
+        self._subscribers: set[Queue] = set()  # one queue of cell deltas per open event stream
+        self._lock = Lock()
         self._port = port
-        self._server = HTTPServer(("", port), _make_handler(self))
+        web_cfg = cfg.get("displays", {}).get("web", {})
+        self._events = _EventStreams(self.unsubscribe, web_cfg.get("max_streams", 64))  # the open /events streams
+        self._server = _PooledHTTPServer(("", port), _make_handler(self), web_cfg.get("max_connections", 32))
         self._thread = Thread(target=self._server.serve_forever, daemon=True)
         self._thread.start()
         logger.info("WebDisplay listening on port %d", port)
 
+    @classmethod
+    def from_config(cls, cfg: dict, grid: Grid, history: History | None = None, ingest: "Ingest | None" = None,
+                    **context) -> "WebDisplay":
+        """Create the web display on displays.web.port, 80 by default"""
+        port = cfg.get("displays", {}).get("web", {}).get("port", 80)
+        return cls(cfg, port, history=history, grid=grid, ingest=ingest)
+
     def update(self, hi: int, si: int, values: tuple[int, int]) -> None:
-        """Update grid cell. hi=column, si=row (matching NeoDisplay convention)."""
-        if 0 <= si < ROWS and 0 <= hi < COLS:
-            self._grid[si][hi] = values
+        """Update grid cell. hi=column, si=row (matching NeoDisplay convention).
+        The update becomes visible to viewers with the next flush().
+        """
+        if 0 <= si < self._rows and 0 <= hi < self._cols:
+            start = perf_counter()
+            with self._lock:
+                self._grid[si][hi] = values
+                self._dirty[(hi, si)] = values
+            stats.observe("update", "web", perf_counter() - start)
 
-    def render(self) -> str:
-        """Return an HTML page representing the current grid state."""
-        col_headers, row_headers = self._labels()
+    def flush(self) -> None:
+        """Publish all updates since the last flush as one consistent snapshot and push them to the event streams."""
+        with self._lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, {}
+            self._snapshot = tuple(tuple(row) for row in self._grid)
+            self._version += 1
+            for cell in dirty:
+                self._fragments.pop(cell, None)
+            subscribers = list(self._subscribers)
+        if subscribers:
+            deltas = [self._delta(hi, si, values) for (hi, si), values in dirty.items()]
+            for queue in subscribers:
+                try:
+                    for delta in deltas:
+                        queue.put_nowait(delta)
+                except Full:  # a stalled client, drop it; the browser reconnects and reloads the grid
+                    self.unsubscribe(queue)
+            self._events.wake()
 
-        # Pad labels to exactly COLS / ROWS so every CSS grid cell is filled
-        if col_headers:
-            col_headers += [""] * (COLS - len(col_headers))
-        if row_headers:
-            row_headers += [""] * (ROWS - len(row_headers))
+    def relayout(self, grid: Grid, moves: dict[tuple[int, int], tuple[int, int]]) -> None:
+        """Switch to a new grid layout, e.g. after hosts or sensors were added to the configuration.
+        Cells keep their values where moves maps them to a new cell. Open event streams are ended,
+        the browsers reconnect and load the new layout.
+        """
+        cells = {(col, row): grid.labels(col, row) for row in range(grid.rows) for col in range(grid.cols)}
+        with self._lock:
+            values = [[(-1, -1)] * grid.cols for _ in range(grid.rows)]
+            for (col, row), (new_col, new_row) in moves.items():
+                values[new_row][new_col] = self._grid[row][col]
+            self._layout, self._rows, self._cols, self._mode = grid, grid.rows, grid.cols, grid.mode
+            self._grid, self._dirty = values, {}
+            self._snapshot = tuple(tuple(row) for row in values)
+            self._cells = cells
+            self._by_labels = {labels: cell for cell, labels in cells.items() if labels[0]}
+            self._version += 1
+            self._fragments = {}
+            subscribers = list(self._subscribers)
+        for queue in subscribers:
+            self.unsubscribe(queue)
+
+    def subscribe(self) -> Queue:
+        """Return a queue that receives a JSON delta for every updated cell, see unsubscribe."""
+        queue: Queue = Queue(maxsize=256)
+        with self._lock:
+            self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: Queue) -> None:
+        """Stop sending deltas to the queue; None is queued to end the stream reading from it."""
+        with self._lock:
+            self._subscribers.discard(queue)
+        while True:
+            try:
+                queue.put_nowait(None)
+                break
+            except Full:  # the stream ends anyway, make room for the None
+                try:
+                    queue.get_nowait()
+                except Empty:
+                    pass
+        self._events.wake()
+
+    def cached(self, key: str, build: Callable[[], str]) -> tuple[bytes, str, bytes | None]:
+        """Return (body, etag, gzipped body) for a payload, building it at most once per grid update.
+        The gzipped body is None for payloads too small to be worth compressing.
+        Args:
+            key (str): identifies the payload, e.g. the request path with its query
+            build (Callable): renders the payload as a string
+        """
+        with self._lock:
+            version = self._version
+            hit = self._cache.get(key)
+        if hit is not None and hit[0] == version:
+            return hit[1], hit[2], hit[3]
+        body = build().encode()
+        etag = f'"{zlib.crc32(body):08x}"'
+        compressed = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_SIZE else None
+        with self._lock:
+            if len(self._cache) > 64:  # unbounded queries must not grow the cache forever
+                self._cache.clear()
+            self._cache[key] = (version, body, etag, compressed)
+        return body, etag, compressed
+
+    def grid_json(self) -> str:
+        """Return the grid as JSON: one entry per cell with its position, labels, value and color code."""
+        with self._lock:
+            grid, labels, cells = self._snapshot, self._cells, []
+        for (col, row), (host, sensor) in labels.items():
+            value, color = grid[row][col]
+            cells.append({"col": col, "row": row, "host": host, "sensor": sensor, "value": value, "color": color})
+        return json.dumps({"mode": self._mode, "rows": self._rows, "cols": self._cols, "cells": cells})
+
+    def history_json(self, host: str, sensor: str, tier: int = 0) -> str:
+        """Return the history of the cell showing the host's sensor as JSON.
+        Samples of a raw tier (bucket 0) are [timestamp, value], of aggregated tiers [timestamp, min, avg, max].
+        Raises: KeyError if no cell shows the host's sensor.
+        """
+        with self._lock:
+            col, row = self._by_labels[(host, sensor)]
+        samples = self._history.series(col, row, tier) if self._history is not None else []
+        return json.dumps({"host": host, "sensor": sensor, "tier": tier, "samples": samples})
+
+    def metrics(self) -> str:
+        """Return the grid in the Prometheus text exposition format."""
+        with self._lock:
+            grid, by_labels, values, colors = self._snapshot, self._by_labels, [], []
+        for (host, sensor), (col, row) in by_labels.items():
+            value, color = grid[row][col]
+            labels = f'host="{host}",sensor="{sensor}",col="{col}",row="{row}"'
+            values.append(f"zeromonitor_value{{{labels}}} {value}")
+            colors.append(f"zeromonitor_color{{{labels}}} {color}")
+        return "\n".join([
+            "# HELP zeromonitor_value Latest measured sensor value, -1 if offline, -2 if timed out.",
+            "# TYPE zeromonitor_value gauge",
+            *values,
+            "# HELP zeromonitor_color Color code of the latest value, 0 (low) to 5 (critical), -1 if offline, "
+            "-2 if timed out.",
+            "# TYPE zeromonitor_color gauge",
+            *colors,
+        ]) + "\n"
+
+    def render(self) -> str:
+        """Return an HTML page representing the current grid state.
+        The HTML of a cell is kept until the cell is updated, so a page rendered after one host's flush
+        only renders that host's cells again.
+        """
+        with self._lock:
+            layout, grid, version, fragments = self._layout, self._snapshot, self._version, self._fragments
+        built = {}
+        col_headers, row_headers = layout.headers()
 
         # Build column header row (with empty top-left corner if row headers exist)
         header_html = ""
@@ -57,53 +231,344 @@ class WebDisplay:
                 header_html += f'<div class="label col-label">{label}</div>\n'
 
         # Build grid rows
-        rows_html = ""
-        for row in range(ROWS):
+        rows_html = []
+        for row in range(layout.rows):
             if row_headers:
-                rows_html += f'<div class="label row-label">{row_headers[row]}</div>\n'
-            for col in range(COLS):
-                value, color_idx = self._grid[row][col]
-                css = CSS_COLORS[color_idx] if 0 <= color_idx < len(CSS_COLORS) else CSS_OFF
-                tooltip = f"{value}" if value >= 0 else "offline"
-                rows_html += f'<div class="led" style="background:{css}" title="{tooltip}"></div>\n'
-
-        grid_cols = COLS + (1 if row_headers else 0)
+                rows_html.append(f'<div class="label row-label">{row_headers[row]}</div>\n')
+            for col in range(layout.cols):
+                cell = fragments.get((col, row))
+                if cell is None:
+                    value, color_idx = grid[row][col]
+                    css, tooltip = _css(color_idx), self._title(col, row, value)
+                    spark = self._sparkline(col, row)
+                    cell = built[(col, row)] = (f'<div class="led" id="c{col}-{row}" style="background:{css}" '
+                                                f'title="{tooltip}">{spark}</div>\n')
+                rows_html.append(cell)
+        with self._lock:
+            if self._version == version:  # no cell changed meanwhile
+                self._fragments.update(built)
+
+        grid_cols = layout.cols + (1 if row_headers else 0)
         return (_HTML
                 .replace("{{GRID_COLS}}", str(grid_cols))
                 .replace("{{COL_HEADERS}}", header_html)
-                .replace("{{ROWS}}", rows_html)
-                .replace("{{MODE}}", str(self._mode))
+                .replace("{{ROWS}}", "".join(rows_html))
+                .replace("{{MODE}}", str(layout.mode))
                 )
 
-    def _labels(self) -> tuple[list[str], list[str]]:
-        """Return (column_headers, row_headers) based on the display mode.
-        Mode 1: 1 host x 32 sensors, row-wise fill — no labels
-        Mode 2: hosts own rows, sensors own columns
-        Mode 3: hosts own columns, sensors own rows
-        Mode 4: 32 hosts x 1 sensor, row-wise fill — no labels
-        """
-        if self._mode == 2:
-            return self._sensors[:COLS], self._hosts[:ROWS]
-        if self._mode == 3:
-            return self._hosts[:COLS], self._sensors[:ROWS]
-        return [], []
+    def _delta(self, col: int, row: int, values: tuple[int, int]) -> str:
+        """Return a cell update as JSON, carrying what the page needs to patch the LED."""
+        value, color_idx = values
+        return json.dumps({
+            "col": col,
+            "row": row,
+            "value": value,
+            "color": color_idx,
+            "css": _css(color_idx),
+            "title": self._title(col, row, value),
+        })
+
+    def _title(self, col: int, row: int, value: int) -> str:
+        """Return the tooltip of a cell: its value and trend, or its error state"""
+        return f"{value}{self._trend(col, row)}" if value >= 0 else "timed out" if value == TIMEOUT else "offline"
+
+    def _sparkline(self, col: int, row: int) -> str:
+        """Return an inline SVG polyline of the cell's recent values, or an empty string without history"""
+        values = self._history.sparkline(col, row) if self._history is not None else []
+        if len(values) < 2:
+            return ""
+        lo, hi = min(values), max(values)
+        span = (hi - lo) or 1
+        points = " ".join(f"{i},{10 - 10 * (v - lo) / span:.1f}" for i, v in enumerate(values))
+        return (f'<svg class="spark" viewBox="0 0 {len(values) - 1} 10" preserveAspectRatio="none">'
+                f'<polyline points="{points}"/></svg>')
+
+    def _trend(self, col: int, row: int) -> str:
+        """Return an arrow for the cell's trend over the last 10 minutes"""
+        delta = self._history.trend(col, row) if self._history is not None else 0
+        return " ↑" if delta > 0 else " ↓" if delta < 0 else ""
 
     def shutdown(self) -> None:
+        for queue in list(self._subscribers):
+            self.unsubscribe(queue)
+        self._events.close()
         self._server.shutdown()
+        self._server.server_close()
+
+    def close(self) -> None:
+        self.shutdown()
+
+
+def _css(color_idx: int) -> str:
+    """Return the CSS color of a color code"""
+    if 0 <= color_idx < len(CSS_COLORS):
+        return CSS_COLORS[color_idx]
+    return CSS_TIMEOUT if color_idx == TIMEOUT else CSS_OFF
+
+
+class _EventStreams:
+    """The open /events streams, all written by one thread, so open dashboards hold neither a request
+    worker nor one of its max_connections slots. At most limit streams are open at a time.
+    A stream is closed, freeing its slot, as soon as a write fails, the client closes the connection,
+    or the client falls behind by more than MAX_STREAM_BUFFER bytes.
+    """
+
+    def __init__(self, unsubscribe: Callable[[Queue], None], limit: int = 64) -> None:
+        self.limit = limit
+        self._unsubscribe = unsubscribe
+        self._streams: dict[socket.socket, tuple[Queue, bytearray]] = {}  # connection -> (deltas, unsent bytes)
+        self._lock = Lock()
+        self._wake_r, self._wake_w = socket.socketpair()  # wakes the writer from select()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._closed = False
+        self._thread = Thread(target=self._write, daemon=True, name="websvr-events")
+        self._thread.start()
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def add(self, connection: socket.socket, queue: Queue, head: bytes) -> bool:
+        """Take over a connection whose request was read, sending head and then the deltas of the queue.
+        Returns: False if limit streams are already open
+        """
+        with self._lock:
+            if self._closed or len(self._streams) >= self.limit:
+                return False
+            connection.setblocking(False)
+            self._streams[connection] = queue, bytearray(head)
+        self.wake()
+        return True
+
+    def wake(self) -> None:
+        """Have the writer look at the queues, e.g. after deltas were queued"""
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:  # already awake
+            pass
+
+    def close(self) -> None:
+        self._closed = True
+        self.wake()
+        self._thread.join(timeout=5)
+
+    def _write(self) -> None:
+        ping = monotonic() + PING
+        while not self._closed:
+            with self._lock:
+                streams = dict(self._streams)
+            pending = [connection for connection, (_, unsent) in streams.items() if unsent]
+            readable, _, _ = select([self._wake_r, *streams], pending, [], max(0.0, ping - monotonic()))
+            if self._wake_r in readable:
+                try:
+                    while self._wake_r.recv(4096):
+                        pass
+                except OSError:  # drained
+                    pass
+            if monotonic() >= ping:
+                ping = monotonic() + PING
+                for _, unsent in streams.values():
+                    unsent += b": ping\n\n"  # keeps proxies from closing an idle stream
+            for connection, (queue, unsent) in streams.items():
+                if not self._send(connection, queue, unsent, connection in readable):
+                    self._drop(connection)
+        for connection in list(self._streams):
+            self._drop(connection)
+
+    @staticmethod
+    def _send(connection: socket.socket, queue: Queue, unsent: bytearray, readable: bool) -> bool:
+        """Send the stream's queued deltas, as far as the connection takes them without blocking.
+        Returns: False if the stream ended
+        """
+        try:
+            if readable and not connection.recv(4096):  # the client closed the connection
+                return False
+            while True:
+                try:
+                    delta = queue.get_nowait()
+                except Empty:
+                    break
+                if delta is None:  # unsubscribed, e.g. after a relayout
+                    return False
+                unsent += f"data: {delta}\n\n".encode()
+            if unsent:
+                del unsent[:connection.send(unsent)]
+        except BlockingIOError:
+            pass
+        except OSError:
+            return False
+        return len(unsent) <= MAX_STREAM_BUFFER
+
+    def _drop(self, connection: socket.socket) -> None:
+        with self._lock:
+            queue, _ = self._streams.pop(connection)
+        self._unsubscribe(queue)
+        try:
+            connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        connection.close()
+
+
+class _PooledHTTPServer(HTTPServer):
+    """HTTP server that serves connections on a bounded pool of worker threads.
+    Connections beyond max_connections are answered with 503 right away instead of queueing up.
+    Connections handed over to another thread, e.g. event streams, are detached: the worker and its
+    slot are freed, but the connection stays open.
+    """
+
+    def __init__(self, address: tuple[str, int], handler, max_connections: int = 32):
+        super().__init__(address, handler)
+        self._pool = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="websvr")
+        self._slots = BoundedSemaphore(max_connections)
+        self._detached: set[socket.socket] = set()
+        self._detached_lock = Lock()
+
+    def detach(self, request: socket.socket) -> None:
+        """Keep the connection open after its request was handled"""
+        with self._detached_lock:
+            self._detached.add(request)
+
+    def shutdown_request(self, request):
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            try:
+                request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._pool.submit(self._work, request, client_address)
+
+    def _work(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
 
 
 def _make_handler(display: WebDisplay):
     """Create a request handler class bound to the given display instance."""
 
     class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, every response carries a Content-Length
+        timeout = 30  # close idle keep-alive connections, freeing their worker
+        STREAM_HEAD = (b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                       b"Connection: close\r\n\r\n")
+
         def do_GET(self):
-            body = display.render().encode()
+            url = urlsplit(self.path)
+            if url.path == "/":
+                content_type, build = "text/html; charset=utf-8", display.render
+            elif url.path == "/api/grid":
+                content_type, build = "application/json", display.grid_json
+            elif url.path == "/metrics":
+                content_type, build = "text/plain; version=0.0.4; charset=utf-8", display.metrics
+            elif url.path == "/events":
+                self._stream()
+                return
+            elif url.path == "/debug/stats":
+                body = stats.text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            elif url.path == "/api/history":
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                content_type = "application/json"
+
+                def build():
+                    return display.history_json(query.get("host", ""), query.get("sensor", ""),
+                                                int(query.get("tier", 0)))
+            else:
+                self.send_error(404)
+                return
+            try:
+                body, etag, compressed = display.cached(self.path, build)
+            except (KeyError, ValueError):
+                self.send_error(404, "Unknown host, sensor or tier")
+                return
+            if compressed is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+                body, etag = compressed, etag[:-1] + '-gz"'
+            else:
+                compressed = None
+            if etag in self.headers.get("If-None-Match", ""):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if compressed is not None:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            ingest = display.ingest
+            if urlsplit(self.path).path != "/api/push" or ingest is None:
+                self.send_error(404)
+                return
+            if ingest.token and self.headers.get("Authorization") != f"Bearer {ingest.token}":
+                self.send_error(401)
+                return
+            if "Content-Length" not in self.headers:
+                self.send_error(411)
+                return
+            try:
+                length = int(self.headers["Content-Length"])
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.send_error(400, "Invalid Content-Length")
+                return
+            if length > MAX_PUSH:
+                self.send_error(413)
+                return
+            data = self.rfile.read(length)
+            if len(data) < length:  # the client went away mid-body
+                self.close_connection = True
+                return
+            accepted, rejected = ingest.push(data)
+            body = json.dumps({"accepted": accepted, "rejected": rejected}).encode()
             self.send_response(200)
-            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Type", "application/json")
             self.send_header("Content-Length", str(len(body)))
             self.end_headers()
             self.wfile.write(body)
 
+        def _stream(self):
+            """Hand the connection over to the event stream writer, which sends the cell deltas
+            as server-sent events until the client goes away, see _EventStreams.
+            """
+            self.close_connection = True  # the stream has no length, it ends when the connection closes
+            queue = display.subscribe()
+            if display._events.add(self.connection, queue, self.STREAM_HEAD):
+                self.server.detach(self.connection)
+            else:
+                display.unsubscribe(queue)
+                self.send_error(503, "Too many event streams")
+
         def log_message(self, format, *args):
             pass  # suppress default stderr logging
 
@@ -117,7 +582,7 @@ _HTML = """\
 <meta charset="utf-8">
 <meta name="viewport" content="width=device-width, initial-scale=1">
 <title>ZeroMonitor</title>
-<meta http-equiv="refresh" content="10">
+<noscript><meta http-equiv="refresh" content="10"></noscript>
 <style>
   body {
     display: flex;
@@ -133,6 +598,8 @@ _HTML = """\
   }
   .grid {
     display: grid;
+    max-width: 100vw;
+    overflow-x: auto;
     grid-template-columns: repeat({{GRID_COLS}}, auto);
     gap: 6px;
     align-items: center;
@@ -143,6 +610,19 @@ _HTML = """\
     height: 48px;
     border-radius: 50%;
     box-shadow: 0 0 8px rgba(255,255,255,0.15);
+    display: flex;
+    align-items: center;
+    justify-content: center;
+  }
+  .spark {
+    width: 32px;
+    height: 14px;
+    fill: none;
+    stroke: rgba(0,0,0,0.5);
+    stroke-width: 1.5px;
+  }
+  .spark polyline {
+    vector-effect: non-scaling-stroke;
   }
   .label {
     color: #999;
@@ -171,8 +651,29 @@ _HTML = """\
 {{ROWS}}
 </div>
 <!-- Footer -->
-<p>Mode: {{MODE}}<br/>Hover over LEDs for details. Page refreshes every 10 seconds.</p>
+<p>Mode: {{MODE}}<br/>Hover over LEDs for details. LEDs update live.</p>
 <p>&copy; 2025-2026 ZeroMonitor by <a href="https://wolfpaulus.com/zeromonitor" style="color: #ccc;">Wolf Paulus</a></p>
+<script>
+  // Patch only the LEDs that changed; after a reconnect, catch up with the full grid.
+  function patch(cell) {
+    const led = document.getElementById(`c${cell.col}-${cell.row}`);
+    if (led) {
+      if (cell.css) led.style.background = cell.css;
+      if (cell.title) led.title = cell.title;
+    }
+  }
+  if (window.EventSource) {
+    let connected = false;
+    const events = new EventSource("/events");
+    events.onmessage = (e) => patch(JSON.parse(e.data));
+    events.onopen = () => {
+      if (connected) location.reload();
+      connected = true;
+    };
+  } else {
+    setTimeout(() => location.reload(), 10000);
+  }
+</script>
 </body>
 </html>
 """
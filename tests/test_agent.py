@@ -0,0 +1,28 @@
+"""Tests for the agent module"""
+
+import subprocess
+import sys
+
+from agent import AGENT_SCRIPT, Agents
+from monitor import Monitor
+
+
+def test_agent_script():
+    proc = subprocess.Popen([sys.executable, "-u", "-c", AGENT_SCRIPT, "0.1", "/nonexistent", "/"],
+                            stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    proc.kill()
+    record = dict(field.split("=", 1) for field in line.split())
+    assert set(record) == {"cpu", "mem", "temp", "disk", "tasks"}
+    assert record["temp"] == "-1.0"
+    assert 0 <= float(record["mem"]) <= 100
+    assert Monitor.create_instance("TaskCount", None, "", [1, 2, 3]).consume(record) == (int(record["tasks"]), 5)
+
+
+def test_agent_paths():
+    monitors = [
+        Monitor.create_instance("CpuUsage", None, "mpstat -P ALL 1 1 | awk '{ print 100 - $NF }'", [3, 15, 30]),
+        Monitor.create_instance("CpuTemperature", None, "cat /sys/class/hwmon/hwmon0/temp2_input", [50, 62, 75]),
+        Monitor.create_instance("DiskUsage", None, "df /volume1", [30, 55, 80]),
+    ]
+    assert Agents._paths(monitors) == ("/sys/class/hwmon/hwmon0/temp2_input", "/volume1")
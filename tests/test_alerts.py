@@ -0,0 +1,72 @@
+"""Tests for the alerts module"""
+
+import json
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from queue import Queue
+from threading import Event, Thread
+from time import monotonic
+
+from alerts import Alerts, FileSink, Rule, Sink, WebhookSink
+
+
+def test_rules(tmp_path):
+    path = tmp_path / "alerts.log"
+    alerts = Alerts([Rule("hot", band=4, samples=3, sensors=["CpuTemperature"]), Rule("down", offline=60)],
+                    [FileSink(str(path))])
+    for now, band in enumerate([4, 5, 3, 4, 4, 5, 5, 2]):  # only the second spike lasts 3 samples
+        alerts.observe("alpha", "CpuTemperature", (80, band), now=now)
+    alerts.observe("alpha", "CpuUsage", (99, 5), now=10)  # not covered by the rule
+    for now in (100, 130, 160, 170):
+        alerts.observe("beta", "CpuUsage", (-1, -1), now=now)
+    alerts.observe("beta", "CpuUsage", (5, 0), now=200)
+    alerts.close()
+    sent = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(a["host"], a["rule"], a["state"], a["time"]) for a in sent] == [
+        ("alpha", "hot", "firing", 5), ("alpha", "hot", "resolved", 7),
+        ("beta", "down", "firing", 160), ("beta", "down", "resolved", 200)]
+
+
+def test_webhook():
+    received = Queue()
+
+    class Hook(BaseHTTPRequestHandler):
+        attempts = 0
+
+        def do_POST(self):
+            Hook.attempts += 1
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            if Hook.attempts == 1:  # fail once, the alert is retried
+                self.send_response(500)
+            else:
+                received.put(json.loads(body))
+                self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Hook)
+    Thread(target=server.serve_forever, daemon=True).start()
+    alerts = Alerts([Rule("critical", band=5)], [WebhookSink(f"http://127.0.0.1:{server.server_port}/")],
+                    backoff=0.01)
+    alerts.observe("alpha", "CpuUsage", (97, 5))
+    assert received.get(timeout=5)["message"] == "alpha CpuUsage: critical firing"
+    alerts.close()
+    server.shutdown()
+
+
+def test_never_blocks():
+    release = Event()
+
+    class Stuck(Sink):
+        def send(self, alert):
+            release.wait()
+
+    alerts = Alerts([Rule("critical", band=5)], [Stuck()], queue=2)
+    start = monotonic()
+    for i in range(10):
+        alerts.observe(f"host{i}", "CpuUsage", (97, 5))
+    assert monotonic() - start < 0.5  # alerts beyond the queue are dropped, not waited for
+    release.set()
+    alerts.close()
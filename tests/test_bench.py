@@ -0,0 +1,30 @@
+"""Tests for the bench module"""
+
+from bench import FakeSSHServer, SENSORS, cold_start, report, run
+from monitor import ConnectionPool, Monitor
+
+
+def test_fake_host_probe():
+    server = FakeSSHServer()
+    pool = ConnectionPool(resolver=server.connect_kwargs)
+    try:
+        client = pool.get("alpha")
+        monitors = [Monitor.create_instance(s["name"], client, s["cmd"], s["values"], host="alpha") for s in SENSORS]
+        assert [m.probe() for m in monitors[:5]] == [(4, 1), (48, 0), (39, 2), (22, 0), (142, 0)]
+        assert all(col != -1 for _, col in Monitor.probe_batch(client, monitors))
+    finally:
+        pool.close()
+        server.close()
+
+
+def test_run():
+    result = run(hosts=3, sensors=2, sweeps=2, latency=0.01)
+    assert result["probes"] == 12 and result["errors"] == 0
+    assert result["execs"] == 6  # batch mode, one exec per host and sweep
+    assert result["first_pixel"] is not None
+    assert "time-to-first-pixel" in report(result)
+
+
+def test_cold_start():
+    times = cold_start(hosts=2, sensors=2)
+    assert 0 < times["interpreter"] < times["first_frame"] < times["ready"] < times["first_sweep"]
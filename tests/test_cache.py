@@ -0,0 +1,47 @@
+"""Tests for the cache module"""
+
+from threading import Barrier, Thread
+from time import sleep
+
+from cache import ProbeCache
+
+
+def test_cache_ttl_and_size():
+    calls = []
+
+    def fetch(keys):
+        calls.append(keys)
+        return {key: key.upper() for key in keys}
+
+    cache = ProbeCache(ttl=0.1, size=2)
+    assert cache.get_many(["a", "b"], fetch) == {"a": "A", "b": "B"}
+    assert cache.get("a", lambda: "X") == "A"  # cached
+    assert cache.get_many(["a", "c"], fetch) == {"a": "A", "c": "C"}
+    assert calls == [["a", "b"], ["c"]]
+    assert cache.get("b", lambda: "X") == "X"  # least recently used, evicted
+    sleep(0.15)
+    assert cache.get("a", lambda: "Y") == "Y"  # expired
+
+
+def test_cache_single_flight():
+    calls = []
+    barrier = Barrier(4)
+
+    def fetch():
+        calls.append(1)
+        sleep(0.1)
+        return "output"
+
+    cache = ProbeCache(ttl=10)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(cache.get("host", fetch))
+
+    threads = [Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["output"] * 4 and len(calls) == 1
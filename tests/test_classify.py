@@ -0,0 +1,54 @@
+"""Tests for the classify module"""
+
+import random
+
+from classify import TIMEOUT, Classifier, band, boundaries
+from monitor import Monitor
+from plan import Plan
+
+
+def plan(hosts=1, **settings):
+    sensor = {"name": "CpuUsage", "cmd": "", "values": [50, 60, 70], **settings}
+    return Plan({"hosts": [{"hostname": f"h{i}"} for i in range(hosts)], "sensors": {"CpuUsage": sensor},
+                 "displays": {"neopixel": {"mode": 4}}})
+
+
+def test_band():
+    bounds = boundaries([50, 60, 70])
+    assert bounds == (50, 55, 60, 65, 70)
+    for v in range(-1, 80):
+        assert band(v, bounds) == Monitor.color_code(v, [50, 60, 70])
+
+
+def test_smoothing():
+    ewma = Classifier(plan(smoothing="ewma", alpha=0.5))
+    assert [ewma.classify([0], [v])[0] for v in (40, 80, 80, -1, 80)] == [(40, 0), (60, 2), (70, 4), (-1, -1), (80, 5)]
+    assert ewma.classify([0], [TIMEOUT]) == [(TIMEOUT, TIMEOUT)]  # error states pass through
+    med = Classifier(plan(smoothing="median", window=3))
+    assert [med.classify([0], [v])[0][0] for v in (40, 99, 42, 44)] == [40, 70, 42, 44]  # the spike never shows
+
+
+def test_hysteresis():
+    classifier = Classifier(plan(hysteresis=2))
+    assert [classifier.classify([0], [v])[0][1] for v in (59, 61, 62, 63, 59, 58, 54, 53)] == [2, 2, 2, 3, 3, 2, 2, 1]
+
+
+def test_batch():
+    big, small = Classifier(plan(100, hysteresis=1)), Classifier(plan(100, hysteresis=1))
+    rng = random.Random(7)
+    for _ in range(5):
+        values = [rng.choice([-1, rng.uniform(40, 80)]) for _ in range(100)]
+        assert big.classify(range(100), values) == [small.classify([i], [v])[0] for i, v in enumerate(values)]
+
+
+def test_reload():
+    before = Classifier(plan(2, smoothing="ewma", alpha=0.5, hysteresis=2))
+    before.classify([0, 1], [40, 40])
+    assert before.classify([0, 1], [80, 80]) == [(60, 2), (60, 2)]
+    after = Classifier(plan(3, smoothing="ewma", alpha=0.5, hysteresis=2), before)  # a host was added
+    assert after.classify([0, 1, 2], [80, 80, 80]) == [(70, 4), (70, 4), (80, 5)]
+    changed = Classifier(plan(2, smoothing="ewma", alpha=0.8, hysteresis=2), after)  # new settings start over
+    assert changed.classify([0], [80]) == [(80, 5)]
+    med = Classifier(plan(smoothing="median", window=3))
+    med.classify([0], [40])
+    assert Classifier(plan(smoothing="median", window=3), med).classify([0], [99]) == [(70, 4)]
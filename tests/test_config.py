@@ -0,0 +1,67 @@
+"""Tests for the config module"""
+
+import os
+
+import pytest
+from yaml import safe_dump, safe_load
+
+from config import ConfigWatcher, diff, validate
+
+with open("monitor.yaml") as file:
+    config = safe_load(file)
+
+
+def test_validate():
+    validate(config)
+    validate({**config, "hosts": [], "federation": {"peers": ["http://rack2.local"]}})  # aggregator only
+    for broken in (
+        {**config, "hosts": []},
+        {**config, "hosts": config["hosts"] + config["hosts"][:1]},
+        {**config, "sensors": {"Cpu": {"name": "NoSuchSensor"}}},
+        {**config, "sensors": {"Cpu": {"name": "CpuUsage", "values": [30, 15, 3]}}},
+        {**config, "displays": {"neopixel": {"mode": 5}}},
+        {**config, "alerts": {"rules": [{"name": "hot", "band": 4, "offline": 60}]}},
+        {**config, "alerts": {"sinks": [{"pager": "555-0100"}]}},
+        {**config, "federation": {"peers": ["rack2.local"]}},
+        {**config, "displays": {"backends": ["neopixel", "hologram"]}},
+        {**config, "polling": None},  # all of its settings commented out
+        {**config, "displays": None},
+        {**config, "displays": {"neopixel": None}},
+        {**config, "displays": {"grid": {"cols": 0}}},
+        {**config, "displays": {"grid": {"cols": "x"}}},
+        {**config, "history": {"tiers": [[0, 0]]}},
+        {**config, "history": {"tiers": [[-5, 10]]}},
+        {**config, "alerts": {"rules": None}},
+    ):
+        with pytest.raises(ValueError):
+            validate(broken)
+
+
+def test_diff():
+    new = safe_load(safe_dump(config, sort_keys=False))
+    new["hosts"][0]["CpuUsage"] = {"values": [5, 20, 40]}
+    new["hosts"].pop()
+    new["sensors"]["MemoryUsage"]["values"] = [20, 40, 60]
+    new["polling"]["workers"] = 4
+    changes = diff(config, new)
+    assert changes.hosts == {config["hosts"][0]["hostname"], config["hosts"][-1]["hostname"]}
+    assert changes.sensors == {"MemoryUsage"}
+    assert changes.settings == {"polling.workers"}
+
+
+def test_watcher(tmp_path):
+    path = tmp_path / "monitor.yaml"
+    path.write_text(safe_dump(config))
+    watcher = ConfigWatcher(str(path))
+    assert watcher.poll() is None  # unchanged
+
+    path.write_text("hosts: [")  # invalid, the running configuration is kept
+    os.utime(path, (1, 1))
+    assert watcher.poll() is None
+    path.write_text(safe_dump({**config, "displays": None}))  # an emptied section
+    os.utime(path, (2, 2))
+    assert watcher.poll() is None
+
+    path.write_text(safe_dump({**config, "polling": {"workers": 2}}))
+    os.utime(path, (3, 3))
+    assert watcher.poll()["polling"] == {"workers": 2}
@@ -0,0 +1,117 @@
+"""Tests for the display module"""
+
+import struct
+import zlib
+from threading import Event
+
+import pytest
+
+from display import Display, DisplayError, Displays, NeoDisplay, PngDisplay, TerminalDisplay, rgb
+from grid import Grid
+from stats import stats
+from websvr import WebDisplay
+
+config = {
+    "displays": {"neopixel": {"mode": 3}, "terminal": {"interval": 0}},
+    "hosts": [{"hostname": "alpha"}, {"hostname": "omega"}],
+    "sensors": {"CpuUsage": {"name": "CpuUsage"}, "DiskUsage": {"name": "DiskUsage"}},
+}
+
+
+class Slow(TerminalDisplay):
+    """Blocks on every flush until released"""
+
+    def __init__(self, cfg, grid=None):
+        super().__init__(cfg, grid)
+        self.busy, self.release = Event(), Event()
+
+    def flush(self):
+        self.busy.set()
+        self.release.wait(5)
+        super().flush()
+
+
+def test_registry():
+    assert Display.backend_class("terminal") is TerminalDisplay
+    assert Display.backend_class("neopixel") is NeoDisplay
+    assert Display.backend_class("web") is WebDisplay
+    assert Display.backend_class("nope") is None
+    with pytest.raises(DisplayError):  # rpi_ws281x or the LED hardware is missing
+        NeoDisplay(config)
+    displays = Displays.from_config(config, Grid.from_config(config), ["neopixel", "terminal", "nope"])
+    assert [type(backend) for backend in displays.backends] == [TerminalDisplay]
+    displays.close()
+
+
+def test_slow_backend():
+    grid = Grid.from_config(config)
+    slow, fast = Slow(config, grid), TerminalDisplay(config, grid)
+    displays = Displays([slow, fast])
+    stats.reset()
+    displays.update(0, 0, (0, 2))
+    displays.flush()
+    assert slow.busy.wait(5)
+    for i in range(1, 5):  # the slow backend is still busy with the first frame
+        displays.update(0, 0, (i, 2))
+        displays.flush()
+    assert displays.backend("terminal") is slow
+    swapped = Grid(3, ["omega", "alpha"], grid.sensors)
+    displays.relayout(swapped, grid.moves(swapped))
+    displays.update(0, 1, (7, 4))
+    displays.flush()
+    slow.release.set()
+    displays.close()
+    for backend in (slow, fast):
+        assert backend.cells == {(1, 0): (4, 2), (0, 1): (7, 4)}
+        assert backend.grid.hosts == ["omega", "alpha"]
+    assert slow.flushes == 2  # the first frame, and the latest one
+    assert stats.errors()[("frame_dropped", "terminal")] >= 3
+
+
+def test_subset():
+    grid = Grid.from_config(config)
+    slow = Slow(config, grid)
+    displays = Displays([slow])
+    displays.update(0, 0, (0, 2))
+    displays.flush()
+    assert slow.busy.wait(5)
+    displays.update(0, 1, (7, 4))  # queued while the backend is busy, in the old layout
+    displays.flush()
+    swapped = Grid(3, ["omega", "alpha"], grid.sensors)
+    web = displays.subset(("terminal",))
+    web.relayout(swapped, grid.moves(swapped))  # e.g. from a federation thread
+    web.update(0, 0, (5, 1))
+    web.flush()
+    assert displays.subset(("web",)).backends == []
+    slow.release.set()
+    displays.close()
+    assert slow.cells == {(0, 0): (5, 1), (1, 0): (0, 2), (1, 1): (7, 4)}
+    assert slow.grid.hosts == ["omega", "alpha"]
+
+
+def test_terminal_labels():
+    for mode, labels in ((2, ["alpha", "omega"]), (3, ["CpuUsage", "DiskUsage"]), (4, ["", ""])):
+        terminal = TerminalDisplay({**config, "displays": {"neopixel": {"mode": mode}}})
+        terminal.update(0, 0, (12, 2))
+        lines = terminal.text().splitlines()[:terminal.grid.rows]
+        assert [line.rpartition("\033[0m")[2].strip() for line in lines] == labels[:terminal.grid.rows]
+
+
+def test_png(tmp_path):
+    path = tmp_path / "grid.png"
+    png = PngDisplay({**config, "displays": {"neopixel": {"mode": 3}, "png": {"path": str(path), "cell": 4}}})
+    png.update(1, 0, (90, 4))
+    png.flush()
+    png.update(0, 1, (1, -2))
+    png.close()
+    data = path.read_bytes()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    assert struct.unpack(">IIBB", data[16:26]) == (8, 8, 8, 2)
+    length, = struct.unpack(">I", data[33:37])
+    pixels = zlib.decompress(data[41:41 + length])
+    line = 1 + 8 * 3
+    assert len(pixels) == 8 * line
+    assert tuple(pixels[1 + 4 * 3:1 + 5 * 3]) == rgb(4)  # top right cell
+    assert tuple(pixels[4 * line + 1:4 * line + 4]) == rgb(-2)  # bottom left cell, timed out
+    assert tuple(pixels[1:4]) == rgb(-1)
+    assert pixels[3 * line + 1:4 * line] == bytes(line - 1)  # gap between the rows
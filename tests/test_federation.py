@@ -0,0 +1,57 @@
+"""Tests for the federation module"""
+
+import json
+from time import monotonic, sleep
+
+from federation import Federation
+from grid import Grid
+from history import History
+from websvr import WebDisplay
+
+
+def rack(mode: int, hosts: list[str]) -> dict:
+    return {"displays": {"neopixel": {"mode": mode}}, "hosts": [{"hostname": h} for h in hosts],
+            "sensors": {"CpuUsage": {"name": "CpuUsage"}, "DiskUsage": {"name": "DiskUsage"}}}
+
+
+def cells(display: WebDisplay) -> dict:
+    grid = json.loads(display.grid_json())
+    return {(c["host"], c["sensor"]): (c["col"], c["row"], c["value"]) for c in grid["cells"]}
+
+
+def wait(condition, timeout: float = 5.0) -> None:
+    end = monotonic() + timeout
+    while not condition():
+        assert monotonic() < end, "timed out"
+        sleep(0.02)
+
+
+def test_federation():
+    peer = WebDisplay(rack(2, ["gamma", "delta"]), port=0)  # a peer with its own layout
+    peer.update(1, 1, (55, 3))  # delta DiskUsage
+    peer.flush()
+    local = rack(3, ["alpha", "beta"])
+    history = History()
+    display = WebDisplay(local, port=0, history=history)
+    display.update(1, 0, (12, 2))
+    display.flush()
+    federation = Federation(display, history, Grid.from_config(local),
+                            [f"http://localhost:{peer._server.server_address[1]}/"], interval=0.05)
+    try:
+        wait(lambda: ("delta", "DiskUsage") in cells(display))
+        grid = cells(display)
+        assert grid[("beta", "CpuUsage")] == (1, 0, 12)  # local cells keep their position and value
+        assert grid[("delta", "DiskUsage")] == (3, 1, 55)
+        assert federation.grid.hosts == ["alpha", "beta", "gamma", "delta"]
+
+        peer.update(0, 0, (7, 1))  # a delta: gamma CpuUsage
+        peer.flush()
+        wait(lambda: cells(display)[("gamma", "CpuUsage")] == (2, 0, 7))
+        assert [sample[2] for sample in history.series(2, 0)] == [7]  # avg
+
+        peer.shutdown()  # an unreachable peer's cells go offline
+        wait(lambda: cells(display)[("gamma", "CpuUsage")] == (2, 0, -1))
+        assert cells(display)[("beta", "CpuUsage")] == (1, 0, 12)
+    finally:
+        federation.close()
+        display.shutdown()
@@ -0,0 +1,35 @@
+"""Tests for the grid module"""
+
+from grid import Grid
+
+hosts = [f"host{i}" for i in range(300)]
+sensors = ["CpuUsage", "CpuTemperature", "MemoryUsage", "DiskUsage"]
+
+
+def test_grid_sizes():
+    assert (Grid(1, hosts, sensors).cols, Grid(1, hosts, sensors).rows) == (4, 1)
+    assert (Grid(2, hosts, sensors).cols, Grid(2, hosts, sensors).rows) == (4, 300)
+    assert (Grid(3, hosts, sensors).cols, Grid(3, hosts, sensors).rows) == (300, 4)
+    assert (Grid(4, hosts, sensors).cols, Grid(4, hosts, sensors).rows) == (8, 38)
+    assert (Grid(4, hosts, sensors, cols=16).cols, Grid(4, hosts, sensors, cols=16).rows) == (16, 19)
+
+
+def test_grid_positions():
+    grid = Grid(3, hosts, sensors)
+    assert grid.position(299, 3) == (299, 3)
+    assert grid.labels(299, 3) == ("host299", "DiskUsage")
+    assert grid.headers() == (hosts, sensors)
+
+    grid = Grid(4, hosts, sensors)
+    assert len(grid.sensors) == 1
+    assert grid.position(17, 0) == (1, 2)
+    assert grid.labels(1, 2) == ("host17", "CpuUsage")
+    assert grid.labels(7, 37) == ("", "")  # past the last host
+
+
+def test_grid_moves():
+    old = Grid(2, ["alpha", "beta"], sensors)
+    new = Grid(2, ["gamma", "beta"], sensors)
+    assert old != new and Grid(2, ["alpha", "beta"], sensors) == old
+    assert old.moves(new) == {(si, 1): (si, 1) for si in range(4)}  # alpha is gone, beta stays put
+    assert old.moves(Grid(3, ["beta", "alpha"], sensors))[(2, 0)] == (1, 2)  # alpha's MemoryUsage
@@ -0,0 +1,38 @@
+"""Tests for the history module"""
+
+from history import History, RingBuffer
+
+
+def test_ring_buffer():
+    ring = RingBuffer(3)
+    for ts in range(5):
+        ring.append(ts, ts * 10)
+    assert ring.items() == [(2, 20), (3, 30), (4, 40)]
+    assert ring.items(since=4) == [(4, 40)]
+    assert ring.last(2) == [(3, 30), (4, 40)] and ring.last(9) == ring.items()
+    assert ring.first(3) == (3, 30) and ring.first(0) == (2, 20) and ring.first(5) is None
+
+
+def test_history_tiers():
+    history = History(tiers=((0, 4), (60, 2)))
+    for ts in range(0, 180, 10):
+        history.record(1, 2, ts, ts=ts)
+    history.record(1, 2, -1, ts=180)  # offline, not recorded
+    assert history.sparkline(1, 2) == [140, 150, 160, 170]
+    assert history.series(1, 2, tier=1) == [(0, 0, 25, 50), (60, 60, 85, 110), (120, 120, 145, 170)]
+    assert history.series(0, 0) == []
+
+
+def test_history_buckets():
+    completed = []
+    history = History(tiers=((0, 4), (60, 2)), on_bucket=lambda *args: completed.append(args))
+    for ts in (0, 30, 60, 130):
+        history.record(1, 2, ts, ts=ts)
+    assert completed == [(1, 2, 60, (0, 0, 15, 30)), (1, 2, 60, (60, 60, 60, 60))]
+    restored = History(tiers=((0, 4), (60, 2)), on_bucket=lambda *args: completed.append(args))
+    restored.restore(1, 2, 1, (60, 60, 60, 60))
+    restored.replay(1, 2, 130, 130, tiers=(0, 1))
+    restored.replay(1, 2, 50, 50, tiers=(0,))
+    assert restored.series(1, 2) == [(130, 130), (50, 50)]
+    assert restored.series(1, 2, tier=1) == [(60, 60, 60, 60), (120, 130, 130, 130)]
+    assert len(completed) == 2  # replayed buckets have been stored already
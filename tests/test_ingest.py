@@ -0,0 +1,68 @@
+"""Tests for the ingest module"""
+
+import json
+import socket
+from time import monotonic, sleep
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from ingest import Ingest
+from plan import Plan
+from websvr import WebDisplay
+
+config = {
+    "displays": {"neopixel": {"mode": 3}},
+    "hosts": [{"hostname": "alpha"}, {"hostname": "omega", "push": True}],
+    "sensors": {"CpuUsage": {"name": "CpuUsage", "values": [3, 15, 30]},
+                "DiskUsage": {"name": "DiskUsage", "values": [30, 55, 80]}},
+}
+
+
+def test_push():
+    plan = Plan(config)
+    ingest = Ingest(stale=0.2)
+    ingest.expect(plan)
+    omega = plan.hosts[1]
+    assert ingest.results(omega) == [(-1, -1), (-1, -1)]  # nothing pushed yet
+    assert ingest.push(b"omega CpuUsage=12.4 DiskUsage=x\nalpha CpuUsage=5\nomega Nope=1\n\n") == (1, 3)
+    assert ingest.results(omega) == [(12, 2), (-1, -1)]
+    assert ingest.results(omega) == [None, (-1, -1)]  # no new value, not sampled
+    assert ingest.push(b"omega CpuUsage=nan DiskUsage=inf\nomega CpuUsage=-7 DiskUsage=-inf\n") == (0, 4)
+    assert ingest.results(omega) == [None, (-1, -1)]  # not a value, nor the offline and timeout states
+    lines = "\n".join(f"omega CpuUsage={i % 50} DiskUsage={i % 90}" for i in range(10000)).encode()
+    start = monotonic()
+    assert ingest.push(lines) == (20000, 0)
+    assert monotonic() - start < 1.0
+    assert ingest.results(omega) == [(49, 5), (9, 0)]  # the latest values count
+    sleep(0.25)
+    assert ingest.results(omega) == [(-1, -1), (-1, -1)]  # stale
+
+
+def test_endpoints():
+    ingest = Ingest(token="secret")
+    ingest.expect(Plan(config))
+    display = WebDisplay(config, port=0, ingest=ingest)
+    url = f"http://localhost:{display._server.server_address[1]}/api/push"
+    try:
+        request = Request(url, data=b"omega CpuUsage=20", headers={"Authorization": "Bearer secret"})
+        assert json.load(urlopen(request)) == {"accepted": 1, "rejected": 0}
+        try:
+            urlopen(Request(url, data=b"omega CpuUsage=20"))
+            assert False, "expected 401"
+        except HTTPError as err:
+            assert err.code == 401
+        for length, status in (("", b"411"), ("Content-Length: -1\r\n", b"400"), ("Content-Length: x\r\n", b"400")):
+            with socket.create_connection(("localhost", display._server.server_address[1]), timeout=5) as sock:
+                sock.sendall(f"POST /api/push HTTP/1.1\r\nAuthorization: Bearer secret\r\n{length}\r\n".encode())
+                assert sock.recv(1024).split()[1] == status
+
+        port = ingest.listen(0)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(b"omega DiskUsage=60", ("127.0.0.1", port))
+        omega, end = Plan(config).hosts[1], monotonic() + 5
+        while (disk := ingest.results(omega)[1]) == (-1, -1) and monotonic() < end:
+            sleep(0.01)
+        assert disk == (60, 3)
+    finally:
+        ingest.close()
+        display.shutdown()
@@ -1,6 +1,9 @@
 """Tests for the main module"""
 
-from main import calculate_position
+from grid import Grid
+from history import History
+from main import calculate_position, load_history
+from store import Store
 
 
 def test_calculate_position():
@@ -29,3 +32,23 @@ def test_calculate_position():
     assert calculate_position(4, hi=0, si=0) == (0, 0)
     assert calculate_position(4, hi=1, si=0) == (1, 0)
     assert calculate_position(4, hi=31, si=0) == (7, 3)
+
+
+def test_load_history(tmp_path):
+    store = Store(str(tmp_path), flush=3600)
+    history = History(((0, 60), (60, 10)), on_bucket=lambda col, row, bucket, sample: store.aggregate(
+        ("alpha", "omega")[col], "CpuUsage", bucket, sample))
+    for ts in range(1000, 1300, 10):
+        for col in range(2):
+            history.record(col, 0, ts + col, ts=ts)
+            store.append(("alpha", "omega")[col], "CpuUsage", (ts + col, 0), ts=ts)
+    store.append("gone", "CpuUsage", (1, 0), ts=1290)
+    store.close()
+
+    restored = History(((0, 60), (60, 10)))
+    swapped = Grid(3, ["omega", "alpha"], ["CpuUsage"])  # readings stay with their host
+    assert load_history(restored, store, swapped, now=1300) == 2 * 5 + 2 * 6  # completed buckets, the last minute
+    for col, host in enumerate(swapped.hosts):
+        cell = 0 if host == "alpha" else 1
+        assert restored.series(col, 0, tier=1) == history.series(cell, 0, tier=1)
+        assert restored.series(col, 0) == history.series(cell, 0, since=1240)
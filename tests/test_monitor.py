@@ -1,8 +1,16 @@
 """Tests for the monitor module"""
 
+import os
+import subprocess
+from threading import Thread
+from time import monotonic
+
 from yaml import safe_load
 
-from monitor import Connection, Monitor
+from bench import FakeSSHServer
+from cache import ProbeCache
+from classify import TIMEOUT
+from monitor import MAX_OUTPUT, Connection, ConnectionPool, Monitor, ssh_config
 
 test_host = "alpha"
 
@@ -37,3 +45,119 @@ def test_probe():
                 assert col != -1 and val != -1
     except FileNotFoundError:  # cannot test, if ./.ssh/config does not exist
         print(f"Skipping test_probe for {test_host} as it is not reachable.")
+
+
+def test_ssh_config_cache(tmp_path):
+    path = tmp_path / "config"
+    path.write_text("Host alpha\n    HostName 10.0.0.1\n")
+    config = ssh_config(str(path))
+    assert ssh_config(str(path)) is config  # unchanged file is not parsed again
+    path.write_text("Host alpha\n    HostName 10.0.0.2\n")
+    os.utime(path, (0, 0))
+    assert ssh_config(str(path)).lookup("alpha")["hostname"] == "10.0.0.2"
+
+
+def test_pool_backoff(monkeypatch):
+    attempts = []
+    monkeypatch.setattr(ConnectionPool, "_open", lambda self, hostname: attempts.append(hostname))
+    pool = ConnectionPool(backoff=60)
+    assert pool.get("down") is None
+    assert pool.get("down") is None  # still backing off, no second attempt
+    assert attempts == ["down"]
+
+
+class LocalClient:
+    """Stands in for an SSHClient, runs commands in a local shell"""
+
+    def exec_command(self, cmd):
+        out = subprocess.run(["sh", "-c", cmd], capture_output=True)
+        return None, type("Stdout", (), {"channel": LocalChannel(out.stdout)})(), None
+
+
+class LocalChannel:
+    """Stands in for a paramiko Channel, returns the output of a finished command in small chunks"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def settimeout(self, timeout):
+        pass
+
+    def recv(self, size):
+        chunk, self.data = self.data[:7], self.data[7:]  # frame markers are split across chunks
+        return chunk
+
+    def close(self):
+        pass
+
+
+def test_probe_batch():
+    client = LocalClient()
+    monitors = [
+        Monitor.create_instance("CpuTemperature", client, "echo 53692", [50, 62, 75]),
+        Monitor.create_instance("DiskUsage", client, "printf 'Filesystem Use%% Mounted\\n/dev/sda 24%% /\\n'",
+                                [30, 55, 80]),
+        Monitor.create_instance("TaskCount", client, "false # fails", [150, 175, 200]),
+        Monitor.create_instance("TaskCount", client, "echo 123", [150, 175, 200]),
+    ]
+    assert Monitor.probe_batch(client, monitors) == [(54, 1), (24, 0), (-1, -1), (123, 0)]
+    assert [m.probe() for m in monitors] == [(54, 1), (24, 0), (-1, -1), (123, 0)]
+
+
+def test_proc_sensors():
+    text = ("cpu  100 0 100 800 0 0 0 0 0 0\ncpu0 50 0 50 400 0 0 0 0 0 0\ncpu1 50 0 50 400 0 0 0 0 0 0\n"
+            "MemTotal:  1000 kB\nMemFree:  100 kB\nMemAvailable:  400 kB\n"
+            "1.50 0.58 0.59 1/389 12345\n")
+    cpu = Monitor.create_instance("ProcCpuUsage", None, "", [3, 15, 30], host="test")
+    assert cpu.parse(text) == (20, 3)  # since boot
+    assert cpu.parse(text.replace("cpu  100 0 100 800", "cpu  150 0 150 900")) == (50, 5)  # delta
+    assert cpu.parse(text.replace("cpu  100 0 100 800", "cpu  150 0 150 900")) == (50, 5)  # cached, unchanged
+    assert cpu.parse(text) == (20, 3)  # counters reset
+    assert Monitor.create_instance("ProcMemoryUsage", None, "", [25, 50, 75]).parse(text) == (60, 3)
+    assert Monitor.create_instance("LoadAverage", None, "", [25, 50, 100]).parse(text) == (75, 3)
+
+
+def test_probe_batch_cache():
+    client = LocalClient()
+    cache = ProbeCache(ttl=10)
+    first = Monitor.create_instance("TaskCount", client, "echo $$", [150, 175, 200])
+    second = Monitor.create_instance("TaskCount", client, "echo $$", [150, 175, 200])
+    assert Monitor.probe_batch(client, [first], cache, "pi@10.0.0.2:22") == \
+        Monitor.probe_batch(client, [second], cache, "pi@10.0.0.2:22")  # same shell, i.e. ran once
+
+
+def test_sensor_registry():
+    class EchoSensor(Monitor):
+        def parse(self, text):
+            return int(text), 0
+
+    assert Monitor.sensor_class("EchoSensor") is EchoSensor
+    assert Monitor.create_instance("EchoSensor", LocalClient(), "echo 7", [1, 2, 3]).probe() == (7, 0)
+    assert Monitor.sensor_class("NoSuchSensor") is None
+
+
+def test_probe_timeout_and_cap():
+    server = FakeSSHServer()
+    pool = ConnectionPool(resolver=server.connect_kwargs)
+    try:
+        client = pool.get("alpha")
+        monitors = [Monitor.create_instance("TaskCount", client, cmd, [150, 175, 200], host="alpha", timeout=0.5)
+                    for cmd in ("echo 1", "sleep 10", "echo 3")]
+        start = monotonic()
+        assert Monitor.probe_batch(client, monitors) == [(1, 0), (TIMEOUT, TIMEOUT), (TIMEOUT, TIMEOUT)]
+        assert monitors[1].probe() == (TIMEOUT, TIMEOUT)
+        assert monotonic() - start < 3  # the stuck command was cancelled
+        cache, results = ProbeCache(ttl=10), []
+        threads = [Thread(target=lambda: results.append(Monitor.probe_batch(client, monitors[1:2], cache, "alpha")))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [[(TIMEOUT, TIMEOUT)]] * 2  # also the caller that waited for the other one
+        assert cache.get_many([("alpha", "sleep 10")], lambda keys: {}) == {("alpha", "sleep 10"): None}  # not cached
+        outputs = list(Monitor._stream(client, ["head -c 100000 /dev/zero", "echo 3"], [5, 5]))
+        assert [(i, len(text)) for i, text in outputs] == [(0, MAX_OUTPUT), (1, 2)]
+    finally:
+        pool.close()
+        server.close()
@@ -0,0 +1,24 @@
+"""Tests for the plan module"""
+
+import pytest
+from yaml import safe_load
+
+from plan import Plan
+
+with open("monitor.yaml") as file:
+    config = safe_load(file)
+
+
+def test_plan():
+    plan = Plan(config)
+    assert len(plan.hosts) == len(plan.grid.hosts)
+    omega = next(host for host in plan.hosts if host.hostname == "omega")
+    assert omega.agent is False
+    temperature = next(entry for entry in omega.sensors if entry.name == "CpuTemperature")
+    assert temperature.monitor.cmd == "cat /sys/class/hwmon/hwmon0/device/temp2_input"  # host override
+    assert temperature.settings["values"] == config["sensors"]["CpuTemperature"]["values"]
+    assert temperature.cell == plan.grid.position(omega.hi, temperature.si)
+    with pytest.raises(AttributeError):
+        omega.agent = True
+    with pytest.raises(TypeError):
+        temperature.settings["values"] = [1, 2, 3]
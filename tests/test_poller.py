@@ -0,0 +1,48 @@
+"""Tests for the poller module"""
+
+from time import sleep
+
+from poller import Poller, Schedule
+
+
+def test_sweep_deadline():
+    def probe(host):
+        sleep(host["delay"])
+        return [(host["delay"], 0)]
+
+    hosts = [{"hostname": "fast", "delay": 0}, {"hostname": "slow", "delay": 1}]
+    poller = Poller(probe, workers=2, deadline=0.2)
+    results = list(poller.sweep(hosts))
+    assert results == [(0, [(0, 0)]), (1, None)]
+    assert poller.last_sweep < 1
+
+    # the slow host is still running and gets skipped on the next sweep
+    assert (1, None) in list(poller.sweep(hosts))
+    poller.shutdown()
+
+
+def test_sweep_error():
+    def probe(host):
+        raise OSError("unreachable")
+
+    poller = Poller(probe)
+    assert list(poller.sweep([{"hostname": "down"}])) == [(0, None)]
+    poller.shutdown()
+
+
+def test_schedule():
+    sensor = {"interval": 100, "max_interval": 400, "values": [30, 55, 80]}
+    schedule = Schedule()
+    assert schedule.due("alpha", 0, now=0)
+    schedule.observe("alpha", 0, sensor, (10, 0), now=0)
+    assert not schedule.due("alpha", 0, now=99) and schedule.due("alpha", 0, now=100)
+    schedule.observe("alpha", 0, sensor, (10, 0), now=100)  # stable and low: back off
+    assert not schedule.due("alpha", 0, now=299) and schedule.due("alpha", 0, now=300)
+    schedule.observe("alpha", 0, sensor, (54, 2), now=300)  # color changed, close to a threshold
+    assert schedule.due("alpha", 0, now=325)
+    schedule.observe("alpha", 0, sensor, (90, 5), now=325)  # high, changed again
+    schedule.observe("alpha", 0, sensor, (91, 5), now=350)  # high and stable: base interval
+    assert not schedule.due("alpha", 0, now=449) and schedule.due("alpha", 0, now=450)
+
+    schedule.observe("alpha", 1, {}, (10, 0), now=0)  # no interval: every sweep
+    assert schedule.due("alpha", 1, now=0)
@@ -0,0 +1,27 @@
+"""Tests for the stats module"""
+
+from stats import Histogram, Stats
+
+
+def test_histogram():
+    histogram = Histogram()
+    for seconds in (0.0005, 0.003, 0.003, 0.2, 42):
+        histogram.observe(seconds)
+    assert histogram.count == 5 and histogram.slowest == 42
+    assert histogram.quantile(0.5) == 0.005
+    assert histogram.quantile(0.8) == 0.25
+    assert histogram.quantile(1.0) == 42  # beyond the last bucket
+
+
+def test_stats_text():
+    stats = Stats()
+    stats.observe("exec", "alpha", 0.02)
+    stats.observe("exec", "alpha", 0.04)
+    stats.error("deadline", "beta")
+    assert stats.histogram("exec", "alpha").count == 2
+    assert stats.errors() == {("deadline", "beta"): 1}
+    lines = stats.text().splitlines()
+    assert lines[1].split() == ["exec", "alpha", "2", "30.0", "25.0", "50.0", "40.0"]
+    assert lines[-1].split() == ["deadline", "beta", "1"]
+    stats.reset()
+    assert stats.histogram("exec", "alpha") is None
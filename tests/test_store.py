@@ -0,0 +1,61 @@
+"""Tests for the store module"""
+
+from datetime import datetime, timezone
+
+from store import Store, AGGREGATE, RAW, SEGMENT, read_snapshot, write_snapshot
+
+
+def test_store_append_replay(tmp_path):
+    store = Store(str(tmp_path), flush=3600)
+    store.append("alpha", "CpuUsage", (42, 3), ts=1000)
+    store.append("omega", "CpuUsage", (-1, -1), ts=2000)
+    assert list(store.replay()) == []  # still buffered
+    store.close()
+
+    day = tmp_path / datetime.now(timezone.utc).strftime(SEGMENT)
+    assert (tmp_path / (day.name + ".keys")).read_text() == "alpha\tCpuUsage\nomega\tCpuUsage\n"
+    with open(str(day) + ".bin", "ab") as file:
+        file.write(RAW.pack(3000, 0, 0, 1)[:7])  # torn write
+    with open(str(day) + ".keys", "a") as file:
+        file.write("omega\tDisk")  # torn write
+    store = Store(str(tmp_path), flush=0)
+    assert list(store.replay(since=1500)) == [(2000, "omega", "CpuUsage", -1, -1)]
+    store.append("omega", "DiskUsage", (7, 0), ts=4000)
+    store.append("alpha", "CpuUsage", (8, 0), ts=5000)
+    assert (tmp_path / (day.name + ".keys")).read_text().splitlines()[2:] == ["omega\tDiskUsage"]
+    assert (tmp_path / (day.name + ".bin")).stat().st_size == 4 * RAW.size
+    assert [r[:3] for r in store.replay(since=3000)] == [(4000, "omega", "DiskUsage"), (5000, "alpha", "CpuUsage")]
+    assert [r[0] for r in store.replay()] == [1000, 2000, 4000, 5000]
+    store.close()
+
+
+def test_store_aggregates(tmp_path):
+    store = Store(str(tmp_path), flush=3600)
+    store.aggregate("alpha", "CpuUsage", 60, (120, 1.0, 2.0, 3.0))
+    store.aggregate("omega", "CpuUsage", 60, (0, 4.0, 5.0, 6.0))  # completed late
+    store.aggregate("alpha", "CpuUsage", 600, (0, 1.0, 1.5, 2.0))
+    store.close()
+    day = datetime.now(timezone.utc).strftime(SEGMENT)
+    assert (tmp_path / (day + "-60.bin")).stat().st_size == 2 * AGGREGATE.size
+    assert list(store.replay(bucket=60)) == [(120, "alpha", "CpuUsage", 1, 2, 3), (0, "omega", "CpuUsage", 4, 5, 6)]
+    assert list(store.replay(since=60, bucket=60)) == [(120, "alpha", "CpuUsage", 1, 2, 3)]
+    assert list(store.replay(bucket=600)) == [(0, "alpha", "CpuUsage", 1, 1.5, 2)]
+    assert list(store.replay(bucket=5)) == []
+
+
+def test_store_retention(tmp_path):
+    for name in ("readings-20000101.keys", "readings-20000101.bin", "readings-20000101-60.bin"):
+        (tmp_path / name).write_bytes(b"")
+    store = Store(str(tmp_path), flush=0, retention=30)
+    store.append("alpha", "CpuUsage", (1, 0))
+    assert [path.name[:17] for path in tmp_path.iterdir()] == [datetime.now(timezone.utc).strftime(SEGMENT)] * 2
+    store.close()
+
+
+def test_snapshot(tmp_path):
+    assert read_snapshot(str(tmp_path)) == {}
+    write_snapshot(str(tmp_path), {("alpha", "CpuUsage"): (12, 2), ("alpha", "DiskUsage"): (-2, -2)})
+    assert read_snapshot(str(tmp_path)) == {("alpha", "CpuUsage"): (12, 2), ("alpha", "DiskUsage"): (-2, -2)}
+    (tmp_path / "grid.json").write_text('{"cells": [{"col": 1, "row": 1, "host": "", "sensor": "", '
+                                        '"value": -1, "color": -1}]}')  # empty cells of a web display's grid
+    assert read_snapshot(str(tmp_path)) == {}
@@ -0,0 +1,114 @@
+"""Tests for the websvr module"""
+
+import gzip
+import json
+from time import monotonic, sleep
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from history import History
+from websvr import WebDisplay
+
+config = {
+    "displays": {"neopixel": {"mode": 3}},
+    "hosts": [{"hostname": "alpha"}, {"hostname": "beta"}],
+    "sensors": {"CpuUsage": {"name": "CpuUsage"}, "DiskUsage": {"name": "DiskUsage"}},
+}
+
+
+def test_endpoints():
+    history = History()
+    history.record(1, 0, 12, ts=1000)
+    display = WebDisplay(config, port=0, history=history)
+    base = f"http://localhost:{display._server.server_address[1]}"
+    try:
+        display.update(1, 0, (12, 2))
+        assert json.load(urlopen(f"{base}/api/grid"))["cells"][1]["value"] == -1  # not flushed yet
+        display.flush()
+        grid = json.load(urlopen(f"{base}/api/grid"))
+        assert {"col": 1, "row": 0, "host": "beta", "sensor": "CpuUsage", "value": 12, "color": 2} in grid["cells"]
+
+        samples = json.load(urlopen(f"{base}/api/history?host=beta&sensor=CpuUsage"))["samples"]
+        assert samples == [[1000, 12, 12, 12]]  # the 5-second bucket being aggregated
+
+        response = urlopen(f"{base}/metrics")
+        etag = response.headers["ETag"]
+        assert 'zeromonitor_value{host="beta",sensor="CpuUsage",col="1",row="0"} 12' in response.read().decode()
+        try:
+            urlopen(Request(f"{base}/metrics", headers={"If-None-Match": etag}))
+            assert False, "expected 304"
+        except HTTPError as err:
+            assert err.code == 304
+        display.update(1, 0, (13, 2))
+        display.flush()
+        assert urlopen(Request(f"{base}/metrics", headers={"If-None-Match": etag})).status == 200
+
+        response = urlopen(Request(f"{base}/", headers={"Accept-Encoding": "gzip"}))
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(response.read()).startswith(b"<!DOCTYPE html>")
+
+        try:
+            urlopen(f"{base}/api/history?host=gamma&sensor=CpuUsage")
+            assert False, "expected 404"
+        except HTTPError as err:
+            assert err.code == 404
+
+        assert b"update   web" in urlopen(f"{base}/debug/stats").read()
+    finally:
+        display.shutdown()
+
+
+def test_events():
+    display = WebDisplay(config, port=0)
+    try:
+        stream = urlopen(f"http://localhost:{display._server.server_address[1]}/events")
+        display.update(0, 1, (70, 5))
+        display.flush()
+        assert stream.readline().decode().startswith("data: ")
+    finally:
+        display.shutdown()
+
+
+def test_events_outside_worker_cap():
+    cfg = {**config, "displays": {"neopixel": {"mode": 3}, "web": {"max_connections": 2, "max_streams": 3}}}
+    display = WebDisplay(cfg, port=0)
+    base = f"http://localhost:{display._server.server_address[1]}"
+    try:
+        streams = [urlopen(f"{base}/events") for _ in range(3)]
+        assert urlopen(f"{base}/metrics").status == 200  # the streams hold no worker
+        assert urlopen(f"{base}/").status == 200
+        try:
+            urlopen(f"{base}/events")
+            assert False, "expected 503"
+        except HTTPError as err:
+            assert err.code == 503
+        display.update(0, 1, (70, 5))
+        display.flush()
+        for stream in streams:
+            assert stream.readline().startswith(b"data: ")
+            stream.close()
+        end = monotonic() + 5
+        while len(display._events) and monotonic() < end:  # closed by the clients, their slots are free
+            sleep(0.01)
+        assert len(display._events) == 0
+    finally:
+        display.shutdown()
+
+
+def test_render_cache():
+    history = History()
+    display = WebDisplay(config, port=0, history=history)
+    try:
+        for value in (10, 20):
+            history.record(0, 1, value, ts=1000 + value)
+        display.update(0, 1, (20, 2))
+        display.flush()
+        page = display.render()
+        assert 'id="c0-1" style="background:rgb(0, 255, 0)" title="20"><svg' in page
+        history.record(0, 1, 60, ts=1060)
+        assert display.render() == page  # the cell did not change
+        display.update(0, 1, (60, 5))
+        display.flush()
+        assert 'id="c0-1" style="background:rgb(255, 0, 255)" title="60"><svg' in display.render()
+    finally:
+        display.shutdown()